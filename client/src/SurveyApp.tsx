@@ -9,6 +9,7 @@ import IpfResults from "./components/IpfResults";
 import PredictionSection from "./components/PredictionSection";
 import { SurveyResult, IpfResultType } from "./types";
 import { API_BASE_URL } from "./constants";
+import { jobResult } from "./jobs";
 import { pollCandidates } from "./pollCandidates";
 import {
   Chart as ChartJS,
@@ -42,13 +43,18 @@ const SurveyApp: React.FC = () => {
 
   const fetchResults = async (poll: string) => {
     try {
-      const response = await fetch(
-        `${API_BASE_URL}/survey-results/?poll=${encodeURIComponent(poll)}`
-      );
-      if (!response.ok) {
-        throw new Error("Failed to fetch results");
+      // Results come a page at a time; follow the cursor links to the end.
+      const data: SurveyResult[] = [];
+      let url: string | null = `${API_BASE_URL}/survey-results/?poll=${encodeURIComponent(poll)}`;
+      while (url) {
+        const response: Response = await fetch(url);
+        if (!response.ok) {
+          throw new Error("Failed to fetch results");
+        }
+        const page: { next: string | null; results: SurveyResult[] } = await response.json();
+        data.push(...page.results);
+        url = page.next;
       }
-      const data: SurveyResult[] = await response.json();
       setResults(data);
     } catch (error) {
       console.error(error);
@@ -78,10 +84,8 @@ const SurveyApp: React.FC = () => {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ target_weights: weights, poll: selectedPoll }),
       });
-      if (!response.ok) {
-        throw new Error("Failed to run IPF");
-      }
-      const data = await response.json();
+      // Large polls are raked in the background; wait for the job's result.
+      const data = await jobResult(response);
       setIpfResults({
         iterations: data.iterations,
         finalChange: data.final_change,
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { API_BASE_URL } from "../constants";
+import { jobResult } from "../jobs";
 import { ChartData, ChartOptions } from "chart.js";
 import { Pie, Bar } from "react-chartjs-2";
 import {
@@ -100,10 +101,8 @@ const PredictionSection: React.FC<PredictionSectionProps> = ({
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ poll: selectedPoll }),
       });
-      const result = await response.json();
-      if (!response.ok) {
-        throw new Error(result.error || "Training failed");
-      }
+      // Large polls are trained in the background; wait for the job's result.
+      const result = await jobResult(response);
       setTrainingStatus(result.message);
       alert(result.message);
     } catch (error) {
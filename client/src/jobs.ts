@@ -0,0 +1,31 @@
+import { API_BASE_URL } from "./constants";
+
+const POLL_INTERVAL_MS = 1000;
+
+// Training and IPF runs on large polls are queued as background jobs: the
+// server answers 202 with a job id instead of the result. This waits for
+// such a job to finish and returns its result, so callers can treat both
+// answers alike. Any other response's JSON body is returned as is.
+export const jobResult = async (response: Response): Promise<any> => {
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || `Request failed with status ${response.status}`);
+  }
+  if (response.status !== 202) {
+    return data;
+  }
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+    const jobResponse = await fetch(`${API_BASE_URL}/jobs/${data.job_id}/`);
+    const job = await jobResponse.json();
+    if (!jobResponse.ok) {
+      throw new Error(job.error || "Failed to fetch job status");
+    }
+    if (job.status === "succeeded") {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Job failed");
+    }
+  }
+};
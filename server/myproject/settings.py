@@ -78,6 +78,21 @@ WSGI_APPLICATION = 'myproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+#
+# By default every thread keeps its connection for DB_CONN_MAX_AGE seconds
+# (60) and reuses it across requests. With DB_POOL=true (this needs
+# psycopg[pool]), each server process shares a psycopg connection pool
+# instead, which suits an ASGI deployment: request threads there do not
+# outlive their request, so they cannot keep a connection of their own.
+# Connections are health-checked before they are reused.
+#
+# Statements run DB_PREPARE_THRESHOLD times on a connection are prepared
+# server-side, so hot per-poll queries skip parsing and planning. Set it to 0
+# behind a transaction-pooling PgBouncer, which cannot keep prepared statements.
+
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_PREPARE_THRESHOLD = config('DB_PREPARE_THRESHOLD', default=5, cast=int)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -86,10 +101,43 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # psycopg only prepares statements whose parameters are bound server-side.
+            'server_side_binding': DB_PREPARE_THRESHOLD > 0,
+            'prepare_threshold': DB_PREPARE_THRESHOLD or None,
+            **({'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=20, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            }} if DB_POOL else {}),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# 'responses' holds read endpoint responses keyed by each poll's cache_version.
+# It is per-process local memory by default; a FileBasedCache directory in
+# RESPONSE_CACHE_LOCATION shares it between the workers on a host. Entries
+# are culled beyond RESPONSE_CACHE_MAX_ENTRIES.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='responses'),
+        'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=2000, cast=int)},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -131,6 +179,49 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Number of deserialized vote models each worker keeps in memory
+VOTE_MODEL_CACHE_SIZE = config('VOTE_MODEL_CACHE_SIZE', default=8, cast=int)
+
+# Profiles scored per chunk by the batch prediction endpoint
+PREDICTION_CHUNK_SIZE = config('PREDICTION_CHUNK_SIZE', default=5000, cast=int)
+
+# Rows validated and inserted per batch by bulk ingestion
+INGEST_CHUNK_SIZE = config('INGEST_CHUNK_SIZE', default=5000, cast=int)
+
+# Survey results per page of /api/survey-results/ (clients may ask for up to 10000)
+SURVEY_RESULTS_PAGE_SIZE = config('SURVEY_RESULTS_PAGE_SIZE', default=1000, cast=int)
+
+# Rows fetched per database round trip by the streaming survey results export
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Directory for the per-poll columnar snapshots read by raking, training and toplines
+SNAPSHOT_DIR = config('SNAPSHOT_DIR', default=str(BASE_DIR / 'snapshots'))
+
+# Training and IPF requests for polls with at least this many responses are
+# queued for the `runjobs` worker unless the request sets "async" explicitly
+ASYNC_JOB_MIN_ROWS = config('ASYNC_JOB_MIN_ROWS', default=100000, cast=int)
+
+# Seconds a running job may go without a heartbeat from its `runjobs` worker
+# before it is considered dead and requeued
+JOB_STALE_AFTER = config('JOB_STALE_AFTER', default=300, cast=int)
+
+# Processes used by batch raking and bootstrap replicates (0 means one per CPU core)
+RAKING_WORKERS = config('RAKING_WORKERS', default=0, cast=int)
+
+# Processes used to cross-validate vote model parameters (0 means one per CPU core)
+TUNING_WORKERS = config('TUNING_WORKERS', default=0, cast=int)
+
+# Threads that run prediction and SHAP for the async views (0 means one per CPU core)
+CPU_EXECUTOR_WORKERS = config('CPU_EXECUTOR_WORKERS', default=0, cast=int)
+
+# Requests each endpoint serves at once per server process; more get a 503
+# with Retry-After (0 means no limit)
+PREDICTION_MAX_IN_FLIGHT = config('PREDICTION_MAX_IN_FLIGHT', default=64, cast=int)
+BATCH_PREDICTION_MAX_IN_FLIGHT = config('BATCH_PREDICTION_MAX_IN_FLIGHT', default=4, cast=int)
+AGGREGATION_MAX_IN_FLIGHT = config('AGGREGATION_MAX_IN_FLIGHT', default=32, cast=int)
+RAKING_MAX_IN_FLIGHT = config('RAKING_MAX_IN_FLIGHT', default=2, cast=int)
+SURVEY_RESULTS_MAX_IN_FLIGHT = config('SURVEY_RESULTS_MAX_IN_FLIGHT', default=64, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:3000",
@@ -0,0 +1,97 @@
+from django.db.models import Q, Sum
+from polling.cube import ensure_cube, weight_set_cells
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, SurveyCell
+from polling.replicates import get_replicate_set, margins_of_error
+from polling.weight_sets import get_weight_set
+
+def check_filters(filters):
+    """Raises ValueError unless filters maps demographics to lists of category labels."""
+    if filters is None:
+        return
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object mapping demographics to lists of categories.")
+    for dim, categories in filters.items():
+        if dim not in DEMOGRAPHIC_FIELDS:
+            raise ValueError(f"Unknown demographic in filters: {dim}")
+        if not isinstance(categories, list) or not all(isinstance(cat, str) for cat in categories):
+            raise ValueError(f"Filter for {dim} must be a list of categories.")
+
+def filter_responses(queryset, filters):
+    """Keeps only rows whose category is selected for every filtered dimension."""
+    for dim, categories in (filters or {}).items():
+        # Labels outside the vocabulary have no code and match nothing.
+        known = [cat for cat in categories if cat in DEMOGRAPHIC_CATEGORIES.get(dim, categories)]
+        queryset = queryset.filter(**{f"{dim}__in": known})
+    return queryset
+
+def weighted_topline(poll, filters=None, weight_set=None):
+    """
+    Returns weighted and unweighted candidate totals for a poll, plus the same
+    totals broken down by every demographic subgroup.
+
+    Everything is computed in one query with conditional aggregates over the
+    poll's data cube, so neither the query nor the response size depends on
+    the number of respondents.
+
+    filters: dict of demographic -> list of categories to keep.
+    weight_set: optional WeightSet to weight by instead of the active one. An
+        inactive set has no cube, so its cells are aggregated from the
+        responses on the fly.
+
+    When bootstrap replicates have been built for the weights in use, the
+    result also holds 'margins_of_error' for every candidate share, overall
+    and within each subgroup.
+    """
+    subgroups = [(dim, cat) for dim, categories in DEMOGRAPHIC_CATEGORIES.items() for cat in categories]
+    if weight_set is not None and not weight_set.is_active:
+        rows = _aggregate_cells(weight_set_cells(poll, weight_set), filters, subgroups)
+    else:
+        ensure_cube(poll)
+        cells = filter_responses(SurveyCell.objects.filter(poll__name=poll), filters)
+        aggregates = {'total_weight': Sum('weight'), 'total_count': Sum('count')}
+        for i, (dim, cat) in enumerate(subgroups):
+            aggregates[f"w{i}"] = Sum('weight', filter=Q(**{dim: cat}))
+            aggregates[f"n{i}"] = Sum('count', filter=Q(**{dim: cat}))
+        rows = cells.values('candidate').annotate(**aggregates).order_by('candidate')
+
+    candidates = {}
+    breakdowns = {dim: {cat: {} for cat in categories} for dim, categories in DEMOGRAPHIC_CATEGORIES.items()}
+    for row in rows:
+        candidate = row['candidate']
+        candidates[candidate] = {'weight': row['total_weight'] or 0, 'count': row['total_count']}
+        for i, (dim, cat) in enumerate(subgroups):
+            breakdowns[dim][cat][candidate] = {'weight': row[f"w{i}"] or 0, 'count': row[f"n{i}"] or 0}
+
+    result = {
+        'poll': poll,
+        'total_weight': sum(totals['weight'] for totals in candidates.values()),
+        'total_count': sum(totals['count'] for totals in candidates.values()),
+        'candidates': candidates,
+        'subgroups': breakdowns,
+    }
+    if weight_set is not None:
+        result['weight_set'] = {'name': weight_set.name, 'version': weight_set.version}
+
+    replicate_set = get_replicate_set(poll, weight_set if weight_set is not None else get_weight_set(poll))
+    if replicate_set is not None:
+        result['margins_of_error'] = margins_of_error(replicate_set, filters)
+    return result
+
+def _aggregate_cells(cells, filters, subgroups):
+    # Same rows as the conditional-aggregate query, computed from cell dicts.
+    rows = {}
+    for cell in cells:
+        if any(cell[dim] not in categories for dim, categories in (filters or {}).items()):
+            continue
+        row = rows.get(cell['candidate'])
+        if row is None:
+            row = rows[cell['candidate']] = {'candidate': cell['candidate'], 'total_weight': 0, 'total_count': 0}
+            for i in range(len(subgroups)):
+                row[f"w{i}"] = row[f"n{i}"] = 0
+        row['total_weight'] += cell['weight']
+        row['total_count'] += cell['count']
+        for i, (dim, cat) in enumerate(subgroups):
+            if cell[dim] == cat:
+                row[f"w{i}"] += cell['weight']
+                row[f"n{i}"] += cell['count']
+    return [rows[candidate] for candidate in sorted(rows)]
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PollingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polling'
+
+    def ready(self):
+        # Registers the connection counter reported by /api/db-stats/ and
+        # the removal of a deleted poll's snapshot files.
+        from polling import database, snapshots  # noqa: F401
@@ -0,0 +1,149 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# CPU-bound work that does not touch the database (prediction, SHAP) runs
+# here, off the event loop. XGBoost and NumPy release the GIL in their hot
+# loops, so threads run it in parallel while sharing the per-process model cache.
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_EXECUTOR_WORKERS or os.cpu_count() or 1,
+    thread_name_prefix='polling-cpu',
+)
+
+async def run_cpu(func, *args, **kwargs):
+    """Runs a CPU-bound call that does not touch the database on cpu_executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args, **kwargs))
+
+def run_sync(func):
+    """
+    Wraps synchronous code that uses the ORM (or mixes queries and CPU work)
+    for async views. Under ASGI each request gets its own thread for such
+    calls, and its database connections are closed when the request ends.
+    """
+    return sync_to_async(func)
+
+class InFlightLimit:
+    """
+    A per-process limit on the requests an endpoint serves at once. Requests
+    beyond it are turned away immediately rather than queued, so a burst of
+    heavy calls cannot pile up behind the executors.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+class AsyncDispatchMixin:
+    """
+    Async dispatch for DRF views whose handlers are coroutines, so that under
+    ASGI a request waiting on the database or an executor does not hold a
+    thread. DRF's request setup (authentication, permissions, throttling)
+    may query the database and runs through run_sync.
+
+    max_in_flight: the most requests of the view served at once in this
+    process (0 or None for no limit); further requests get a 503 with
+    Retry-After. A streamed response counts until it has been sent.
+    """
+    max_in_flight = None
+
+    _limits = {}
+    _limits_lock = threading.Lock()
+
+    @classmethod
+    def in_flight_limit(cls):
+        with cls._limits_lock:
+            if cls not in cls._limits:
+                cls._limits[cls] = InFlightLimit(cls.max_in_flight)
+            return cls._limits[cls]
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        limit = self.in_flight_limit()
+        if not limit.acquire():
+            response = Response(
+                {"error": "Too many concurrent requests for this endpoint. Retry shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            self.response = self.finalize_response(request, response, *args, **kwargs)
+            return self.response
+
+        streaming = False
+        try:
+            try:
+                await run_sync(self.initial)(request, *args, **kwargs)
+                method = request.method.lower()
+                if method in self.http_method_names:
+                    handler = getattr(self, method, self.http_method_not_allowed)
+                else:
+                    handler = self.http_method_not_allowed
+                response = handler(request, *args, **kwargs)
+                if inspect.isawaitable(response):
+                    response = await response
+            except Exception as exc:
+                response = self.handle_exception(exc)
+            self.response = self.finalize_response(request, response, *args, **kwargs)
+            if isinstance(self.response, StreamingHttpResponse):
+                # Hold the slot until the last chunk is sent (or the client goes away).
+                release = _release_after_async if self.response.is_async else _release_after
+                self.response.streaming_content = release(self.response.streaming_content, limit)
+                streaming = True
+            return self.response
+        finally:
+            if not streaming:
+                limit.release()
+
+class AsyncAPIView(AsyncDispatchMixin, APIView):
+    """An APIView with coroutine handlers; see AsyncDispatchMixin."""
+
+class AsyncModelViewSet(AsyncDispatchMixin, viewsets.ModelViewSet):
+    """
+    A ModelViewSet whose actions are coroutines; see AsyncDispatchMixin.
+    Subclasses override every action they route with an async one.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        return markcoroutinefunction(super().as_view(actions, **initkwargs))
+
+def _release_after(content, limit):
+    try:
+        yield from content
+    finally:
+        limit.release()
+
+async def _release_after_async(content, limit):
+    try:
+        async for part in content:
+            yield part
+    finally:
+        limit.release()
@@ -0,0 +1,89 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Poll, SurveyCell, SurveyResult
+from polling.response_cache import bump_cache_version
+from polling.snapshots import snapshot_columns
+from polling.weight_sets import apply_weight_set, effective_weight, get_weight_set
+
+CELL_FIELDS = ['candidate'] + DEMOGRAPHIC_FIELDS
+
+def rebuild_cube(poll):
+    """
+    Recomputes every cell of a poll's data cube from its snapshot. Called
+    whenever weights change wholesale (e.g. by IPF or when another weight
+    set is activated). The cube always reflects the poll's active weight
+    set, or the responses' own weights if there is none.
+    """
+    cells = weight_set_cells(poll, get_weight_set(poll))
+    with transaction.atomic():
+        SurveyCell.objects.filter(poll__name=poll).delete()
+        SurveyCell.objects.bulk_create([SurveyCell(**cell) for cell in cells], batch_size=1000)
+        bump_cache_version(name=poll)
+
+def weight_set_cells(poll, weight_set):
+    """
+    Aggregates a poll's responses into cube cells (as dicts of SurveyCell
+    fields) using the weights of `weight_set`, or the responses' own
+    weights when it is None.
+    """
+    columns = snapshot_columns(poll)
+    if columns is None:
+        return []
+    weights = apply_weight_set(columns['ids'], columns['weights'], weight_set)
+
+    # One mixed-radix key per combination of candidate and demographics.
+    key = columns['candidate_codes'].astype(np.intp)
+    for dim in DEMOGRAPHIC_FIELDS:
+        key = key * len(DEMOGRAPHIC_CATEGORIES[dim]) + columns['codes'][dim]
+    keys, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, minlength=len(keys))
+    totals = np.bincount(inverse, weights=weights, minlength=len(keys))
+
+    poll_id = Poll.objects.values_list('pk', flat=True).get(name=poll)
+    return [
+        {
+            'poll_id': poll_id,
+            'candidate': columns['candidates'][columns['candidate_codes'][row]],
+            **{dim: DEMOGRAPHIC_CATEGORIES[dim][columns['codes'][dim][row]] for dim in DEMOGRAPHIC_FIELDS},
+            'count': int(count),
+            'weight': float(total),
+        }
+        for row, count, total in zip(first, counts, totals)
+    ]
+
+def ensure_cube(poll):
+    """Builds the cube for a poll that has responses but no cells yet."""
+    if (
+        not SurveyCell.objects.filter(poll__name=poll).exists()
+        and SurveyResult.objects.filter(poll__name=poll).exists()
+    ):
+        rebuild_cube(poll)
+
+def add_to_cube(response, sign=1, created=False):
+    """
+    Incrementally adds (sign=1) or removes (sign=-1) a single response from its
+    poll's cube. Cells left with no responses are dropped. Pass created=True
+    for a response just created, which no weight set covers yet.
+
+    The response must already be saved when it is added and not yet deleted
+    when it is removed, with the poll's data_version bumped after any write:
+    a poll without cells (e.g. after migration 0009) has its cube rebuilt
+    from the responses first, which then already account for an addition.
+    """
+    with transaction.atomic():
+        if not SurveyCell.objects.filter(poll_id=response.poll_id).exists():
+            rebuild_cube(Poll.objects.values_list('name', flat=True).get(pk=response.poll_id))
+            if sign > 0:
+                return
+
+        key = {field: getattr(response, field) for field in CELL_FIELDS}
+        weight = effective_weight(response, created=created)
+        cell, _ = SurveyCell.objects.get_or_create(poll_id=response.poll_id, **key)
+        SurveyCell.objects.filter(pk=cell.pk).update(
+            count=F('count') + sign,
+            weight=F('weight') + sign * weight,
+        )
+        if sign < 0:
+            SurveyCell.objects.filter(pk=cell.pk, count__lte=0).delete()
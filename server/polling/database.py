@@ -0,0 +1,48 @@
+import threading
+from collections import Counter
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_connects = Counter()
+_connects_lock = threading.Lock()
+
+@receiver(connection_created)
+def _count_connect(sender, connection, **kwargs):
+    with _connects_lock:
+        _connects[connection.alias] += 1
+
+def connects(alias='default'):
+    """
+    How many times this process has connected to a database alias. With a
+    pool this counts checkouts, and the pool's own stats count the
+    connections it actually opened.
+    """
+    with _connects_lock:
+        return _connects[alias]
+
+def connection_stats(alias='default'):
+    """
+    Describes how a database alias's connections are reused in this process:
+    the persistence and prepared-statement settings, the connect count, the
+    pool's stats if it is pooled and, on PostgreSQL, how many statements the
+    calling thread's connection has prepared.
+    """
+    connection = connections[alias]
+    options = connection.settings_dict['OPTIONS']
+    pool = getattr(connection, 'pool', None)
+    stats = {
+        'vendor': connection.vendor,
+        'pooled': pool is not None,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'prepare_threshold': options.get('prepare_threshold'),
+        'connects': connects(alias),
+    }
+    if pool is not None:
+        stats['pool'] = pool.get_stats()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_prepared_statements")
+            stats['prepared_statements'] = cursor.fetchone()[0]
+    return stats
@@ -0,0 +1,96 @@
+import csv
+import io
+import itertools
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from polling.weight_sets import active_weight_sets, lookup_weights
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Exported field -> column read with values_list.
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'poll': 'poll__name',
+    'candidate': 'candidate',
+    'age': 'age',
+    'gender': 'gender',
+    'race': 'race',
+    'income': 'income',
+    'urbanity': 'urbanity',
+    'education': 'education',
+    'weight': 'weight',
+    'created_at': 'created_at',
+}
+
+def export_rows(queryset, fields, fmt, chunk_size=2000):
+    """
+    Yields a queryset of survey results as CSV (with a header row) or NDJSON
+    text, one piece per chunk of rows. Rows are read as tuples with a
+    database cursor that fetches chunk_size rows at a time, so memory use
+    does not depend on the number of rows.
+
+    fields: names from EXPORT_COLUMNS, in output order.
+
+    Weights are those of each poll's active weight set, as in the API, looked
+    up a chunk at a time from the slice of the set that covers it.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    columns = [EXPORT_COLUMNS[field] for field in fields]
+    if 'weight' in fields:
+        columns += ['id', 'poll_id']
+    rows = queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    chunks = _chunks(rows, chunk_size)
+    if 'weight' in fields:
+        weight_sets = {}
+        chunks = (_apply_active_weights(chunk, fields.index('weight'), weight_sets) for chunk in chunks)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+        for chunk in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in chunk)
+            yield buffer.getvalue()
+        return
+
+    encoder = DjangoJSONEncoder()
+    for chunk in chunks:
+        yield ''.join(encoder.encode(dict(zip(fields, row))) + '\n' for row in chunk)
+
+async def aexport_rows(queryset, fields, fmt, chunk_size=2000):
+    """
+    export_rows() as an async generator. Each piece is read and encoded in
+    the request's sync thread, which keeps the database cursor open between
+    pieces.
+    """
+    pieces = export_rows(queryset, fields, fmt, chunk_size=chunk_size)
+    next_piece = sync_to_async(next)
+    while (piece := await next_piece(pieces, None)) is not None:
+        yield piece
+
+def _chunks(rows, size):
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+def _apply_active_weights(chunk, position, weight_sets):
+    # Replaces the weight at `position` of each row by its active weight set's,
+    # dropping the id and poll_id read for the lookup. weight_sets caches each
+    # poll's active set (or None) across chunks.
+    ids = np.array([row[-2] for row in chunk], dtype=np.int64)
+    poll_ids = np.array([row[-1] for row in chunk])
+    weights = np.array([row[position] for row in chunk], dtype=float)
+    for poll_id in np.unique(poll_ids).tolist():
+        if poll_id not in weight_sets:
+            weight_sets[poll_id] = active_weight_sets([poll_id]).get(poll_id)
+        if weight_sets[poll_id] is not None:
+            rows = poll_ids == poll_id
+            weights[rows] = lookup_weights(ids[rows], weights[rows], weight_sets[poll_id])
+    return [row[:position] + (weight,) + row[position + 1:-2] for row, weight in zip(chunk, weights.tolist())]
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
@@ -0,0 +1,55 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.functional import cached_property
+
+class CategoryField(models.SmallIntegerField):
+    """
+    Stores a label from a fixed vocabulary as its small-integer position in
+    that vocabulary. Python code, querysets and the REST API keep working with
+    the labels ('18-29', 'Female', ...); only the column holds the code.
+    """
+
+    def __init__(self, *args, categories=(), **kwargs):
+        self.categories = list(categories)
+        self._codes = {category: code for code, category in enumerate(self.categories)}
+        kwargs.setdefault('choices', [(category, category) for category in self.categories])
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['categories'] = self.categories
+        if kwargs.get('choices') == [(category, category) for category in self.categories]:
+            del kwargs['choices']
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # Values are labels, so the integer range validators do not apply.
+        return [*self.default_validators, *self._validators]
+
+    def encode(self, label):
+        """Returns the code stored for a label."""
+        try:
+            return self._codes[label]
+        except KeyError:
+            raise ValueError(f"Unknown {self.name} category: {label}")
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.categories[value]
+
+    def to_python(self, value):
+        if value is None or value in self._codes:
+            return value
+        raise ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return value
+        return self.encode(value)
@@ -0,0 +1,154 @@
+import csv
+import json
+from django.db import connection, transaction
+from django.utils import timezone
+from polling.cube import rebuild_cube
+from polling.jobs import schedule_auto_rerake
+from polling.fields import CategoryField
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Poll, SurveyResult
+from polling.snapshots import bump_data_version
+
+INGEST_FORMATS = ('csv', 'ndjson')
+REQUIRED_FIELDS = ['poll', 'candidate'] + DEMOGRAPHIC_FIELDS
+MAX_REPORTED_ERRORS = 100
+FIELD_LIMITS = {
+    'poll': Poll._meta.get_field('name').max_length,
+    'candidate': SurveyResult._meta.get_field('candidate').max_length,
+}
+
+def read_records(lines, fmt):
+    """
+    Yields (line number, record) pairs from an iterable of text or bytes lines
+    in CSV (with a header row) or NDJSON format. Lines that cannot be parsed
+    yield the error message in place of the record.
+    """
+    if fmt not in INGEST_FORMATS:
+        raise ValueError(f"Unknown ingest format: {fmt}")
+    lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "Each line must be a JSON object."
+
+def ingest_records(records, chunk_size=5000):
+    """
+    Validates (line number, record) pairs in chunks and loads the valid ones
+    with bulk_create inside a single transaction. Returns the number of rows
+    accepted and rejected plus the first few rejection reasons.
+    """
+    accepted = 0
+    rejected = 0
+    errors = []
+    poll_ids = {}
+
+    with transaction.atomic():
+        chunk = []
+        for number, record in records:
+            values, error = _validate_record(record)
+            if error is not None:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": number, "error": error})
+                continue
+            poll = values.pop('poll')
+            if poll not in poll_ids:
+                poll_ids[poll] = Poll.objects.get_or_create(name=poll)[0].pk
+            chunk.append(SurveyResult(poll_id=poll_ids[poll], **values))
+            if len(chunk) >= chunk_size:
+                accepted += len(SurveyResult.objects.bulk_create(chunk, batch_size=chunk_size))
+                chunk = []
+        if chunk:
+            accepted += len(SurveyResult.objects.bulk_create(chunk, batch_size=chunk_size))
+
+        bump_data_version(poll_ids.values())
+        for poll in poll_ids:
+            rebuild_cube(poll)
+
+    for poll in poll_ids:
+        schedule_auto_rerake(poll)
+
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
+
+def insert_columns(columns, chunk_size=5000):
+    """
+    Inserts survey responses given column-wise (field -> equal-length sequence),
+    with the poll given as 'poll_id' and demographics as category labels.
+    On PostgreSQL with psycopg 3 the rows are streamed with COPY, skipping model
+    instances entirely; other backends fall back to chunked bulk_create.
+    """
+    fields = list(columns)
+
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if connection.vendor == 'postgresql' and hasattr(raw_cursor, 'copy'):
+            # COPY bypasses the ORM, so category labels are encoded here.
+            values = []
+            for field in fields:
+                model_field = SurveyResult._meta.get_field(field)
+                if isinstance(model_field, CategoryField):
+                    lookup = {category: code for code, category in enumerate(model_field.categories)}
+                    values.append([lookup[label] for label in columns[field]])
+                else:
+                    values.append(columns[field])
+            table = connection.ops.quote_name(SurveyResult._meta.db_table)
+            names = ', '.join(
+                connection.ops.quote_name(SurveyResult._meta.get_field(field).column)
+                for field in fields + ['created_at']
+            )
+            now = timezone.now()
+            with raw_cursor.copy(f"COPY {table} ({names}) FROM STDIN") as copy:
+                for row in zip(*values):
+                    copy.write_row((*row, now))
+            bump_data_version(columns['poll_id'])
+            return
+
+    chunk = []
+    for row in zip(*columns.values()):
+        chunk.append(SurveyResult(**dict(zip(fields, row))))
+        if len(chunk) >= chunk_size:
+            SurveyResult.objects.bulk_create(chunk)
+            chunk = []
+    if chunk:
+        SurveyResult.objects.bulk_create(chunk)
+    bump_data_version(columns['poll_id'])
+
+def _validate_record(record):
+    if isinstance(record, str):
+        return None, record
+
+    values = {}
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        if value is None or str(value).strip() == "":
+            return None, f"Missing field: {field}"
+        value = str(value).strip()
+        if field in DEMOGRAPHIC_CATEGORIES and value not in DEMOGRAPHIC_CATEGORIES[field]:
+            return None, f"Unknown {field} category: {value}"
+        if field in FIELD_LIMITS and len(value) > FIELD_LIMITS[field]:
+            return None, f"'{field}' is longer than {FIELD_LIMITS[field]} characters."
+        values[field] = value
+
+    weight = record.get('weight')
+    if weight is None or weight == "":
+        weight = 1.0
+    try:
+        weight = float(weight)
+    except (TypeError, ValueError):
+        return None, f"Invalid weight: {weight}"
+    if not weight >= 0:
+        return None, f"Invalid weight: {weight}"
+
+    values['weight'] = weight
+    return values, None
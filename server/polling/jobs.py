@@ -0,0 +1,225 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from polling.model_training import train_vote_model, update_vote_model
+from polling.models import Job, RakingState, SurveyResult
+from polling.utils import run_ipf
+
+def params_key(params):
+    """A stable key for a job's params, independent of the order of their keys."""
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def submit_job(kind, poll, params=None, coalesce_running=True):
+    """
+    Queues a background job and returns (job, coalesced). A request identical
+    to a queued job (same kind, poll and params) is folded into that job, as
+    is one identical to a running job unless coalesce_running is False (e.g.
+    when the running job may have read its data before the change that
+    prompted this request). Requests with other params get a job of their own.
+    """
+    params = params or {}
+    key = params_key(params)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                identical = Job.objects.filter(kind=kind, poll=poll, params_key=key)
+                queued = identical.filter(status=Job.QUEUED).first()
+                if queued is not None:
+                    return queued, True
+                if coalesce_running:
+                    # A running job whose worker died will not produce a result.
+                    running = identical.filter(status=Job.RUNNING, heartbeat_at__gte=_stale_before()).first()
+                    if running is not None:
+                        return running, True
+                return Job.objects.create(kind=kind, poll=poll, params=params, params_key=key), False
+        except IntegrityError:
+            # Another request queued the same job concurrently; retry to coalesce into it.
+            continue
+    raise RuntimeError(f"Could not queue {kind} job for poll: {poll}")
+
+def schedule_auto_rerake(poll):
+    """
+    Queues a warm-started re-rake after a write to a poll whose raking state
+    has auto_rerake enabled, with the method, solver, bounds, tolerance and
+    iteration limit of the run that saved it. Bursts of writes coalesce into
+    one queued job. Returns the job, or None if the poll does not re-rake automatically.
+    """
+    state = RakingState.objects.filter(poll__name=poll, auto_rerake=True).first()
+    if state is None:
+        return None
+    job, _ = submit_job(Job.IPF, poll, {
+        'target_weights': state.target_weights,
+        'method': state.method,
+        'solver': state.solver,
+        'bounds': state.bounds,
+        'tolerance': state.tolerance,
+        'max_iterations': state.max_iterations,
+        'weight_set': state.weight_set,
+        'activate': True,
+        'warm_start': True,
+    }, coalesce_running=False)
+    return job
+
+def should_run_async(request_data, poll, min_rows):
+    """
+    Jobs run in the background when the request asks for it ("async": true) or,
+    if it does not say, when the poll has at least min_rows responses.
+    """
+    if "async" in request_data:
+        return str(request_data["async"]).lower() in ("1", "true", "yes")
+    return SurveyResult.objects.filter(poll__name=poll)[min_rows - 1:min_rows].exists()
+
+def requeue_stale_jobs():
+    """
+    Puts running jobs whose worker stopped sending heartbeats for
+    JOB_STALE_AFTER seconds back in the queue, or fails them if an identical
+    job has been queued since. Returns the number of jobs found stale.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        stale = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.RUNNING)
+            .filter(Q(heartbeat_at__lt=_stale_before()) | Q(heartbeat_at__isnull=True, started_at__lt=_stale_before()))
+        )
+        for job in stale:
+            duplicate = Job.objects.filter(
+                kind=job.kind, poll=job.poll, params_key=job.params_key, status=Job.QUEUED
+            ).exists()
+            if duplicate:
+                job.status = Job.FAILED
+                job.error = "The worker running this job stopped; an identical job is queued."
+                job.finished_at = now
+            else:
+                job.status = Job.QUEUED
+                job.progress = 0.0
+                job.started_at = None
+                job.heartbeat_at = None
+            job.save(update_fields=['status', 'error', 'progress', 'started_at', 'heartbeat_at', 'finished_at'])
+    return len(stale)
+
+def claim_next_job():
+    """
+    Marks the oldest queued job as running and returns it, or None if the
+    queue is empty. Stale running jobs are requeued first.
+    """
+    requeue_stale_jobs()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+def run_job(job):
+    """
+    Runs a claimed job to completion, recording its result or error. A
+    background thread touches the job's heartbeat_at meanwhile, so a job
+    whose worker dies can be told apart from a slow one.
+
+    Returns the job, or None if it was found stale and requeued (or failed)
+    while it ran: its result is then discarded, since another worker may
+    already have claimed it again.
+    """
+    last_report = [0.0]
+    # The claim's started_at tells this run's writes apart from a later claim's.
+    claimed = Job.objects.filter(pk=job.pk, status=Job.RUNNING, started_at=job.started_at)
+
+    def progress(fraction):
+        # Progress is written at most a few times a second.
+        now = time.monotonic()
+        if fraction >= 1 or now - last_report[0] > 0.25:
+            last_report[0] = now
+            claimed.update(progress=min(fraction, 1.0))
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(claimed, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = JOB_HANDLERS[job.kind](job, progress)
+    except Exception as e:
+        job.status = Job.FAILED
+        job.error = str(e)
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.progress = 1.0
+    finally:
+        stop.set()
+        heartbeat.join()
+    job.finished_at = timezone.now()
+    fields = ['status', 'error', 'result', 'progress', 'finished_at']
+    if not claimed.update(**{field: getattr(job, field) for field in fields}):
+        return None
+    return job
+
+def _stale_before():
+    return timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+
+def _heartbeat(claimed, stop):
+    # Several beats fit in the stale timeout, so one slow write is not fatal.
+    try:
+        while not stop.wait(settings.JOB_STALE_AFTER / 5):
+            claimed.update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+def _run_train_job(job, progress):
+    if job.params.get('incremental'):
+        update = update_vote_model(
+            job.poll, precompute_profiles=job.params.get('precompute_profiles', False), progress=progress
+        )
+        return {"message": "Model is up to date.", **update}
+    model = train_vote_model(
+        job.poll,
+        precompute_profiles=job.params.get('precompute_profiles', False),
+        progress=progress,
+        tune_params=job.params.get('tune_params', False),
+        param_grid=job.params.get('param_grid'),
+        cv=job.params.get('cv', 3),
+        n_jobs=job.params.get('n_jobs'),
+    )
+    return {"message": "Model trained successfully.", "tuning": model.tuning}
+
+def _run_ipf_job(job, progress):
+    iterations, final_change, l1_errors, weight_set, diagnostics = run_ipf(
+        job.params['target_weights'],
+        job.poll,
+        method=job.params.get('method', 'numpy'),
+        progress=progress,
+        weight_set=job.params.get('weight_set', 'ipf'),
+        activate=job.params.get('activate', True),
+        solver=job.params.get('solver', 'ipf'),
+        bounds=job.params.get('bounds'),
+        tolerance=job.params.get('tolerance', 0.001),
+        max_iterations=job.params.get('max_iterations', 100),
+        warm_start=job.params.get('warm_start', False),
+        auto_rerake=job.params.get('auto_rerake'),
+    )
+    return {
+        "message": f"IPF algorithm completed for {job.poll}",
+        "iterations": iterations,
+        "final_change": final_change,
+        "l1_errors": l1_errors,
+        "diagnostics": diagnostics,
+        "weight_set": weight_set and {"name": weight_set.name, "version": weight_set.version},
+    }
+
+JOB_HANDLERS = {
+    Job.TRAIN: _run_train_job,
+    Job.IPF: _run_ipf_job,
+}
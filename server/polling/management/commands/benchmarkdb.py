@@ -0,0 +1,126 @@
+import threading
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from polling.database import connects
+from polling.models import Poll, SurveyResult, VoteModel
+
+MODES = ('per-request', 'persistent-unprepared', 'persistent', 'pool')
+
+class Command(BaseCommand):
+    help = (
+        "Compare request latency at high concurrency with a new database connection per request, "
+        "persistent connections (with and without prepared statements) and a connection pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('poll', help="Poll whose hot queries each simulated request runs")
+        parser.add_argument('--concurrency', type=int, default=64, help="Simultaneous simulated requests")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per mode")
+        parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated subset of: {', '.join(MODES)}")
+        parser.add_argument('--pool-size', type=int, default=20, help="Most connections the pool opens")
+        parser.add_argument('--page-size', type=int, default=100, help="Rows read by the simulated list request")
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        if options['concurrency'] < 1 or options['requests'] < options['concurrency']:
+            raise CommandError("Need --concurrency >= 1 and at least one request per client.")
+        if not Poll.objects.filter(name=options['poll']).exists():
+            raise CommandError(f"No poll named {options['poll']}")
+
+        base = connections.settings['default']
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} at a time, on {base['ENGINE'].rsplit('.', 1)[-1]}"
+        )
+        self.stdout.write(f"{'mode':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'connects':>10}")
+        for mode in modes:
+            settings_dict = _mode_settings(base, mode, options['pool_size'])
+            if settings_dict is None:
+                self.stdout.write(f"{mode:<24}skipped (needs PostgreSQL{' and psycopg_pool' if mode == 'pool' else ''})")
+                continue
+            alias = f"benchmark-{mode}"
+            connections.settings[alias] = settings_dict
+            try:
+                latencies, seconds, opened = _run(alias, options)
+            finally:
+                if mode == 'pool':
+                    connections[alias].close_pool()
+                del connections.settings[alias]
+            ms = np.percentile(latencies, [50, 95, 99]) * 1000
+            self.stdout.write(
+                f"{mode:<24}{len(latencies) / seconds:>9.0f}{ms[0]:>9.2f}{ms[1]:>9.2f}{ms[2]:>9.2f}{opened:>10}"
+            )
+
+def _mode_settings(base, mode, pool_size):
+    # Database settings for a mode, or None if this database cannot run it.
+    postgresql = base['ENGINE'] == 'django.db.backends.postgresql'
+    options = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+    if not postgresql and mode in ('persistent-unprepared', 'pool'):
+        return None
+    if mode == 'pool':
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return None
+        options['pool'] = {'min_size': 1, 'max_size': pool_size}
+    if postgresql and mode in ('per-request', 'persistent-unprepared'):
+        options.update(server_side_binding=False, prepare_threshold=None)
+    persistent = mode in ('persistent-unprepared', 'persistent')
+    return {
+        **base,
+        'CONN_MAX_AGE': None if persistent else 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
+    }
+
+def _run(alias, options):
+    clients = options['concurrency']
+    shares = [len(share) for share in np.array_split(np.arange(options['requests']), clients)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(requests):
+        timings = []
+        try:
+            barrier.wait()
+            for _ in range(requests):
+                started = time.perf_counter()
+                _request(alias, options['poll'], options['page_size'])
+                timings.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections[alias].close()
+            with lock:
+                latencies.extend(timings)
+
+    before = connects(alias)
+    threads = [threading.Thread(target=client, args=(share,)) for share in shares]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    if errors:
+        raise CommandError(f"{len(errors)} clients failed: {errors[0]}")
+    return np.array(latencies), seconds, connects(alias) - before
+
+def _request(alias, poll, page_size):
+    # Django closes (or returns to the pool) connections that should not be
+    # reused when a request starts and when it finishes.
+    close_old_connections()
+    state = Poll.objects.using(alias).filter(name=poll).values_list('pk', 'data_version', 'cache_version').first()
+    list(
+        SurveyResult.objects.using(alias).filter(poll_id=state[0]).order_by('id')
+        .values_list('id', 'candidate', 'weight')[:page_size]
+    )
+    VoteModel.objects.using(alias).filter(poll=poll).values_list('version', flat=True).first()
+    close_old_connections()
@@ -0,0 +1,30 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from polling.ingest import INGEST_FORMATS, ingest_records, read_records
+
+class Command(BaseCommand):
+    help = "Bulk load survey responses from a CSV or NDJSON file (or - for stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to load, or - to read from stdin")
+        parser.add_argument('--format', choices=INGEST_FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows validated and inserted per batch")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        if path == '-':
+            summary = ingest_records(read_records(sys.stdin, fmt), chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(path, encoding='utf-8', newline='') as f:
+                    summary = ingest_records(read_records(f, fmt), chunk_size=options['chunk_size'])
+            except OSError as e:
+                raise CommandError(str(e))
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Accepted {summary['accepted']} responses, rejected {summary['rejected']}."
+        ))
@@ -1,103 +1,135 @@
-import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import django
+import numpy as np
 from django.core.management.base import BaseCommand
-from polling.models import SurveyResult
-from faker import Faker
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Poll, SurveyResult, SurveyCell
+from polling.cube import rebuild_cube
+from polling.ingest import insert_columns
+
+# Demographic probability distributions for each poll, in DEMOGRAPHIC_CATEGORIES order.
+DEMOGRAPHICS = {
+    'Ohio Senate Primary': {
+        'age': [0.5, 0.3, 0.15, 0.05],
+        'gender': [0.4, 0.6],
+        'race': [0.7, 0.1, 0.15, 0.05],
+        'income': [0.2, 0.5, 0.3],
+        'urbanity': [0.3, 0.5, 0.2],
+        'education': [0.6, 0.4],
+    },
+    'Florida Senate Primary': {
+        'age': [0.3, 0.4, 0.2, 0.1],
+        'gender': [0.45, 0.55],
+        'race': [0.5, 0.2, 0.25, 0.05],
+        'income': [0.3, 0.4, 0.3],
+        'urbanity': [0.2, 0.6, 0.2],
+        'education': [0.55, 0.45],
+    },
+    'New Hampshire Senate Primary': {
+        'age': [0.2, 0.35, 0.3, 0.15],
+        'gender': [0.5, 0.5],
+        'race': [0.8, 0.05, 0.1, 0.05],
+        'income': [0.15, 0.5, 0.35],
+        'urbanity': [0.4, 0.4, 0.2],
+        'education': [0.65, 0.35],
+    },
+}
+
+CANDIDATE_OPTIONS = ['Candidate A', 'Candidate B']
+
+# Bias candidate selection: the demographic that drives each poll and the
+# probability of choosing Candidate A for each of its categories.
+CANDIDATE_BIAS = {
+    'Ohio Senate Primary': ('age', {'18-29': 0.7, '30-44': 0.5, '45-64': 0.3, '65+': 0.2}),
+    'Florida Senate Primary': ('gender', {'Male': 0.3, 'Female': 0.2}),
+    'New Hampshire Senate Primary': ('education', {'college degree': 0.6, 'no college degree': 0.25}),
+}
+
+def generate_poll(template, num_responses, rng):
+    """
+    Draws num_responses synthetic responses shaped like the template poll and
+    returns the candidate and demographic columns as arrays of labels.
+    """
+    columns = {}
+    codes = {}
+    for dim in DEMOGRAPHIC_FIELDS:
+        categories = np.array(DEMOGRAPHIC_CATEGORIES[dim], dtype=object)
+        codes[dim] = rng.choice(len(categories), size=num_responses, p=DEMOGRAPHICS[template][dim])
+        columns[dim] = categories[codes[dim]]
+
+    dim, probabilities = CANDIDATE_BIAS[template]
+    prob_a = np.array([probabilities[cat] for cat in DEMOGRAPHIC_CATEGORIES[dim]])[codes[dim]]
+    choices = np.array(CANDIDATE_OPTIONS, dtype=object)
+    columns['candidate'] = choices[(rng.random(num_responses) >= prob_a).astype(int)]
+    return columns
+
+def populate_poll(poll, template, num_responses, seed, chunk_size):
+    """
+    Generates and inserts one poll in chunks (with COPY on PostgreSQL), then
+    builds its cube. Runs in a worker process when --workers > 1.
+    """
+    rng = np.random.default_rng(seed)
+    poll_id = Poll.objects.get_or_create(name=poll)[0].pk
+    created = 0
+    while created < num_responses:
+        size = min(chunk_size, num_responses - created)
+        columns = generate_poll(template, size, rng)
+        insert_columns(
+            {'poll_id': [poll_id] * size, **columns, 'weight': [1.0] * size},
+            chunk_size=chunk_size,
+        )
+        created += size
+    rebuild_cube(poll)
+    return poll, created
 
 class Command(BaseCommand):
     help = "Populate dummy data with large discrepancies between demographic groups"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--responses', type=int, default=1000, help="Responses generated per poll")
+        parser.add_argument('--polls', type=int, default=len(DEMOGRAPHICS),
+                            help="Number of polls; polls beyond the built-in ones reuse their shapes")
+        parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible data")
+        parser.add_argument('--workers', type=int, default=1, help="Processes to generate polls in parallel")
+        parser.add_argument('--chunk-size', type=int, default=100000, help="Rows generated and inserted per batch")
+
     def handle(self, *args, **options):
-        fake = Faker()
-        polls = ['Ohio Senate Primary', 'Florida Senate Primary', 'New Hampshire Senate Primary']
-        num_responses = 1000
+        num_responses = options['responses']
+        templates = list(DEMOGRAPHICS)
+        polls = [
+            (templates[i] if i < len(templates) else f"Synthetic Poll {i + 1}", templates[i % len(templates)])
+            for i in range(options['polls'])
+        ]
+        # One independent stream per poll, so output does not depend on the worker count.
+        seeds = np.random.SeedSequence(options['seed']).spawn(len(polls))
 
         # Clear existing data
         self.stdout.write("Clearing existing survey responses...")
         SurveyResult.objects.all().delete()
+        SurveyCell.objects.all().delete()
+        Poll.objects.all().delete()
 
-        # Define demographic probability distributions for each poll.
-        demographics = {
-            'Ohio Senate Primary': {
-                'age': (['18-29', '30-44', '45-64', '65+'], [0.5, 0.3, 0.15, 0.05]),
-                'gender': (['Male', 'Female'], [0.4, 0.6]),
-                'race': (['White', 'Black', 'Hispanic', 'Asian'], [0.7, 0.1, 0.15, 0.05]),
-                'income': (['<50k', '50-100k', '>100k'], [0.2, 0.5, 0.3]),
-                'urbanity': (['rural', 'urban', 'suburban'], [0.3, 0.5, 0.2]),
-                'education': (['college degree', 'no college degree'], [0.6, 0.4]),
-            },
-            'Florida Senate Primary': {
-                'age': (['18-29', '30-44', '45-64', '65+'], [0.3, 0.4, 0.2, 0.1]),
-                'gender': (['Male', 'Female'], [0.45, 0.55]),
-                'race': (['White', 'Black', 'Hispanic', 'Asian'], [0.5, 0.2, 0.25, 0.05]),
-                'income': (['<50k', '50-100k', '>100k'], [0.3, 0.4, 0.3]),
-                'urbanity': (['rural', 'urban', 'suburban'], [0.2, 0.6, 0.2]),
-                'education': (['college degree', 'no college degree'], [0.55, 0.45]),
-            },
-            'New Hampshire Senate Primary': {
-                'age': (['18-29', '30-44', '45-64', '65+'], [0.2, 0.35, 0.3, 0.15]),
-                'gender': (['Male', 'Female'], [0.5, 0.5]),
-                'race': (['White', 'Black', 'Hispanic', 'Asian'], [0.8, 0.05, 0.1, 0.05]),
-                'income': (['<50k', '50-100k', '>100k'], [0.15, 0.5, 0.35]),
-                'urbanity': (['rural', 'urban', 'suburban'], [0.4, 0.4, 0.2]),
-                'education': (['college degree', 'no college degree'], [0.65, 0.35]),
-            },
-        }
-
-        candidate_options = ['Candidate A', 'Candidate B']
-
-        def assign_candidate(poll, age, gender, race, income, urbanity, education):
-            # Bias candidate selection
-            if poll == 'Ohio Senate Primary':
-                if age == '18-29':
-                    return random.choices(candidate_options, weights=[70, 30])[0]
-                elif age == '30-44':
-                    return random.choices(candidate_options, weights=[50, 50])[0]
-                elif age == '45-64':
-                    return random.choices(candidate_options, weights=[30, 70])[0]
-                else:
-                    return random.choices(candidate_options, weights=[20, 80])[0]
-            elif poll == 'Florida Senate Primary':
-                if gender == 'Female':
-                    return random.choices(candidate_options, weights=[20, 80])[0]
-                else:
-                    return random.choices(candidate_options, weights=[30, 70])[0]
-            elif poll == 'New Hampshire Senate Primary':
-                if education == 'college degree':
-                    return random.choices(candidate_options, weights=[60, 40])[0]
-                else:
-                    return random.choices(candidate_options, weights=[25, 75])[0]
-            return random.choice(candidate_options)
-
-        for poll in polls:
+        jobs = [
+            (poll, template, num_responses, seed, options['chunk_size'])
+            for (poll, template), seed in zip(polls, seeds)
+        ]
+        for poll, _ in polls:
             self.stdout.write(f"Generating {num_responses} responses for {poll}")
-            for i in range(num_responses):
-                age_choices, age_weights = demographics[poll]['age']
-                gender_choices, gender_weights = demographics[poll]['gender']
-                race_choices, race_weights = demographics[poll]['race']
-                income_choices, income_weights = demographics[poll]['income']
-                urbanity_choices, urbanity_weights = demographics[poll]['urbanity']
-                education_choices, education_weights = demographics[poll]['education']
-
-                age = random.choices(age_choices, weights=age_weights)[0]
-                gender = random.choices(gender_choices, weights=gender_weights)[0]
-                race = random.choices(race_choices, weights=race_weights)[0]
-                income = random.choices(income_choices, weights=income_weights)[0]
-                urbanity = random.choices(urbanity_choices, weights=urbanity_weights)[0]
-                education = random.choices(education_choices, weights=education_weights)[0]
 
-                candidate = assign_candidate(poll, age, gender, race, income, urbanity, education)
+        if options['workers'] > 1:
+            # Spawned rather than forked, so no OpenMP or BLAS threads (or
+            # database connections) are inherited. Each worker sets Django up
+            # from the settings module in the environment before its first poll.
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            ) as executor:
+                results = list(executor.map(populate_poll, *zip(*jobs)))
+        else:
+            results = [populate_poll(*job) for job in jobs]
 
-                SurveyResult.objects.create(
-                    poll=poll,
-                    candidate=candidate,
-                    age=age,
-                    gender=gender,
-                    race=race,
-                    income=income,
-                    urbanity=urbanity,
-                    education=education,
-                    weight=1.0,
-                )
-            self.stdout.write(self.style.SUCCESS(f"Created {num_responses} responses for {poll}"))
+        for poll, created in results:
+            self.stdout.write(self.style.SUCCESS(f"Created {created} responses for {poll}"))
 
-        self.stdout.write(self.style.SUCCESS("Dummy data population complete."))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("Dummy data population complete."))
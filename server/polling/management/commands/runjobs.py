@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from polling.jobs import claim_next_job, run_job
+from polling.models import Job
+
+class Command(BaseCommand):
+    help = "Drain the background job queue (training and IPF runs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait between polls of an empty queue")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for jobs...")
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"Running job {job.pk}: {job.kind} for {job.poll}")
+            pk = job.pk
+            job = run_job(job)
+            if job is None:
+                self.stdout.write(self.style.WARNING(f"Job {pk} was requeued while it ran; its result was discarded"))
+                continue
+            duration = (job.finished_at - job.started_at).total_seconds()
+            if job.status == Job.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f"Job {job.pk} succeeded in {duration:.2f}s"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job {job.pk} failed after {duration:.2f}s: {job.error}"))
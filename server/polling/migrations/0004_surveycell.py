@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0003_votemodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('poll', models.CharField(max_length=100)),
+                ('candidate', models.CharField(max_length=100)),
+                ('age', models.CharField(max_length=20)),
+                ('gender', models.CharField(max_length=20)),
+                ('race', models.CharField(max_length=50)),
+                ('income', models.CharField(max_length=20)),
+                ('urbanity', models.CharField(max_length=20)),
+                ('education', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('weight', models.FloatField(default=0.0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('poll', 'candidate', 'age', 'gender', 'race', 'income', 'urbanity', 'education'), name='unique_survey_cell')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0004_surveycell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votemodel',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
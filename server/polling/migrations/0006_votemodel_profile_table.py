@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0005_votemodel_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votemodel',
+            name='profile_table',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votemodel',
+            name='booster',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='votemodel',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='votemodel',
+            name='serialized_model',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:20
+
+import django.db.models.deletion
+import polling.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0008_votemodel_native_booster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Poll',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        # The cube only holds derived data, so it is recreated empty and
+        # rebuilt on first read.
+        migrations.DeleteModel(
+            name='SurveyCell',
+        ),
+        migrations.CreateModel(
+            name='SurveyCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate', models.CharField(max_length=100)),
+                ('age', polling.fields.CategoryField(categories=['18-29', '30-44', '45-64', '65+'])),
+                ('gender', polling.fields.CategoryField(categories=['Male', 'Female'])),
+                ('race', polling.fields.CategoryField(categories=['White', 'Black', 'Hispanic', 'Asian'])),
+                ('income', polling.fields.CategoryField(categories=['<50k', '50-100k', '>100k'])),
+                ('urbanity', polling.fields.CategoryField(categories=['rural', 'urban', 'suburban'])),
+                ('education', polling.fields.CategoryField(categories=['college degree', 'no college degree'])),
+                ('count', models.IntegerField(default=0)),
+                ('weight', models.FloatField(default=0.0)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='polling.poll')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('poll', 'candidate', 'age', 'gender', 'race', 'income', 'urbanity', 'education'), name='unique_survey_cell')],
+            },
+        ),
+        # The label columns become nullable so that unapplying the next
+        # migrations can refill them before NOT NULL is restored.
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='poll',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='age',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='gender',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='race',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='income',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='urbanity',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='education',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        # Temporary columns filled by the next migration.
+        migrations.AddField(
+            model_name='surveyresult',
+            name='poll_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polling.poll'),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='age_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='gender_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='race_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='income_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='urbanity_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='surveyresult',
+            name='education_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:21
+
+from django.db import migrations
+
+# Vocabulary at the time of this migration; codes are list positions.
+CATEGORIES = {
+    'age': ['18-29', '30-44', '45-64', '65+'],
+    'gender': ['Male', 'Female'],
+    'race': ['White', 'Black', 'Hispanic', 'Asian'],
+    'income': ['<50k', '50-100k', '>100k'],
+    'urbanity': ['rural', 'urban', 'suburban'],
+    'education': ['college degree', 'no college degree'],
+}
+
+
+def encode_responses(apps, schema_editor):
+    Poll = apps.get_model('polling', 'Poll')
+    SurveyResult = apps.get_model('polling', 'SurveyResult')
+
+    unknown = {}
+    for dim, categories in CATEGORIES.items():
+        values = list(
+            SurveyResult.objects.exclude(**{f'{dim}__in': categories})
+            .values_list(dim, flat=True).distinct()[:10]
+        )
+        if values:
+            unknown[dim] = values
+    if unknown:
+        raise RuntimeError(f"Responses use categories outside the vocabulary, fix them first: {unknown}")
+
+    for name in SurveyResult.objects.values_list('poll', flat=True).distinct():
+        poll = Poll.objects.create(name=name)
+        SurveyResult.objects.filter(poll=name).update(poll_ref=poll)
+
+    for dim, categories in CATEGORIES.items():
+        for code, category in enumerate(categories):
+            SurveyResult.objects.filter(**{dim: category}).update(**{f'{dim}_code': code})
+
+
+def decode_responses(apps, schema_editor):
+    Poll = apps.get_model('polling', 'Poll')
+    SurveyResult = apps.get_model('polling', 'SurveyResult')
+
+    for poll in Poll.objects.all():
+        SurveyResult.objects.filter(poll_ref=poll).update(poll=poll.name)
+
+    for dim, categories in CATEGORIES.items():
+        for code, category in enumerate(categories):
+            SurveyResult.objects.filter(**{f'{dim}_code': code}).update(**{dim: category})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0009_poll_surveyresult_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_responses, decode_responses),
+    ]
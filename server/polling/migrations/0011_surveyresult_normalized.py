@@ -0,0 +1,121 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:22
+
+import django.db.models.deletion
+import polling.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0010_populate_poll_surveyresult_codes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='poll',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='age',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='gender',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='race',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='income',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='urbanity',
+        ),
+        migrations.RemoveField(
+            model_name='surveyresult',
+            name='education',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='poll_ref',
+            new_name='poll',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='age_code',
+            new_name='age',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='gender_code',
+            new_name='gender',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='race_code',
+            new_name='race',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='income_code',
+            new_name='income',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='urbanity_code',
+            new_name='urbanity',
+        ),
+        migrations.RenameField(
+            model_name='surveyresult',
+            old_name='education_code',
+            new_name='education',
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='poll',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='polling.poll'),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='age',
+            field=polling.fields.CategoryField(categories=['18-29', '30-44', '45-64', '65+']),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='gender',
+            field=polling.fields.CategoryField(categories=['Male', 'Female']),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='race',
+            field=polling.fields.CategoryField(categories=['White', 'Black', 'Hispanic', 'Asian']),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='income',
+            field=polling.fields.CategoryField(categories=['<50k', '50-100k', '>100k']),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='urbanity',
+            field=polling.fields.CategoryField(categories=['rural', 'urban', 'suburban']),
+        ),
+        migrations.AlterField(
+            model_name='surveyresult',
+            name='education',
+            field=polling.fields.CategoryField(categories=['college degree', 'no college degree']),
+        ),
+        migrations.AddIndex(
+            model_name='surveyresult',
+            index=models.Index(fields=['poll', 'age', 'gender', 'race', 'income', 'urbanity', 'education'], name='surveyresult_poll_demo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='surveyresult',
+            index=models.Index(fields=['poll', 'candidate'], name='surveyresult_poll_cand_idx'),
+        ),
+    ]
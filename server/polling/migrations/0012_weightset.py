@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0011_surveyresult_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeightSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('version', models.PositiveIntegerField()),
+                ('response_ids', models.BinaryField()),
+                ('weights', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=False)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weight_sets', to='polling.poll')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('poll', 'name', 'version'), name='unique_weight_set_version'), models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('poll',), name='unique_active_weight_set')],
+            },
+        ),
+    ]
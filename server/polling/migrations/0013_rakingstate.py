@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0012_weightset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RakingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('targets_key', models.CharField(max_length=64)),
+                ('target_weights', models.JSONField()),
+                ('multipliers', models.JSONField()),
+                ('solver', models.CharField(default='ipf', max_length=20)),
+                ('weight_set', models.CharField(max_length=100)),
+                ('auto_rerake', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raking_states', to='polling.poll')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('poll', 'targets_key'), name='unique_raking_state')],
+            },
+        ),
+    ]
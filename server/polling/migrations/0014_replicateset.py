@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0013_rakingstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicateSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('replicates', models.PositiveIntegerField()),
+                ('seed', models.PositiveBigIntegerField()),
+                ('cells', models.JSONField()),
+                ('totals', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replicate_sets', to='polling.poll')),
+                ('weight_set', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replicate_sets', to='polling.weightset')),
+            ],
+        ),
+    ]
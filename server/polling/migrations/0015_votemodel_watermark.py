@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0014_replicateset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votemodel',
+            name='trained_max_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='votemodel',
+            name='trained_rows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
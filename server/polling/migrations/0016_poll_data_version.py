@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0015_votemodel_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0016_poll_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='cache_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
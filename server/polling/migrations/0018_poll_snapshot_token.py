@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:40
+
+import uuid
+from django.db import migrations, models
+
+
+def assign_tokens(apps, schema_editor):
+    Poll = apps.get_model('polling', 'Poll')
+    for poll in Poll.objects.all():
+        poll.snapshot_token = uuid.uuid4()
+        poll.save(update_fields=['snapshot_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0017_poll_cache_version'),
+    ]
+
+    operations = [
+        # Existing polls each need their own token before it can be unique.
+        migrations.AddField(
+            model_name='poll',
+            name='snapshot_token',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='poll',
+            name='snapshot_token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:55
+
+import hashlib
+import json
+from django.db import migrations, models
+
+
+def fill_params_keys(apps, schema_editor):
+    # Same canonical form as polling.jobs.params_key at the time of this migration.
+    Job = apps.get_model('polling', 'Job')
+    for job in Job.objects.all():
+        canonical = json.dumps(job.params, sort_keys=True, separators=(',', ':'))
+        job.params_key = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        job.heartbeat_at = job.started_at if job.status == 'running' else None
+        job.save(update_fields=['params_key', 'heartbeat_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0018_poll_snapshot_token'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='job',
+            name='unique_queued_job',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='params_key',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(fill_params_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('kind', 'poll', 'params_key'), name='unique_queued_job'),
+        ),
+    ]
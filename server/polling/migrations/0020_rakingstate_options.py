@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0019_job_params_key_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rakingstate',
+            name='bounds',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rakingstate',
+            name='max_iterations',
+            field=models.PositiveIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='rakingstate',
+            name='method',
+            field=models.CharField(default='numpy', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='rakingstate',
+            name='tolerance',
+            field=models.FloatField(default=0.001),
+        ),
+    ]
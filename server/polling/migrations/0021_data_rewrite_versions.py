@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0020_rakingstate_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='rewrite_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='votemodel',
+            name='trained_data_version',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='votemodel',
+            name='trained_rewrite_version',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
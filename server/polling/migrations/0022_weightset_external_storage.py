@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:25
+
+from django.db import migrations
+
+BLOB_COLUMNS = ('response_ids', 'weights')
+
+
+def set_storage(apps, schema_editor, storage):
+    # weight_sets.lookup_weights reads slices of the blobs with SUBSTR, which
+    # PostgreSQL only serves without detoasting the whole value when it is
+    # stored uncompressed. Other databases have no per-column storage.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    WeightSet = apps.get_model('polling', 'WeightSet')
+    table = schema_editor.quote_name(WeightSet._meta.db_table)
+    for column in BLOB_COLUMNS:
+        column = schema_editor.quote_name(column)
+        schema_editor.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET STORAGE {storage}")
+    # The storage applies to values written from now on, so store the
+    # existing blobs again.
+    assignments = ', '.join(
+        f"{schema_editor.quote_name(column)} = {schema_editor.quote_name(column)} || ''::bytea"
+        for column in BLOB_COLUMNS
+    )
+    schema_editor.execute(f"UPDATE {table} SET {assignments}")
+
+
+def store_uncompressed(apps, schema_editor):
+    set_storage(apps, schema_editor, 'EXTERNAL')
+
+
+def store_compressed(apps, schema_editor):
+    set_storage(apps, schema_editor, 'EXTENDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polling', '0021_data_rewrite_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_uncompressed, store_compressed),
+    ]
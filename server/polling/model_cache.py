@@ -0,0 +1,113 @@
+import pickle
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from polling.concurrency import run_cpu
+from polling.models import VoteModel
+from polling.prediction import profile_key
+from polling.vote_predictor import VotePredictor
+
+class CachedVoteModel:
+    """
+    A loaded VotePredictor together with its precomputed profile table.
+    Profiles that are not in the table are scored and explained by the
+    predictor's booster.
+    """
+
+    def __init__(self, predictor, profile_table=None):
+        self.predictor = predictor
+        self.profile_table = profile_table or {}
+
+    def lookup(self, profile):
+        """Returns the precomputed output for a profile, or None if it is unknown."""
+        return self.profile_table.get(profile_key(profile))
+
+class VoteModelCache:
+    """
+    Per-worker LRU cache of CachedVoteModels, keyed by poll and model
+    version. Checking the version is a tiny query, so a retrain in any worker
+    is picked up without fetching or loading the stored booster again.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, poll):
+        """Returns the CachedVoteModel for a poll, raising VoteModel.DoesNotExist if untrained."""
+        version = VoteModel.objects.filter(poll=poll).values_list('version', flat=True).first()
+        if version is None:
+            raise VoteModel.DoesNotExist(f"No model found for poll: {poll}")
+
+        model = self._lookup(poll, version)
+        if model is None:
+            vote_model = VoteModel.objects.get(poll=poll)
+            model = CachedVoteModel(load_predictor(vote_model), vote_model.profile_table)
+            self.put(poll, vote_model.version, model)
+        return model
+
+    async def aget(self, poll):
+        """
+        Async get(): the version check and a cache miss's fetch use the async
+        ORM, and the stored booster is loaded on the CPU executor.
+        """
+        version = await VoteModel.objects.filter(poll=poll).values_list('version', flat=True).afirst()
+        if version is None:
+            raise VoteModel.DoesNotExist(f"No model found for poll: {poll}")
+
+        model = self._lookup(poll, version)
+        if model is None:
+            vote_model = await VoteModel.objects.aget(poll=poll)
+            model = CachedVoteModel(await run_cpu(load_predictor, vote_model), vote_model.profile_table)
+            self.put(poll, vote_model.version, model)
+        return model
+
+    def put(self, poll, version, model):
+        with self._lock:
+            self._discard(poll)
+            self._entries[(poll, version)] = model
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, poll):
+        with self._lock:
+            self._discard(poll)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0,
+            }
+
+    def _lookup(self, poll, version):
+        with self._lock:
+            key = (poll, version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def _discard(self, poll):
+        for key in [key for key in self._entries if key[0] == poll]:
+            del self._entries[key]
+
+def load_predictor(vote_model):
+    """Builds a VotePredictor from a stored VoteModel, including pre-native pickled pipelines."""
+    if vote_model.booster:
+        return VotePredictor.load(vote_model.booster, vote_model.metadata)
+    return VotePredictor.from_pipeline(pickle.loads(vote_model.serialized_model))
+
+vote_model_cache = VoteModelCache(getattr(settings, 'VOTE_MODEL_CACHE_SIZE', 8))
@@ -1,20 +1,55 @@
+import json
 import pandas as pd
-from polling.models import SurveyResult, VoteModel
+import xgboost as xgb
+from django.db import transaction
+from django.db.models import Count, F, Max
+from polling.models import Poll, SurveyResult, VoteModel
+from polling.model_cache import CachedVoteModel, vote_model_cache
+from polling.model_tuning import tune
+from polling.prediction import build_profile_table
+from polling.response_cache import bump_cache_version
+from polling.snapshots import snapshot_frame
+from polling.vote_predictor import VotePredictor
+from polling.weight_sets import apply_weight_set, get_weight_set
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from xgboost import XGBClassifier
-import pickle
 
-def train_vote_model(poll):
-    # Filter data
-    qs = SurveyResult.objects.filter(poll=poll).values(
-        'candidate', 'age', 'gender', 'race', 'income', 'urbanity', 'education'
-    )
-    df = pd.DataFrame(list(qs))
-    if df.empty:
+# Trees added per incremental update.
+INCREMENTAL_ROUNDS = 10
+
+# An update larger than this share of the rows already trained on is a full
+# retrain: boosting on the new rows alone only suits small additions.
+INCREMENTAL_MAX_FRACTION = 0.5
+
+def train_vote_model(poll, precompute_profiles=False, progress=None, tune_params=False, param_grid=None,
+                     cv=3, n_jobs=None, reuse_tuning=None):
+    """
+    Trains and stores the vote model for a poll. With precompute_profiles, the
+    prediction and SHAP output of every known demographic profile is stored
+    alongside the model so predictions for those profiles become a lookup.
+    progress is an optional callback called with the fraction of work done.
+
+    With tune_params, the model's parameters are chosen by cross-validated
+    search over param_grid (see polling.model_tuning.tune) on n_jobs
+    processes, every fit weighted by the poll's active weights; the stored
+    model is refitted on all responses with the winning parameters, and the
+    search results are stored in its metadata under 'tuning'. Given the
+    'tuning' metadata of an earlier model as reuse_tuning instead, the model
+    is fitted the same way with those parameters without searching again.
+    """
+    progress = progress or (lambda fraction: None)
+
+    # Versions are read before the data, so a write in between is seen as new.
+    versions = _data_versions(poll)
+    # Read the poll's columnar snapshot (label columns are categoricals)
+    df = snapshot_frame(poll)
+    if df is None:
         raise ValueError(f"No survey data available for poll: {poll}")
 
+    progress(0.1)
+
     X = df[['age', 'gender', 'race', 'income', 'urbanity', 'education']]
     y = df['candidate']
 
@@ -30,21 +65,161 @@ def train_vote_model(poll):
         ]
     )
     
-    clf = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('classifier', XGBClassifier(eval_metric='logloss'))
-    ])
-    clf.fit(X, y_encoded)
+    tuning = None if tune_params else reuse_tuning
+    if tune_params or tuning is not None:
+        weights = apply_weight_set(df['id'].to_numpy(), df['weight'].to_numpy(), get_weight_set(poll))
+    if tune_params:
+        best_params, tuning = tune(
+            preprocessor.fit_transform(X), y_encoded, weights, param_grid=param_grid, cv=cv, n_jobs=n_jobs,
+            progress=lambda fraction: progress(0.1 + 0.5 * fraction),
+        )
+        tuning['params'] = best_params
+    if tuning is not None:
+        clf = Pipeline(steps=[
+            ('preprocessor', preprocessor),
+            ('classifier', XGBClassifier(
+                eval_metric='logloss', n_estimators=tuning['n_estimators'], **tuning['params']
+            ))
+        ])
+        clf.fit(X, y_encoded, classifier__sample_weight=weights)
+    else:
+        clf = Pipeline(steps=[
+            ('preprocessor', preprocessor),
+            ('classifier', XGBClassifier(eval_metric='logloss'))
+        ])
+        clf.fit(X, y_encoded)
+    progress(0.7)
 
     # Store mapping
     clf.mapping = mapping
 
-    model_bytes = pickle.dumps(clf)
+    # Store the booster natively instead of pickling the whole pipeline
+    predictor = VotePredictor.from_pipeline(clf)
+    metadata = {'tuning': tuning} if tuning is not None else {}
+    watermark = {'trained_max_id': int(df['id'].max()), 'trained_rows': len(df), **versions}
+    _store_vote_model(poll, predictor, metadata, watermark, precompute_profiles)
+    progress(1.0)
+
+    clf.tuning = tuning
+    return clf
+
+def update_vote_model(poll, precompute_profiles=False, progress=None, rounds=INCREMENTAL_ROUNDS):
+    """
+    Brings a poll's vote model up to date with as little work as the data
+    allows, using the watermark stored with the model:
+
+    - 'skipped': the poll's data_version has not moved since the last
+      training, so no response was written.
+    - 'incremental': responses were only added (its rewrite_version has not
+      moved), so boosting continues from the stored booster for `rounds`
+      trees on the new responses alone.
+    - 'full': anything else (no model yet, edited or deleted responses, a
+      new candidate or category, or too many new rows) falls back to
+      train_vote_model, with the stored model's tuned parameters if it had any.
+
+    Returns a dict with the 'mode' used and the number of 'new_rows'.
+    """
+    progress = progress or (lambda fraction: None)
+    vote_model = VoteModel.objects.filter(poll=poll).first()
+    versions = _data_versions(poll)
+    stats = SurveyResult.objects.filter(poll__name=poll).aggregate(rows=Count('id'), max_id=Max('id'))
+    if stats['rows'] == 0:
+        raise ValueError(f"No survey data available for poll: {poll}")
 
-    # update db
-    VoteModel.objects.update_or_create(
-        poll=poll,
-        defaults={'serialized_model': model_bytes}
+    def full():
+        train_vote_model(
+            poll, precompute_profiles=precompute_profiles, progress=progress,
+            reuse_tuning=vote_model.metadata.get('tuning') if vote_model else None,
+        )
+        return {'mode': 'full', 'new_rows': stats['rows'] - (vote_model.trained_rows if vote_model else 0)}
+
+    if (
+        vote_model is None or not vote_model.booster or vote_model.trained_max_id is None
+        or vote_model.trained_data_version is None
+    ):
+        return full()
+    if vote_model.trained_data_version == versions['trained_data_version']:
+        progress(1.0)
+        return {'mode': 'skipped', 'new_rows': 0}
+    if vote_model.trained_rewrite_version != versions['trained_rewrite_version']:
+        return full()
+
+    # Only the new rows are read, straight from the database: loading the
+    # snapshot would rebuild it from every row after a write.
+    new = SurveyResult.objects.filter(poll__name=poll, id__gt=vote_model.trained_max_id)
+    df = pd.DataFrame(list(new.values(
+        'id', 'weight', 'candidate', 'age', 'gender', 'race', 'income', 'urbanity', 'education'
+    )))
+    # Every older response must still be there, or the model has seen rows that are gone.
+    if len(df) != stats['rows'] - vote_model.trained_rows or len(df) > INCREMENTAL_MAX_FRACTION * vote_model.trained_rows:
+        return full()
+    progress(0.1)
+
+    predictor = VotePredictor.load(vote_model.booster, vote_model.metadata)
+    codes = {candidate: code for code, candidate in predictor.mapping.items()}
+    unseen = any(
+        not set(df[feature]) <= set(predictor.categories[feature]) for feature in predictor.categories
     )
+    if unseen or not set(df['candidate']) <= set(codes):
+        return full()
 
-    return clf
+    # Continue with the objective (and class count) the booster was trained with.
+    learner = json.loads(predictor.booster.save_config())['learner']
+    params = {'objective': learner['objective']['name'], 'eval_metric': 'logloss'}
+    if params['objective'].startswith('multi:'):
+        params['num_class'] = int(learner['learner_model_param']['num_class'])
+    tuning = vote_model.metadata.get('tuning')
+    if tuning:
+        params.update(tuning['params'])
+        weights = apply_weight_set(df['id'].to_numpy(), df['weight'].to_numpy(), get_weight_set(poll))
+    else:
+        weights = None
+    # The trees only see the new rows, but their leaves should also carry the
+    # curvature of the rows already fitted (whose gradients are ~0), which
+    # shrinks each step by the new rows' share of the data.
+    params['learning_rate'] = params.get('learning_rate', 0.3) * len(df) / stats['rows']
+
+    dtrain = xgb.DMatrix(
+        predictor.transform(df), label=df['candidate'].map(codes).to_numpy(), weight=weights,
+        feature_names=predictor.booster.feature_names,
+    )
+    predictor.booster = xgb.train(params, dtrain, num_boost_round=rounds, xgb_model=predictor.booster)
+    progress(0.7)
+
+    metadata = {'tuning': tuning} if tuning else {}
+    watermark = {'trained_max_id': stats['max_id'], 'trained_rows': stats['rows'], **versions}
+    _store_vote_model(poll, predictor, metadata, watermark, precompute_profiles)
+    progress(1.0)
+    return {'mode': 'incremental', 'new_rows': len(df)}
+
+def _data_versions(poll):
+    # The poll's versions as they are stored in a model's watermark.
+    data_version, rewrite_version = Poll.objects.values_list('data_version', 'rewrite_version').get(name=poll)
+    return {'trained_data_version': data_version, 'trained_rewrite_version': rewrite_version}
+
+def _store_vote_model(poll, predictor, extra_metadata, watermark, precompute_profiles):
+    booster_bytes, metadata = predictor.dump()
+    metadata.update(extra_metadata)
+
+    cached = CachedVoteModel(predictor)
+    if precompute_profiles:
+        cached.profile_table = build_profile_table(predictor)
+
+    # update db, bumping the version so every worker's cache sees the new model
+    # (and the poll's cached predictions are dropped)
+    fields = {
+        'serialized_model': b'',
+        'booster': booster_bytes,
+        'metadata': metadata,
+        'profile_table': cached.profile_table or None,
+        **watermark,
+    }
+    with transaction.atomic():
+        vote_model, _ = VoteModel.objects.update_or_create(
+            poll=poll,
+            defaults={**fields, 'version': F('version') + 1},
+            create_defaults={**fields, 'version': 1},
+        )
+        bump_cache_version(name=poll)
+    vote_model.refresh_from_db(fields=['version'])
+    vote_model_cache.put(poll, vote_model.version, cached)
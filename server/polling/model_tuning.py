@@ -0,0 +1,170 @@
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from xgboost import XGBClassifier
+
+# Searched when no grid is given: 18 candidates.
+DEFAULT_PARAM_GRID = {
+    'max_depth': [2, 4, 6],
+    'learning_rate': [0.05, 0.1, 0.3],
+    'min_child_weight': [1, 5],
+}
+
+# Parameters a grid may vary, and the most candidates a grid may produce.
+TUNABLE_PARAMS = (
+    'max_depth', 'learning_rate', 'min_child_weight', 'subsample',
+    'colsample_bytree', 'gamma', 'reg_alpha', 'reg_lambda',
+)
+MAX_GRID_SIZE = 64
+
+# Boosting rounds are capped here and cut short by early stopping on a
+# validation part split off each fold's training rows.
+MAX_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 20
+VALIDATION_FRACTION = 0.2
+
+def expand_grid(param_grid):
+    """Returns the list of parameter dicts in a grid, after checking it is bounded."""
+    if not isinstance(param_grid, dict) or not param_grid:
+        raise ValueError("The parameter grid must be a non-empty dict of parameter -> list of values.")
+    unknown = set(param_grid) - set(TUNABLE_PARAMS)
+    if unknown:
+        raise ValueError(f"Parameters cannot be tuned: {', '.join(sorted(unknown))}")
+    names = list(param_grid)
+    values = [param_grid[name] if isinstance(param_grid[name], list) else [param_grid[name]] for name in names]
+    if any(not options for options in values):
+        raise ValueError("Every tuned parameter needs at least one value.")
+    size = int(np.prod([len(options) for options in values]))
+    if size > MAX_GRID_SIZE:
+        raise ValueError(f"The parameter grid has {size} candidates; at most {MAX_GRID_SIZE} are allowed.")
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def tune(X, y, sample_weight, param_grid=None, cv=3, n_jobs=None, random_state=0, progress=None):
+    """
+    Cross-validates every candidate of a parameter grid for an XGBClassifier
+    and returns (best_params, summary).
+
+    Each candidate is fitted on every fold with early stopping on a
+    VALIDATION_FRACTION of that fold's training rows, so the number of
+    boosting rounds is tuned too, and scored on the fold's held-out part,
+    which neither the fit nor the stopping has seen. The candidates run
+    concurrently on n_jobs processes (default: one per core), each fitting
+    single-threaded. Candidates are ranked by their weighted log loss on
+    the held-out folds.
+
+    X: encoded feature matrix; y: integer class codes.
+    sample_weight: weight of each row, used for fitting and for the metrics.
+    progress: optional callback, called with the fraction of candidates done.
+
+    summary holds the winning candidate's metrics ('log_loss', 'log_loss_std',
+    'accuracy' and the averaged 'n_estimators') and the results and seconds
+    spent for every candidate.
+    """
+    candidates = expand_grid(DEFAULT_PARAM_GRID if param_grid is None else param_grid)
+    if cv < 2:
+        raise ValueError("Cross-validation needs at least 2 folds.")
+    y = np.asarray(y)
+    if np.min(np.bincount(y)) < cv:
+        raise ValueError(f"Every candidate needs at least {cv} responses for {cv}-fold cross-validation.")
+
+    folds = [
+        (*_validation_split(train, y, random_state), test)
+        for train, test in StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state).split(X, y)
+    ]
+    data = {
+        'X': np.asarray(X, dtype=np.float32),
+        'y': y,
+        'sample_weight': np.asarray(sample_weight, dtype=float),
+        'folds': folds,
+        'classes': int(y.max()) + 1,
+        'random_state': random_state,
+    }
+
+    started = time.perf_counter()
+    workers = min(n_jobs or os.cpu_count() or 1, len(candidates))
+    results = [None] * len(candidates)
+    if workers > 1:
+        # XGBoost's OpenMP threads do not survive fork(), so the workers are
+        # spawned; this module imports nothing from Django, so they start cheaply.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_set_tuning_data,
+            initargs=(data,),
+        ) as executor:
+            futures = {executor.submit(_evaluate, params): i for i, params in enumerate(candidates)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done / len(candidates))
+    else:
+        _set_tuning_data(data)
+        for i, params in enumerate(candidates):
+            results[i] = _evaluate(params)
+            if progress is not None:
+                progress((i + 1) / len(candidates))
+        _set_tuning_data(None)
+
+    best = min(range(len(candidates)), key=lambda i: results[i]['log_loss'])
+    summary = {
+        'cv_folds': cv,
+        **{key: results[best][key] for key in ('log_loss', 'log_loss_std', 'accuracy', 'n_estimators')},
+        'seconds': time.perf_counter() - started,
+        'workers': workers,
+        'candidates': results,
+    }
+    return candidates[best], summary
+
+_tuning_data = None
+
+def _set_tuning_data(data):
+    global _tuning_data
+    _tuning_data = data
+
+def _validation_split(train, y, random_state):
+    # Splits a fold's training rows into rows to fit and rows to stop early
+    # on, stratified by class. A class with a single training row keeps it
+    # for fitting, since every class must be fitted.
+    counts = np.bincount(y[train])
+    single = counts[y[train]] < 2
+    rest = train[~single]
+    size = max(int(np.ceil(VALIDATION_FRACTION * len(rest))), np.count_nonzero(counts >= 2))
+    fit, validation = train_test_split(rest, test_size=size, stratify=y[rest], random_state=random_state)
+    return np.concatenate([train[single], fit]), validation
+
+def _evaluate(params):
+    data = _tuning_data
+    X, y, weights = data['X'], data['y'], data['sample_weight']
+    started = time.perf_counter()
+    losses, accuracies, rounds = [], [], []
+    for fit, validation, test in data['folds']:
+        model = XGBClassifier(
+            **params,
+            n_estimators=MAX_ESTIMATORS,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            # The binary metric rejects the per-class predictions of three or more candidates.
+            eval_metric='mlogloss' if data['classes'] > 2 else 'logloss',
+            n_jobs=1,
+            random_state=data['random_state'],
+        )
+        model.fit(
+            X[fit], y[fit], sample_weight=weights[fit],
+            eval_set=[(X[validation], y[validation])], sample_weight_eval_set=[weights[validation]], verbose=False,
+        )
+        probabilities = model.predict_proba(X[test], iteration_range=(0, model.best_iteration + 1))
+        losses.append(log_loss(y[test], probabilities, sample_weight=weights[test], labels=range(data['classes'])))
+        accuracies.append(accuracy_score(y[test], probabilities.argmax(axis=1), sample_weight=weights[test]))
+        rounds.append(model.best_iteration + 1)
+    return {
+        'params': params,
+        'log_loss': float(np.mean(losses)),
+        'log_loss_std': float(np.std(losses)),
+        'accuracy': float(np.mean(accuracies)),
+        'n_estimators': int(round(np.mean(rounds))),
+        'seconds': time.perf_counter() - started,
+    }
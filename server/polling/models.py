@@ -1,24 +1,222 @@
 # polling/models.py
+import uuid
 from django.db import models
+from polling.fields import CategoryField
+
+# Demographic dimensions collected by every poll and their categories.
+DEMOGRAPHIC_CATEGORIES = {
+    'age': ['18-29', '30-44', '45-64', '65+'],
+    'gender': ['Male', 'Female'],
+    'race': ['White', 'Black', 'Hispanic', 'Asian'],
+    'income': ['<50k', '50-100k', '>100k'],
+    'urbanity': ['rural', 'urban', 'suburban'],
+    'education': ['college degree', 'no college degree'],
+}
+DEMOGRAPHIC_FIELDS = list(DEMOGRAPHIC_CATEGORIES)
+
+class Poll(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    # Bumped on every write to the poll's responses; names the current snapshot
+    data_version = models.PositiveBigIntegerField(default=0)
+    # Bumped on writes that change or delete existing responses rather than add new ones
+    rewrite_version = models.PositiveBigIntegerField(default=0)
+    # Bumped on every write that changes what the poll's read endpoints return
+    # (responses, active weights, cube, replicates, vote model); keys cached responses
+    cache_version = models.PositiveBigIntegerField(default=0)
+    # Names the poll's snapshot files, which a later poll reusing its pk must not read
+    snapshot_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    def __str__(self):
+        return self.name
 
 class SurveyResult(models.Model):
-    poll = models.CharField(max_length=100)
+    # Demographics are stored as small-integer codes into DEMOGRAPHIC_CATEGORIES
+    # but read and written as their labels.
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='responses')
     candidate = models.CharField(max_length=100)
-    age = models.CharField(max_length=20)
-    gender = models.CharField(max_length=20)
-    race = models.CharField(max_length=50)
-    income = models.CharField(max_length=20)
-    urbanity = models.CharField(max_length=20)
-    education = models.CharField(max_length=50)
+    age = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['age'])
+    gender = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['gender'])
+    race = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['race'])
+    income = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['income'])
+    urbanity = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['urbanity'])
+    education = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['education'])
     weight = models.FloatField(default=1.0)  # Default weight is 1.0
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['poll', 'age', 'gender', 'race', 'income', 'urbanity', 'education'],
+                name='surveyresult_poll_demo_idx',
+            ),
+            models.Index(fields=['poll', 'candidate'], name='surveyresult_poll_cand_idx'),
+        ]
+
     def __str__(self):
         return f"{self.poll} - {self.candidate} ({self.id})"
 
+class SurveyCell(models.Model):
+    """
+    One cell of a poll's weighted data cube: the number of responses and their
+    total weight for a candidate and a full demographic cross-classification.
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='cells')
+    candidate = models.CharField(max_length=100)
+    age = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['age'])
+    gender = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['gender'])
+    race = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['race'])
+    income = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['income'])
+    urbanity = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['urbanity'])
+    education = CategoryField(categories=DEMOGRAPHIC_CATEGORIES['education'])
+    count = models.IntegerField(default=0)
+    weight = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['poll', 'candidate', 'age', 'gender', 'race', 'income', 'urbanity', 'education'],
+                name='unique_survey_cell',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.poll} - {self.candidate} ({self.count})"
+
+class WeightSet(models.Model):
+    """
+    One named, versioned set of respondent weights for a poll (e.g. an IPF
+    run). Weights are stored column-wise as packed arrays instead of being
+    written back to every SurveyResult row; see polling.weight_sets. On
+    PostgreSQL both blobs are stored uncompressed (migration 0022), so
+    slices of them can be read without fetching the whole set.
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='weight_sets')
+    name = models.CharField(max_length=100)
+    version = models.PositiveIntegerField()
+    response_ids = models.BinaryField()  # Sorted int64 SurveyResult ids
+    weights = models.BinaryField()  # float64 weights aligned with response_ids
+    size = models.PositiveIntegerField(default=0)  # Number of responses weighted
+    is_active = models.BooleanField(default=False)  # Used by the cube, toplines and scenarios
+    params = models.JSONField(default=dict, blank=True)  # How the weights were produced
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['poll', 'name', 'version'], name='unique_weight_set_version'),
+            # At most one active weight set per poll.
+            models.UniqueConstraint(
+                fields=['poll'],
+                condition=models.Q(is_active=True),
+                name='unique_active_weight_set',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.poll} - {self.name} v{self.version}"
+
+class ReplicateSet(models.Model):
+    """
+    Bootstrap replicates of a poll's weighting, used for margins of error.
+    Each replicate is stored as its weighted total for every cube cell
+    (candidate and demographics) rather than as per-response weights.
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='replicate_sets')
+    # The weight set whose raking is replicated; null for the responses' own weights
+    weight_set = models.ForeignKey(
+        WeightSet, null=True, blank=True, on_delete=models.CASCADE, related_name='replicate_sets'
+    )
+    replicates = models.PositiveIntegerField()
+    seed = models.PositiveBigIntegerField()
+    cells = models.JSONField()  # [candidate, age, gender, race, income, urbanity, education] per column
+    totals = models.BinaryField()  # float32, replicates x len(cells), row-major
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.poll} - {self.replicates} replicates of {self.weight_set or 'response weights'}"
+
+class RakingState(models.Model):
+    """
+    The per-category multipliers of the last converged raking run for a poll
+    and target set, used to warm-start the next run after small data changes.
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='raking_states')
+    targets_key = models.CharField(max_length=64)  # SHA-256 of the canonical target_weights JSON
+    target_weights = models.JSONField()
+    multipliers = models.JSONField()  # Dimension -> {category: multiplier}
+    # How the run was raked; automatic re-rakes use the same settings
+    method = models.CharField(max_length=20, default='numpy')
+    solver = models.CharField(max_length=20, default='ipf')
+    bounds = models.JSONField(null=True, blank=True)  # [lower, upper] on the adjustment ratio
+    tolerance = models.FloatField(default=0.001)
+    max_iterations = models.PositiveIntegerField(default=100)
+    weight_set = models.CharField(max_length=100)  # Weight set name re-raking appends to
+    auto_rerake = models.BooleanField(default=False)  # Queue a warm-started re-rake on every write
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['poll', 'targets_key'], name='unique_raking_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.poll} - {self.weight_set} ({self.targets_key[:8]})"
+
 class VoteModel(models.Model):
     poll = models.CharField(max_length=255, unique=True)
-    serialized_model = models.BinaryField()
+    serialized_model = models.BinaryField(blank=True, default=b'')  # Legacy pickled Pipeline
+    booster = models.BinaryField(blank=True, default=b'')  # XGBoost booster in native UBJSON
+    metadata = models.JSONField(default=dict, blank=True)  # Category vocabularies and label mapping
+    version = models.PositiveIntegerField(default=1)  # Bumped on every retrain
+    # Optional prediction + SHAP output for every known demographic profile
+    profile_table = models.JSONField(null=True, blank=True)
+    # Data watermark: the newest response and the number of responses the
+    # model has seen, so an incremental update only has to read what is new
+    trained_max_id = models.BigIntegerField(null=True, blank=True)
+    trained_rows = models.PositiveIntegerField(default=0)
+    # The poll's data_version and rewrite_version when the model was trained:
+    # unchanged data skips training, and rewritten rows force a full retrain
+    trained_data_version = models.PositiveBigIntegerField(null=True, blank=True)
+    trained_rewrite_version = models.PositiveBigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return self.poll
+
+class Job(models.Model):
+    """A background training or IPF run, drained by the `runjobs` management command."""
+    TRAIN = 'train'
+    IPF = 'ipf'
+    KIND_CHOICES = [(TRAIN, 'Train vote model'), (IPF, 'Run IPF')]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    poll = models.CharField(max_length=100)
+    params = models.JSONField(default=dict, blank=True)
+    params_key = models.CharField(max_length=64, blank=True)  # SHA-256 of the canonical params JSON
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0.0)  # Fraction between 0 and 1
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched periodically while running; a job whose worker died stops being touched
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        constraints = [
+            # At most one queued job per kind, poll and params; duplicates are coalesced into it.
+            models.UniqueConstraint(
+                fields=['kind', 'poll', 'params_key'],
+                condition=models.Q(status='queued'),
+                name='unique_queued_job',
+            ),
+        ]
 
     def __str__(self):
-        return self.poll
\ No newline at end of file
+        return f"{self.kind} {self.poll} ({self.status})"
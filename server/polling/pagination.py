@@ -0,0 +1,13 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+class SurveyResultCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: each page is an index range scan
+    after the last id of the previous page, so deep pages cost the same as
+    the first and rows inserted meanwhile are neither skipped nor repeated.
+    """
+    ordering = 'id'
+    page_size = settings.SURVEY_RESULTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
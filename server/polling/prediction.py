@@ -0,0 +1,114 @@
+import itertools
+import numpy as np
+import pandas as pd
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS
+
+class InvalidProfile(ValueError):
+    """Raised for a profile that cannot be scored; index is its position in the batch."""
+
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+def profile_key(profile):
+    """Key of a demographic profile in a model's precomputed profile table."""
+    return "|".join(str(profile[field]) for field in DEMOGRAPHIC_FIELDS)
+
+def check_profiles(input_df, offset=0):
+    """
+    Raises InvalidProfile for the first row of a DataFrame of profiles with a
+    category outside the vocabulary. offset is the position of its first row
+    in the whole batch.
+    """
+    invalid = np.zeros(len(input_df), dtype=bool)
+    for field in DEMOGRAPHIC_FIELDS:
+        invalid |= ~input_df[field].isin(DEMOGRAPHIC_CATEGORIES[field]).to_numpy()
+    if invalid.any():
+        row = int(invalid.argmax())
+        field = next(
+            field for field in DEMOGRAPHIC_FIELDS
+            if input_df[field].iloc[row] not in DEMOGRAPHIC_CATEGORIES[field]
+        )
+        raise InvalidProfile(offset + row, f"Unknown {field}: {input_df[field].iloc[row]}")
+
+def build_profile_table(predictor):
+    """
+    Precomputes the prediction, probability distribution and combined SHAP
+    values for every profile in the cross product of the categories the model
+    was trained on. Six categorical inputs give at most a few hundred profiles.
+    """
+    input_df = pd.DataFrame(
+        list(itertools.product(*[predictor.categories[field] for field in DEMOGRAPHIC_FIELDS])),
+        columns=DEMOGRAPHIC_FIELDS,
+    )
+    predictions, predicted, distributions = predict_profiles(predictor, input_df)
+    explanations = explain_profiles(predictor, input_df, predictions)
+
+    table = {}
+    for i, profile in enumerate(input_df.to_dict('records')):
+        table[profile_key(profile)] = {
+            "predicted_candidate": predicted[i],
+            "probability_distribution": distributions[i],
+            "shap_explanation": explanations[i],
+        }
+    return table
+
+def predict_profiles(predictor, input_df):
+    """
+    Scores a DataFrame of profiles with a single predict_proba call and returns
+    the predicted class codes, the predicted candidates and the probability
+    distribution for each profile.
+    """
+    probabilities = predictor.predict_proba(input_df[DEMOGRAPHIC_FIELDS])
+    predictions = probabilities.argmax(axis=1)
+
+    # Convert numeric classes back to candidate names using the mapping.
+    mapping = predictor.mapping
+    candidates = [mapping.get(i, i) for i in range(probabilities.shape[1])]
+    predicted = [candidates[p] for p in predictions]
+    distributions = [dict(zip(candidates, row)) for row in probabilities.tolist()]
+    return predictions, predicted, distributions
+
+def explain_profiles(predictor, input_df, predictions):
+    """
+    Computes SHAP values for each profile's predicted class, combined per
+    demographic with combine_onehot_shap.
+    """
+    shap_values = predictor.shap_values(input_df[DEMOGRAPHIC_FIELDS])
+    feature_names = predictor.feature_names
+
+    explanations = []
+    for i, predicted_class in enumerate(predictions):
+        # For multi-class, select the values for the predicted class.
+        if shap_values.ndim == 3:
+            shap_vals = shap_values[i, :, predicted_class]
+        else:
+            shap_vals = shap_values[i]
+        explanations.append(combine_onehot_shap(dict(zip(feature_names, shap_vals.tolist()))))
+    return explanations
+
+def combine_onehot_shap(shap_explanation):
+    """
+    Combines one-hot-encoded features for SHAP for ease of explainibility
+    """
+    # List your original categorical features.
+    features = ["age", "gender", "race", "income", "urbanity", "education"]
+    combined = {}
+
+    for feat in features:
+        # Identify keys
+        feat_keys = [k for k in shap_explanation if k.startswith(f"cat__{feat}_")]
+        if feat_keys:
+            total = 0
+            for k in feat_keys:
+                val = shap_explanation[k]
+                if isinstance(val, list):
+                    total += sum(val)
+                else:
+                    total += val
+            combined[feat] = total
+
+    # Sort in decreasing order of magnitude
+    sorted_combined = dict(sorted(combined.items(), key=lambda item: abs(item[1]), reverse=True))
+    
+    return sorted_combined
@@ -0,0 +1,290 @@
+import time
+import numpy as np
+
+SOLVERS = ('ipf', 'newton')
+
+# Largest L1 error, as a share of the total weight, for targets to count as met.
+TARGET_TOLERANCE = 0.001
+
+class RakingError(ValueError):
+    """Raised when the targets cannot be reached, before any iteration is run."""
+
+def encode_column(values, categories):
+    """
+    Encodes a column of category labels as integer codes into `categories`.
+    Values that are not in `categories` get the extra code len(categories),
+    so they are carried along but never adjusted.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.intp)
+    lookup = {cat: i for i, cat in enumerate(categories)}
+    unknown = len(categories)
+    uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    mapping = np.array([lookup.get(u, unknown) for u in uniques], dtype=np.intp)
+    return mapping[inverse.ravel()]
+
+def category_totals(codes, weights, size):
+    """Sums weights per category code, dropping the unknown bucket."""
+    return np.bincount(codes, weights=weights, minlength=size + 1)[:size]
+
+def design_effect(weights):
+    """Kish's design effect due to weighting, n * sum(w^2) / sum(w)^2."""
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if weights.size == 0 or total <= 0:
+        return 1.0
+    return float(weights.size * np.square(weights).sum() / total ** 2)
+
+def check_targets(weights, codes, targets, labels=None):
+    """
+    Raises RakingError for targets IPF could never reach: a category with a
+    positive target but no weight behind it, or two categories of different
+    dimensions holding exactly the same respondents but different targets
+    (which makes IPF move weight back and forth between them forever).
+
+    labels: optional dict of dimension -> category labels, for the messages.
+    """
+    def name(dim, code):
+        return f"{dim} '{labels[dim][code]}'" if labels else f"{dim} category {code}"
+
+    present = np.asarray(weights) > 0
+    members = {}
+    for dim, target in targets.items():
+        size = len(target)
+        members[dim] = np.bincount(codes[dim][present], minlength=size + 1)[:size]
+        empty = np.flatnonzero((members[dim] == 0) & (np.asarray(target) > 0))
+        if empty.size:
+            raise RakingError(f"{name(dim, empty[0])} has no weighted respondents but a non-zero target.")
+
+    dims = list(targets)
+    scale = max((float(np.sum(target)) for target in targets.values()), default=0.0) or 1.0
+    for i, first in enumerate(dims):
+        for second in dims[i + 1:]:
+            size = len(targets[second]) + 1
+            crosstab = np.bincount(
+                codes[first][present] * size + codes[second][present],
+                minlength=(len(targets[first]) + 1) * size,
+            ).reshape(-1, size)
+            for a, b in zip(*np.nonzero(crosstab[:-1, :-1])):
+                count = crosstab[a, b]
+                aliased = count == members[first][a] == members[second][b]
+                if aliased and abs(targets[first][a] - targets[second][b]) > 1e-9 * scale:
+                    raise RakingError(
+                        f"{name(first, a)} and {name(second, b)} contain exactly the same respondents "
+                        f"but have different targets."
+                    )
+
+def rake(weights, codes, targets, tolerance=0.001, max_iterations=100, peaks=None, progress=None,
+         solver='ipf', bounds=None, labels=None, initial_multipliers=None):
+    """
+    Rakes integer-coded columns to the targets and returns the raked weights,
+    the number of iterations, the final maximum change, a list of L1 norm
+    errors per iteration, and a diagnostics dict (per-iteration seconds,
+    whether it converged and met the targets, how many entries ended at a
+    bound, and the per-category multipliers behind the raked weights).
+
+    weights: array of starting weights, one per row (or per cell).
+    codes: dict of dimension -> array of category codes aligned with weights.
+    targets: dict of dimension -> array of target totals per category.
+    peaks: largest single-row weight behind each entry of weights. Only needed
+        when entries aggregate several rows; defaults to weights themselves.
+    progress: optional callback, called after each iteration with the
+        fraction of max_iterations used so far.
+    solver: 'ipf' for sequential proportional fitting, or 'newton' for a
+        GRAKE-style Newton step on the raking multipliers, which usually
+        converges in a handful of iterations.
+    bounds: optional (lower, upper) limits on each entry's adjustment ratio
+        (raked weight / starting weight), used to trim extreme weights.
+    labels: optional dict of dimension -> category labels, for error messages.
+    initial_multipliers: optional dict of dimension -> array of per-category
+        multipliers from an earlier run (diagnostics['multipliers']) to start
+        from, so that a small change in the data only takes a few passes.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown raking solver: {solver}")
+    if bounds is not None:
+        lower, upper = bounds
+        if not 0 <= lower <= 1 <= upper:
+            raise ValueError("Weight bounds must satisfy 0 <= lower <= 1 <= upper.")
+
+    weights = np.array(weights, dtype=float)
+    peaks = weights.copy() if peaks is None else np.array(peaks, dtype=float)
+    check_targets(weights, codes, targets, labels)
+
+    multipliers = {dim: np.ones(len(target)) for dim, target in targets.items()}
+    for dim, initial in (initial_multipliers or {}).items():
+        multipliers[dim] = np.array(initial, dtype=float)
+        if multipliers[dim].shape != (len(targets[dim]),):
+            raise ValueError(f"Expected {len(targets[dim])} initial multipliers for {dim}.")
+
+    solve = _rake_newton if solver == 'newton' else _rake_ipf
+    weights, iteration, max_diff, l1_errors, diagnostics = solve(
+        weights, codes, targets, tolerance, max_iterations, peaks, progress, bounds, multipliers
+    )
+    # Bounds that are too tight can stop the weights moving before the
+    # targets are reached, so report target attainment separately.
+    total = max((float(np.sum(target)) for target in targets.values()), default=0.0)
+    diagnostics['targets_met'] = not l1_errors or l1_errors[-1] <= TARGET_TOLERANCE * total
+    return weights, iteration, max_diff, l1_errors, diagnostics
+
+def _rake_ipf(weights, codes, targets, tolerance, max_iterations, peaks, progress, bounds, multipliers):
+    start_weights = weights.copy()
+    start_peaks = peaks.copy()
+    trimmed = 0
+
+    # Warm start: apply the initial multipliers (all ones by default).
+    for dim, target in targets.items():
+        if np.any(multipliers[dim] != 1):
+            factor = np.append(multipliers[dim], 1.0)[codes[dim]]
+            weights *= factor
+            peaks *= factor
+
+    iteration = 0
+    max_diff = 0.0
+    l1_errors = []
+    iteration_times = []
+
+    while iteration < max_iterations:
+        started = time.perf_counter()
+        max_diff = 0.0
+        # For each dimension, adjust weights.
+        for dim, target in targets.items():
+            size = len(target)
+            current = category_totals(codes[dim], weights, size)
+            adjustment = np.ones(size + 1)
+            np.divide(target, current, out=adjustment[:size], where=current > 0)
+            multipliers[dim] = multipliers[dim] * adjustment[:size]
+
+            factor = adjustment[codes[dim]]
+            if factor.size:
+                max_diff = max(max_diff, float(np.max(np.abs(peaks * (factor - 1)))))
+            weights *= factor
+            peaks *= factor
+
+        if bounds is not None:
+            # Trim: pull adjustment ratios back inside the bounds.
+            ratios = np.ones_like(weights)
+            np.divide(weights, start_weights, out=ratios, where=start_weights > 0)
+            clipped = np.clip(ratios, *bounds)
+            at_bound = clipped != ratios
+            trimmed = int(np.count_nonzero(at_bound))
+            if trimmed:
+                max_diff = max(max_diff, float(np.max(np.abs(start_peaks * (clipped - ratios)))))
+                weights = start_weights * clipped
+                peaks = start_peaks * clipped
+
+        # Compute error
+        l1_error = 0.0
+        for dim, target in targets.items():
+            current = category_totals(codes[dim], weights, len(target))
+            l1_error += float(np.abs(current - target).sum())
+        l1_errors.append(l1_error)
+        iteration_times.append(time.perf_counter() - started)
+        if progress is not None:
+            progress(len(l1_errors) / max_iterations)
+
+        if max_diff < tolerance:
+            break
+        iteration += 1
+
+    diagnostics = {
+        'solver': 'ipf',
+        'converged': max_diff < tolerance,
+        'iteration_times': iteration_times,
+        'trimmed': trimmed,
+        # Trimmed weights are no longer a product of per-category multipliers.
+        'multipliers': None if bounds is not None else {dim: values.tolist() for dim, values in multipliers.items()},
+    }
+    return weights, iteration, max_diff, l1_errors, diagnostics
+
+def _rake_newton(weights, codes, targets, tolerance, max_iterations, peaks, progress, bounds, multipliers):
+    # Every entry in the same cross-classification cell gets the same raking
+    # multiplier exp(x'lambda), so solve for lambda on the cells: one column
+    # of x per category, targets stacked into one vector.
+    dims = list(targets)
+    sizes = [len(targets[dim]) for dim in dims]
+    index = np.zeros(len(weights), dtype=np.intp)
+    for dim, size in zip(dims, sizes):
+        index = index * (size + 1) + codes[dim]
+    cells, first, inverse = np.unique(index, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    base = np.bincount(inverse, weights=weights, minlength=len(cells))
+    cell_peaks = np.zeros(len(cells))
+    np.maximum.at(cell_peaks, inverse, peaks)
+
+    offsets = np.cumsum([0] + sizes)
+    design = np.zeros((len(cells), offsets[-1]))
+    for dim, offset, size in zip(dims, offsets, sizes):
+        cell_codes = codes[dim][first]
+        known = cell_codes < size
+        design[np.flatnonzero(known), offset + cell_codes[known]] = 1.0
+    target = np.concatenate([np.asarray(targets[dim], dtype=float) for dim in dims])
+
+    # Cells in a category with a zero target end up with zero weight; the
+    # exponential can only approach that, so they are fixed up front.
+    zeroed = design[:, target == 0].any(axis=1)
+    lower, upper = bounds if bounds is not None else (0.0, np.inf)
+
+    def ratios_for(lam):
+        ratios = np.clip(np.exp(np.clip(design @ lam, -700, 700)), lower, upper)
+        ratios[zeroed] = 0.0
+        return ratios
+
+    def residual_for(ratios):
+        return target - design.T @ (base * ratios)
+
+    # lambda holds log multipliers; zero multipliers only occur for zero targets.
+    with np.errstate(divide='ignore'):
+        lam = np.clip(np.log(np.concatenate([multipliers[dim] for dim in dims])), -700, 700)
+    ratios = ratios_for(lam)
+    residual = residual_for(ratios)
+
+    iteration = 0
+    max_diff = 0.0
+    l1_errors = []
+    iteration_times = []
+
+    while iteration < max_iterations:
+        started = time.perf_counter()
+        # Newton step on the calibration equations; cells held at a bound do
+        # not respond to lambda, and lstsq copes with the redundancy between
+        # dimensions (every dimension sums to the same total).
+        free = (ratios > lower) & (ratios < upper) & ~zeroed
+        jacobian = design.T @ (design * (base * ratios * free)[:, None])
+        step = np.linalg.lstsq(jacobian, residual, rcond=None)[0]
+
+        # Halve the step until the residual stops growing.
+        norm = np.abs(residual).sum()
+        for _ in range(30):
+            new_ratios = ratios_for(lam + step)
+            new_residual = residual_for(new_ratios)
+            if np.abs(new_residual).sum() <= norm:
+                break
+            step /= 2
+        lam += step
+
+        max_diff = float(np.max(np.abs(cell_peaks * (new_ratios - ratios)))) if len(cells) else 0.0
+        ratios, residual = new_ratios, new_residual
+
+        l1_errors.append(float(np.abs(residual).sum()))
+        iteration_times.append(time.perf_counter() - started)
+        if progress is not None:
+            progress(len(l1_errors) / max_iterations)
+
+        if max_diff < tolerance:
+            break
+        iteration += 1
+
+    at_bound = ((ratios <= lower) | (ratios >= upper)) & ~zeroed
+    trimmed = int(np.count_nonzero(at_bound[inverse])) if bounds is not None else 0
+    diagnostics = {
+        'solver': 'newton',
+        'converged': max_diff < tolerance,
+        'iteration_times': iteration_times,
+        'trimmed': trimmed,
+        'multipliers': {
+            dim: np.exp(lam[offset:offset + size]).tolist() for dim, offset, size in zip(dims, offsets, sizes)
+        },
+    }
+    return weights * ratios[inverse], iteration, max_diff, l1_errors, diagnostics
@@ -0,0 +1,79 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from polling.raking import RakingError, rake
+
+# Process pool workers for batch raking and bootstrap replicates. The web
+# process runs XGBoost's OpenMP threads on its CPU executor, which do not
+# survive fork(), so the workers are spawned. Like polling.model_tuning,
+# this module imports nothing from Django: a spawned worker imports it on
+# its own without setting Django up, and gets the arrays it rakes through
+# the pool's initializer instead of the database.
+
+def raking_pool(workers, initializer, initargs):
+    """A pool of spawned workers that each call initializer(*initargs) once."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+_batch_columns = None
+
+def set_batch_columns(columns):
+    global _batch_columns
+    _batch_columns = columns
+
+def rake_batch_job(poll, mappings, proportions, labels, tolerance, max_iterations, solver, bounds):
+    """
+    Rakes one batch job on the columns of its poll. mappings maps each target
+    dimension's vocabulary codes to positions in its categories (see
+    polling.utils.target_mappings) and proportions holds its target shares.
+    """
+    columns = _batch_columns[poll]
+    weights = columns['weights']
+    codes = {dim: mapping[columns['codes'][dim]] for dim, mapping in mappings.items()}
+    targets = {dim: shares * weights.sum() for dim, shares in proportions.items()}
+
+    weights, iteration, max_diff, l1_errors, diagnostics = rake(
+        weights, codes, targets, tolerance=tolerance, max_iterations=max_iterations,
+        solver=solver, bounds=bounds, labels=labels,
+    )
+    totals = np.bincount(columns['candidate_codes'], weights=weights, minlength=len(columns['candidates']))
+    candidates = {candidate: float(total) for candidate, total in zip(columns['candidates'], totals)}
+    return weights, iteration, max_diff, l1_errors, diagnostics, candidates
+
+_replicate_data = None
+
+def set_replicate_data(data):
+    global _replicate_data
+    _replicate_data = data
+
+def replicate_totals(streams):
+    """The cube cell totals of the bootstrap replicates drawn from streams, raked if data asks for it."""
+    data = _replicate_data
+    weights = data['weights']
+    raking = data['raking']
+    totals = np.empty((len(streams), data['size']))
+    for row, stream in enumerate(streams):
+        resampled = weights * np.random.default_rng(stream).poisson(1.0, len(weights))
+        totals[row] = np.bincount(data['key_index'], weights=resampled, minlength=data['size'])
+        if raking is None:
+            continue
+
+        cell_totals = np.bincount(raking['key_cells'], weights=totals[row], minlength=raking['size'])
+        targets = {dim: proportions * cell_totals.sum() for dim, proportions in raking['proportions'].items()}
+        try:
+            raked, *_ = rake(
+                cell_totals, raking['codes'], targets,
+                tolerance=raking['tolerance'], max_iterations=raking['max_iterations'],
+                peaks=raking['peaks'], solver=raking['solver'], bounds=raking['bounds'],
+                labels=raking['labels'], initial_multipliers=raking['initial_multipliers'],
+            )
+        except RakingError as e:
+            raise RakingError(f"A bootstrap replicate cannot be raked: {e}") from e
+        ratios = np.ones_like(cell_totals)
+        np.divide(raked, cell_totals, out=ratios, where=cell_totals > 0)
+        totals[row] *= ratios[raking['key_cells']]
+    return totals
@@ -0,0 +1,56 @@
+import hashlib
+import json
+from django.db import transaction
+from polling.models import Poll, RakingState
+
+def targets_key(target_weights):
+    """A stable key for a target set, independent of the order of its keys."""
+    canonical = json.dumps(target_weights, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def load_multipliers(poll, target_weights):
+    """
+    Returns the multipliers saved for a poll and target set as a dict of
+    dimension -> list aligned with the categories of target_weights, or None
+    if this target set has not been raked to convergence before or its last
+    run saved no multipliers (trimmed weights).
+    """
+    state = RakingState.objects.filter(poll__name=poll, targets_key=targets_key(target_weights)).first()
+    if state is None or not state.multipliers:
+        return None
+    return {
+        dim: [state.multipliers.get(dim, {}).get(category, 1.0) for category in proportions]
+        for dim, proportions in target_weights.items()
+    }
+
+def save_raking_state(poll, target_weights, multipliers, solver, weight_set, auto_rerake=None, method='numpy',
+                      bounds=None, tolerance=0.001, max_iterations=100):
+    """
+    Remembers the multipliers of a converged run (dimension -> list aligned
+    with the categories of target_weights; empty when the weights were
+    trimmed) and the settings it was raked with. auto_rerake=None keeps the
+    current setting; enabling it turns it off for the poll's other target sets.
+    """
+    defaults = {
+        'target_weights': target_weights,
+        'multipliers': {dim: dict(zip(target_weights[dim], values)) for dim, values in multipliers.items()},
+        'method': method,
+        'solver': solver,
+        'bounds': bounds and list(bounds),
+        'tolerance': tolerance,
+        'max_iterations': max_iterations,
+        'weight_set': weight_set,
+    }
+    if auto_rerake is not None:
+        defaults['auto_rerake'] = auto_rerake
+
+    with transaction.atomic():
+        poll_obj = Poll.objects.get(name=poll)
+        state, _ = RakingState.objects.update_or_create(
+            poll=poll_obj, targets_key=targets_key(target_weights), defaults=defaults
+        )
+        if state.auto_rerake:
+            RakingState.objects.filter(poll=poll_obj, auto_rerake=True).exclude(pk=state.pk).update(
+                auto_rerake=False
+            )
+    return state
@@ -0,0 +1,179 @@
+import os
+import secrets
+import numpy as np
+from django.db import transaction
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Poll, ReplicateSet
+from polling.raking_pool import raking_pool, replicate_totals, set_replicate_data
+from polling.raking_state import load_multipliers
+from polling.response_cache import bump_cache_version
+from polling.snapshots import snapshot_columns
+from polling.utils import target_codes
+
+DEFAULT_REPLICATES = 200
+
+# Normal quantile for 95% margins of error.
+Z_95 = 1.959964
+
+def build_replicate_set(poll, weight_set=None, replicates=DEFAULT_REPLICATES, seed=None, workers=None):
+    """
+    Draws bootstrap replicates of a poll, rakes each one to the same targets
+    (and with the same solver and bounds) as weight_set, and stores them as a
+    new ReplicateSet. Without a weight set, the replicates keep the responses'
+    own weights.
+
+    Each replicate resamples the responses with Poisson(1) counts, so the
+    draws are independent per response and per replicate. Every replicate has
+    its own random stream derived from seed, which makes the result the same
+    for any number of workers; the replicates are raked concurrently in a
+    process pool on the demographic cells rather than on rows.
+
+    Returns the ReplicateSet, or None if the poll has no responses.
+    """
+    if replicates < 2:
+        raise ValueError("At least 2 replicates are needed to estimate a variance.")
+    columns = snapshot_columns(poll)
+    if columns is None:
+        return None
+
+    # One key per cube cell: the candidate plus every demographic.
+    index = columns['candidate_codes'].astype(np.intp)
+    for dim in DEMOGRAPHIC_FIELDS:
+        index = index * (len(DEMOGRAPHIC_CATEGORIES[dim]) + 1) + columns['codes'][dim]
+    keys, first, key_index = np.unique(index, return_index=True, return_inverse=True)
+    key_index = key_index.ravel()
+    cells = [
+        [columns['candidates'][columns['candidate_codes'][row]]]
+        + [_label(dim, columns['codes'][dim][row]) for dim in DEMOGRAPHIC_FIELDS]
+        for row in first
+    ]
+
+    params = weight_set.params if weight_set is not None else {}
+    raking = None
+    if params.get('target_weights'):
+        raking = _raking_cells(poll, params, columns, key_index, len(keys))
+
+    seed = secrets.randbits(63) if seed is None else int(seed)
+    streams = np.random.SeedSequence(seed).spawn(replicates)
+    data = {'weights': columns['weights'], 'key_index': key_index, 'size': len(keys), 'raking': raking}
+
+    workers = min(workers or os.cpu_count() or 1, replicates)
+    chunks = [list(chunk) for chunk in np.array_split(np.array(streams, dtype=object), workers)]
+    if workers > 1:
+        # Workers are started with the columns and never touch the database.
+        with raking_pool(workers, set_replicate_data, (data,)) as executor:
+            totals = list(executor.map(replicate_totals, chunks))
+    else:
+        set_replicate_data(data)
+        totals = [replicate_totals(chunk) for chunk in chunks]
+        set_replicate_data(None)
+
+    with transaction.atomic():
+        replicate_set = ReplicateSet.objects.create(
+            poll=Poll.objects.get(name=poll),
+            weight_set=weight_set,
+            replicates=replicates,
+            seed=seed,
+            cells=cells,
+            totals=np.vstack(totals).astype(np.float32).tobytes(),
+        )
+        # Toplines now carry margins of error.
+        bump_cache_version(name=poll)
+    return replicate_set
+
+def get_replicate_set(poll, weight_set=None):
+    """The latest replicates of a weight set (or of the response weights when None), or None."""
+    return (
+        ReplicateSet.objects.filter(poll__name=poll, weight_set=weight_set)
+        .order_by('-created_at', '-pk')
+        .first()
+    )
+
+def unpack_replicates(replicate_set):
+    """Returns the cells (object array, one row per cube cell) and the replicates x cells totals."""
+    cells = np.array(replicate_set.cells, dtype=object).reshape(-1, len(DEMOGRAPHIC_FIELDS) + 1)
+    totals = np.frombuffer(bytes(replicate_set.totals), dtype=np.float32).reshape(replicate_set.replicates, -1)
+    return cells, totals
+
+def margins_of_error(replicate_set, filters=None, z=Z_95):
+    """
+    Returns 95% margins of error of each candidate's share of the weighted
+    total, overall and within every demographic subgroup, as the spread of
+    that share across the bootstrap replicates.
+
+    filters: dict of demographic -> list of categories to keep.
+    """
+    cells, totals = unpack_replicates(replicate_set)
+    totals = totals.astype(float)
+    selected = np.ones(len(cells), dtype=bool)
+    for dim, categories in (filters or {}).items():
+        selected &= np.isin(cells[:, 1 + DEMOGRAPHIC_FIELDS.index(dim)], list(categories))
+
+    candidates = sorted(set(cells[:, 0]))
+    onehot = (cells[:, 0][:, None] == np.array(candidates, dtype=object)[None, :]).astype(float)
+
+    def margins(mask):
+        by_candidate = totals @ (onehot * mask[:, None])
+        total = by_candidate.sum(axis=1, keepdims=True)
+        shares = np.full_like(by_candidate, np.nan)
+        np.divide(by_candidate, total, out=shares, where=total > 0)
+        # Replicates in which the subgroup drew no respondents carry no information.
+        usable = np.count_nonzero(total > 0)
+        if usable < 2:
+            return {candidate: None for candidate in candidates}
+        spread = np.nanstd(shares, axis=0, ddof=1)
+        return {candidate: float(z * value) for candidate, value in zip(candidates, spread)}
+
+    subgroups = {
+        dim: {
+            cat: margins(selected & (cells[:, 1 + DEMOGRAPHIC_FIELDS.index(dim)] == cat))
+            for cat in categories
+        }
+        for dim, categories in DEMOGRAPHIC_CATEGORIES.items()
+    }
+    return {
+        'replicates': replicate_set.replicates,
+        'confidence': 0.95,
+        'candidates': margins(selected),
+        'subgroups': subgroups,
+    }
+
+def _label(dim, code):
+    categories = DEMOGRAPHIC_CATEGORIES[dim]
+    return categories[code] if code < len(categories) else None
+
+def _raking_cells(poll, params, columns, key_index, size):
+    # Every cube cell maps onto one cross-classification cell of the target
+    # dimensions; the replicates are raked on those cells, like run_ipf's
+    # 'cells' method, and the multipliers carried back to the cube cells.
+    target_weights = params['target_weights']
+    dims = list(target_weights)
+    codes = target_codes(columns['codes'], target_weights)
+
+    index = np.zeros(len(key_index), dtype=np.intp)
+    for dim in dims:
+        index = index * (len(target_weights[dim]) + 1) + codes[dim]
+    cells, first, row_cells = np.unique(index, return_index=True, return_inverse=True)
+    row_cells = row_cells.ravel()
+
+    # Rows of a cube cell always share a raking cell.
+    key_cells = np.zeros(size, dtype=np.intp)
+    key_cells[key_index] = row_cells
+    peaks = np.zeros(len(cells))
+    np.maximum.at(peaks, row_cells, columns['weights'])
+
+    bounds = params.get('bounds')
+    return {
+        'key_cells': key_cells,
+        'size': len(cells),
+        'codes': {dim: codes[dim][first] for dim in dims},
+        'proportions': {
+            dim: np.array([target_weights[dim][cat] for cat in target_weights[dim]], dtype=float) for dim in dims
+        },
+        'peaks': peaks,
+        'labels': {dim: list(target_weights[dim]) for dim in dims},
+        'initial_multipliers': load_multipliers(poll, target_weights),
+        'solver': params.get('solver', 'ipf'),
+        'bounds': bounds and tuple(bounds),
+        'tolerance': params.get('tolerance', 0.001),
+        'max_iterations': params.get('max_iterations', 100),
+    }
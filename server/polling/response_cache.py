@@ -0,0 +1,64 @@
+import hashlib
+import json
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from polling.models import Poll
+
+# Alias in settings.CACHES of the cache holding read endpoint responses.
+RESPONSE_CACHE = 'responses'
+
+def bump_cache_version(**lookup):
+    """Invalidates the cached responses of the polls matching the lookup, e.g. name=poll."""
+    Poll.objects.filter(**lookup).update(cache_version=F('cache_version') + 1)
+
+async def cached_response(request, endpoint, poll, params, compute):
+    """
+    Returns a read endpoint's response for a poll from the response cache,
+    awaiting compute() (which returns a Response) on a miss. Only 200
+    responses are cached.
+
+    Entries are keyed by the poll's cache_version, which every write that
+    changes the poll's results bumps in the same transaction, so a cached
+    response is never served after a write: it is simply never looked up
+    again, and the cache's own eviction drops it.
+
+    GET responses carry an ETag naming the same key, with Cache-Control:
+    no-cache so clients revalidate every time. A request whose
+    If-None-Match matches gets a 304 after only the version query.
+
+    params: JSON-serializable parameters that determine the response.
+    """
+    state = await Poll.objects.filter(name=poll).values_list('pk', 'cache_version').afirst()
+    if state is None:
+        return await compute()
+
+    digest = hashlib.sha256(json.dumps([endpoint, params], sort_keys=True, default=str).encode()).hexdigest()
+    key = f"poll:{state[0]}:{state[1]}:{endpoint}:{digest}"
+    etag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+    conditional = request.method == 'GET'
+    if conditional and _matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    cache = caches[RESPONSE_CACHE]
+    data = await cache.aget(key)
+    if data is not None:
+        response = Response(data, status=status.HTTP_200_OK)
+    else:
+        response = await compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        await cache.aset(key, response.data)
+    if conditional:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+def _matches(if_none_match, etag):
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return '*' in tags or etag in [tag.removeprefix('W/') for tag in tags]
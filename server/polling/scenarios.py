@@ -0,0 +1,113 @@
+import numpy as np
+from polling.aggregation import check_filters, filter_responses
+from polling.cube import ensure_cube
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, SurveyCell
+from polling.raking import encode_column
+
+def evaluate_scenarios(poll, scenarios, filters=None):
+    """
+    Evaluates a batch of hypothetical-shift scenarios against a poll's cube and
+    returns the baseline and the adjusted candidate totals for each scenario.
+
+    Each scenario moves one subgroup toward a candidate, e.g.
+    {"dimension": "age", "category": "18-29", "candidate": "Candidate A", "shift": 10}
+    moves 18-29 year olds 10 points toward Candidate A. "share" may be given
+    instead of "shift" to set the candidate's share of the subgroup outright.
+    The other candidates give up support in proportion to their current share.
+
+    filters: dict of demographic -> list of categories to keep.
+    """
+    check_filters(filters)
+    ensure_cube(poll)
+    cells = list(
+        filter_responses(SurveyCell.objects.filter(poll__name=poll), filters)
+        .values_list('candidate', 'weight', *DEMOGRAPHIC_FIELDS)
+    )
+    columns = list(zip(*cells)) if cells else [()] * (len(DEMOGRAPHIC_FIELDS) + 2)
+    candidates = sorted(set(columns[0]))
+    num_candidates = len(candidates)
+    candidate_codes = encode_column(columns[0], candidates)
+    weights = np.array(columns[1], dtype=float)
+    baseline = np.bincount(candidate_codes, weights=weights, minlength=num_candidates)
+
+    # Weighted totals for every (subgroup, candidate) pair, one block of rows per dimension.
+    subgroup_index = {}
+    blocks = []
+    for dim, values in zip(DEMOGRAPHIC_FIELDS, columns[2:]):
+        categories = DEMOGRAPHIC_CATEGORIES[dim]
+        codes = encode_column(values, categories)
+        totals = np.bincount(
+            codes * num_candidates + candidate_codes,
+            weights=weights,
+            minlength=(len(categories) + 1) * num_candidates,
+        ).reshape(len(categories) + 1, num_candidates)
+        for cat in categories:
+            subgroup_index[(dim, cat)] = len(subgroup_index)
+        blocks.append(totals[:-1])
+    subgroup_totals = np.vstack(blocks)
+
+    rows, targets, shares, shifts = _parse_scenarios(scenarios, subgroup_index, candidates)
+    picks = np.arange(len(rows))
+
+    before = subgroup_totals[rows]
+    before_total = before.sum(axis=1)
+    old_share = np.zeros(len(rows))
+    np.divide(before[picks, targets], before_total, out=old_share, where=before_total > 0)
+    new_share = np.clip(np.where(np.isnan(shares), old_share + shifts / 100, shares / 100), 0, 1)
+
+    # Other candidates absorb the change in proportion to their current support,
+    # or evenly if the subgroup backed the shifted candidate unanimously.
+    others = before.copy()
+    others[picks, targets] = 0
+    others_total = others.sum(axis=1)
+    even = np.ones_like(others)
+    even[picks, targets] = 0
+    spread = np.where(others_total[:, None] > 0, others, even)
+    spread_total = spread.sum(axis=1)
+    scale = np.zeros(len(rows))
+    np.divide((1 - new_share) * before_total, spread_total, out=scale, where=spread_total > 0)
+    after = spread * scale[:, None]
+    after[picks, targets] = new_share * before_total
+
+    adjusted = baseline[None, :] - before + after
+    return {
+        'poll': poll,
+        'baseline': _summarize(baseline, candidates),
+        'scenarios': [
+            {**scenario, **_summarize(totals, candidates)}
+            for scenario, totals in zip(scenarios, adjusted)
+        ],
+    }
+
+def _parse_scenarios(scenarios, subgroup_index, candidates):
+    rows, targets, shares, shifts = [], [], [], []
+    for scenario in scenarios:
+        if not isinstance(scenario, dict):
+            raise ValueError("Each scenario must be an object.")
+        key = (scenario.get('dimension'), scenario.get('category'))
+        if key not in subgroup_index:
+            raise ValueError(f"Unknown subgroup: {key[0]}: {key[1]}")
+        if scenario.get('candidate') not in candidates:
+            raise ValueError(f"Unknown candidate: {scenario.get('candidate')}")
+        if ('share' in scenario) == ('shift' in scenario):
+            raise ValueError("Each scenario needs exactly one of 'shift' or 'share'.")
+        rows.append(subgroup_index[key])
+        targets.append(candidates.index(scenario['candidate']))
+        shares.append(float(scenario.get('share', np.nan)))
+        shifts.append(float(scenario.get('shift', 0)))
+    return (
+        np.array(rows, dtype=np.intp),
+        np.array(targets, dtype=np.intp),
+        np.array(shares, dtype=float),
+        np.array(shifts, dtype=float),
+    )
+
+def _summarize(totals, candidates):
+    total = totals.sum()
+    return {
+        'candidates': dict(zip(candidates, totals.tolist())),
+        'percentages': {
+            candidate: (weight / total * 100 if total else 0)
+            for candidate, weight in zip(candidates, totals.tolist())
+        },
+    }
@@ -1,7 +1,84 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import SurveyResult
+from .models import Job, Poll, ReplicateSet, SurveyResult, WeightSet
+
+class PollNameField(serializers.SlugRelatedField):
+    """
+    Reads and writes a poll by name. Validation only checks the name: the
+    view looks the poll up (creating it on first use) when it saves, inside
+    the write's transaction, so a request that fails validation creates no poll.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field='name', queryset=Poll.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        max_length = Poll._meta.get_field('name').max_length
+        if not isinstance(data, str) or not data.strip():
+            self.fail('invalid')
+        if len(data.strip()) > max_length:
+            raise serializers.ValidationError(f"Ensure this field has no more than {max_length} characters.")
+        return data.strip()
 
 class SurveyResultSerializer(serializers.ModelSerializer):
+    """
+    Pass fields=[...] to serialize only those fields, e.g. for ?fields= projections.
+
+    The weight written is the response's own; the weight read is the one the
+    poll's active weight set gives it, taken from a context['weights'] id ->
+    weight mapping (see polling.weight_sets.active_weights) when it is there.
+    """
+    poll = PollNameField()
+
     class Meta:
         model = SurveyResult
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        weights = self.context.get('weights') or {}
+        if 'weight' in data and instance.pk in weights:
+            data['weight'] = weights[instance.pk]
+        return data
+
+class WeightSetSerializer(serializers.ModelSerializer):
+    poll = serializers.CharField(source='poll.name', read_only=True)
+
+    class Meta:
+        model = WeightSet
+        fields = ['id', 'poll', 'name', 'version', 'is_active', 'size', 'params', 'created_at']
+
+class ReplicateSetSerializer(serializers.ModelSerializer):
+    poll = serializers.CharField(source='poll.name', read_only=True)
+    weight_set = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReplicateSet
+        fields = ['id', 'poll', 'weight_set', 'replicates', 'seed', 'created_at']
+
+    def get_weight_set(self, replicate_set):
+        weight_set = replicate_set.weight_set
+        return weight_set and {'name': weight_set.name, 'version': weight_set.version}
+
+class JobSerializer(serializers.ModelSerializer):
+    duration = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'poll', 'status', 'progress', 'result', 'error',
+            'created_at', 'started_at', 'heartbeat_at', 'finished_at', 'duration',
+        ]
+
+    def get_duration(self, job):
+        """Seconds spent running, so far if the job has not finished."""
+        if job.started_at is None:
+            return None
+        end = job.finished_at or timezone.now()
+        return (end - job.started_at).total_seconds()
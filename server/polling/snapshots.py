@@ -0,0 +1,153 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Poll, SurveyResult
+from polling.raking import encode_column
+
+def bump_data_version(poll_ids, rewrite=False):
+    """
+    Records a write to the responses of the given polls, which invalidates
+    their snapshots and cached responses. Pass rewrite=True for writes that
+    change or delete existing responses instead of only adding new ones.
+    """
+    versions = {'data_version': F('data_version') + 1, 'cache_version': F('cache_version') + 1}
+    if rewrite:
+        versions['rewrite_version'] = F('rewrite_version') + 1
+    Poll.objects.filter(pk__in=set(poll_ids)).update(**versions)
+
+def load_snapshot(poll):
+    """
+    Returns a poll's responses as an Arrow table with the columns id, weight,
+    candidate and the demographics, the last seven dictionary-encoded (the
+    demographic dictionaries are the full vocabularies, so the indices are
+    the stored category codes). Returns None if the poll has no responses.
+
+    The table is memory-mapped from an Arrow IPC file on local disk named
+    after the poll's snapshot_token and data_version, so it is only read
+    from the database again after a write; code that writes responses must
+    call bump_data_version. Inside a transaction, which may hold writes
+    that could still be rolled back, a missing snapshot is built in memory
+    only.
+    """
+    state = Poll.objects.filter(name=poll).values('pk', 'snapshot_token', 'data_version').first()
+    if state is None:
+        return None
+    prefix = _prefix(state['pk'], state['snapshot_token'])
+    path = os.path.join(settings.SNAPSHOT_DIR, f"{prefix}{state['data_version']}.arrow")
+    try:
+        table = _read_snapshot(path)
+    except FileNotFoundError:
+        table = None
+    if table is None:
+        table = _build_snapshot(state['pk'])
+        if not transaction.get_connection().in_atomic_block:
+            # Also drops the files of a deleted poll that had the same pk.
+            _write_snapshot(table, path, prefix=f"{state['pk']}-")
+    return table if table.num_rows else None
+
+def snapshot_columns(poll):
+    """
+    Returns a poll's snapshot as NumPy arrays that share memory with the
+    mapped file: 'ids', 'weights', 'candidates' (sorted labels),
+    'candidate_codes' and 'codes' (dimension -> codes into
+    DEMOGRAPHIC_CATEGORIES). Returns None if the poll has no responses.
+    """
+    table = load_snapshot(poll)
+    if table is None:
+        return None
+    candidate = _column(table, 'candidate')
+    return {
+        'ids': _column(table, 'id').to_numpy(),
+        'weights': _column(table, 'weight').to_numpy(),
+        'candidates': candidate.dictionary.to_pylist(),
+        'candidate_codes': candidate.indices.to_numpy(),
+        'codes': {dim: _column(table, dim).indices.to_numpy() for dim in DEMOGRAPHIC_FIELDS},
+    }
+
+def snapshot_frame(poll):
+    """A poll's snapshot as a DataFrame with categorical label columns, or None if it has no responses."""
+    columns = snapshot_columns(poll)
+    if columns is None:
+        return None
+    return pd.DataFrame({
+        'id': columns['ids'],
+        'weight': columns['weights'],
+        'candidate': pd.Categorical.from_codes(columns['candidate_codes'], columns['candidates']),
+        **{
+            dim: pd.Categorical.from_codes(columns['codes'][dim], DEMOGRAPHIC_CATEGORIES[dim])
+            for dim in DEMOGRAPHIC_FIELDS
+        },
+    })
+
+@receiver(post_delete, sender=Poll)
+def _remove_poll_snapshots(sender, instance, **kwargs):
+    prefix = _prefix(instance.pk, instance.snapshot_token)
+    transaction.on_commit(lambda: _remove_snapshots(prefix))
+
+def _prefix(poll_id, token):
+    return f"{poll_id}-{token.hex}-"
+
+def _column(table, name):
+    # Snapshots are written as one record batch, so every column is one chunk.
+    return table.column(name).chunk(0)
+
+def _read_snapshot(path):
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+def _build_snapshot(poll_id):
+    rows = list(
+        SurveyResult.objects.filter(poll_id=poll_id)
+        .order_by('id')
+        .values_list('id', 'weight', 'candidate', *DEMOGRAPHIC_FIELDS)
+    )
+    columns = list(zip(*rows)) or [()] * (3 + len(DEMOGRAPHIC_FIELDS))
+    candidates, candidate_codes = np.unique(np.asarray(columns[2], dtype=object), return_inverse=True)
+    arrays = {
+        'id': pa.array(np.asarray(columns[0], dtype=np.int64)),
+        'weight': pa.array(np.asarray(columns[1], dtype=np.float64)),
+        'candidate': pa.DictionaryArray.from_arrays(
+            pa.array(candidate_codes.ravel().astype(np.int32)), pa.array(list(candidates), type=pa.string())
+        ),
+    }
+    for dim, values in zip(DEMOGRAPHIC_FIELDS, columns[3:]):
+        arrays[dim] = pa.DictionaryArray.from_arrays(
+            pa.array(encode_column(values, DEMOGRAPHIC_CATEGORIES[dim]).astype(np.int8)),
+            pa.array(DEMOGRAPHIC_CATEGORIES[dim], type=pa.string()),
+        )
+    return pa.table(arrays).combine_chunks()
+
+def _write_snapshot(table, path, prefix):
+    # Write to a temporary file and rename it into place, so readers never
+    # see a partial snapshot, then drop the poll's older snapshots.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    _remove_snapshots(prefix, keep=path)
+
+def _remove_snapshots(prefix, keep=None):
+    directory = settings.SNAPSHOT_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix) and name.endswith('.arrow') and os.path.join(directory, name) != keep:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
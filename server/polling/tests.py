@@ -1,3 +1,932 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from polling.concurrency import InFlightLimit
+from polling.cube import rebuild_cube
+from polling.database import connects
+from polling.export import EXPORT_COLUMNS
+from polling.ingest import insert_columns
+from polling.jobs import JOB_HANDLERS, claim_next_job, requeue_stale_jobs, run_job, schedule_auto_rerake, submit_job
+from polling.management.commands.benchmarkdb import _mode_settings
+from polling.management.commands.populatedata import DEMOGRAPHICS, generate_poll
+from polling.model_cache import VoteModelCache, load_predictor
+from polling.model_training import train_vote_model, update_vote_model
+from polling.model_tuning import _validation_split, expand_grid, tune
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, Job, Poll, SurveyCell, SurveyResult, VoteModel, WeightSet
+from polling.prediction import explain_profiles, predict_profiles, profile_key
+from polling.raking import SOLVERS, RakingError, rake
+from polling.replicates import Z_95, build_replicate_set, unpack_replicates
+from polling.response_cache import RESPONSE_CACHE
+from polling.snapshots import bump_data_version, load_snapshot
+from polling.utils import run_ipf, run_ipf_batch
+from polling.views import BatchVotePredictionView, ToplineView
+from polling.vote_predictor import MODEL_FORMAT, VotePredictor
+from polling.weight_sets import apply_weight_set, lookup_weights, save_weight_set, unpack
 
-# Create your tests here.
+TARGETS = {
+    'age': {'18-29': 0.2, '30-44': 0.3, '45-64': 0.3, '65+': 0.2},
+    'gender': {'Male': 0.5, 'Female': 0.5},
+    'race': {'White': 0.6, 'Black': 0.15, 'Hispanic': 0.15, 'Asian': 0.1},
+    'education': {'college degree': 0.4, 'no college degree': 0.6},
+}
+
+RESPONSE = {
+    'candidate': 'Candidate A', 'age': '18-29', 'gender': 'Male', 'race': 'White',
+    'income': '<50k', 'urbanity': 'rural', 'education': 'college degree',
+}
+
+def create_responses(poll, count, seed=0):
+    """Creates `count` random responses for a poll (created if needed) and returns the Poll."""
+    rng = np.random.default_rng(seed)
+    poll_obj, _ = Poll.objects.get_or_create(name=poll)
+    SurveyResult.objects.bulk_create([
+        SurveyResult(
+            poll=poll_obj,
+            candidate=str(rng.choice(['Candidate A', 'Candidate B', 'Candidate C'])),
+            **{dim: str(rng.choice(categories)) for dim, categories in DEMOGRAPHIC_CATEGORIES.items()},
+        )
+        for _ in range(count)
+    ])
+    bump_data_version([poll_obj.pk])
+    return poll_obj
+
+def cube_totals(poll):
+    return SurveyCell.objects.filter(poll__name=poll).aggregate(count=Sum('count'), weight=Sum('weight'))
+
+def read_streamed(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    return async_to_sync(read)().decode()
+
+def read_ndjson(response):
+    return [json.loads(line) for line in read_streamed(response).splitlines()]
+
+class RakingParityTests(TestCase):
+    def setUp(self):
+        create_responses('Parity', 600)
+
+    def test_methods_agree(self):
+        results = {
+            method: run_ipf(TARGETS, 'Parity', method=method, weight_set=method, activate=False)
+            for method in ('python', 'numpy', 'cells')
+        }
+        reference_ids, reference = unpack(results['python'][3])
+        for method in ('numpy', 'cells'):
+            iterations, final_change, l1_errors, weight_set, _ = results[method]
+            self.assertEqual(iterations, results['python'][0])
+            self.assertAlmostEqual(final_change, results['python'][1])
+            np.testing.assert_allclose(l1_errors, results['python'][2], rtol=1e-6, atol=1e-9)
+            ids, weights = unpack(weight_set)
+            np.testing.assert_array_equal(ids, reference_ids)
+            np.testing.assert_allclose(weights, reference, rtol=1e-9)
+
+    def test_weights_meet_targets(self):
+        _, _, _, weight_set, diagnostics = run_ipf(TARGETS, 'Parity')
+        self.assertTrue(diagnostics['converged'])
+        ids, weights = unpack(weight_set)
+        ages = dict(SurveyResult.objects.filter(pk__in=ids.tolist()).values_list('pk', 'age'))
+        total = weights.sum()
+        for category, share in TARGETS['age'].items():
+            mask = np.array([ages[pk] == category for pk in ids.tolist()])
+            self.assertAlmostEqual(weights[mask].sum() / total, share, places=2)
+
+class CubeMaintenanceTests(TestCase):
+    def setUp(self):
+        create_responses('Cube', 300)
+        rebuild_cube('Cube')
+
+    def test_writes_keep_cube_in_step(self):
+        created = self.client.post('/api/survey-results/', {'poll': 'Cube', **RESPONSE}, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        pk = created.json()['id']
+        self.client.patch(f'/api/survey-results/{pk}/', {'candidate': 'Candidate B'}, content_type='application/json')
+        self.client.delete(f'/api/survey-results/{SurveyResult.objects.filter(poll__name="Cube").first().pk}/')
+
+        incremental = cube_totals('Cube')
+        rebuild_cube('Cube')
+        self.assertEqual(incremental['count'], cube_totals('Cube')['count'])
+        self.assertAlmostEqual(incremental['weight'], cube_totals('Cube')['weight'])
+        self.assertEqual(incremental['count'], 300)
+
+    def test_write_after_cells_are_cleared_rebuilds_cube(self):
+        # Migration 0009 recreates the cube empty.
+        SurveyCell.objects.all().delete()
+        self.client.post('/api/survey-results/', {'poll': 'Cube', **RESPONSE}, content_type='application/json')
+        self.assertEqual(cube_totals('Cube')['count'], 301)
+
+class ScenarioTests(TestCase):
+    def setUp(self):
+        create_responses('Scenarios', 300)
+        rebuild_cube('Scenarios')
+        self.counts = {
+            (age, candidate): count
+            for age, candidate, count in SurveyResult.objects.filter(poll__name='Scenarios')
+            .values_list('age', 'candidate').annotate(count=Count('id'))
+        }
+
+    def evaluate(self, scenarios, filters=None):
+        return self.client.post(
+            '/api/scenarios/', {'poll': 'Scenarios', 'scenarios': scenarios, 'filters': filters},
+            content_type='application/json',
+        )
+
+    def test_shift_moves_subgroup_support(self):
+        response = self.evaluate([{'dimension': 'age', 'category': '18-29', 'candidate': 'Candidate A', 'shift': 10}])
+        self.assertEqual(response.status_code, 200)
+        baseline = response.json()['baseline']['candidates']
+        adjusted = response.json()['scenarios'][0]['candidates']
+        subgroup = {candidate: self.counts.get(('18-29', candidate), 0) for candidate in baseline}
+        size = sum(subgroup.values())
+        share = subgroup['Candidate A'] / size + 0.1
+        self.assertAlmostEqual(adjusted['Candidate A'], baseline['Candidate A'] - subgroup['Candidate A'] + share * size)
+        others = size - subgroup['Candidate A']
+        for candidate in ('Candidate B', 'Candidate C'):
+            moved = subgroup[candidate] / others * (1 - share) * size
+            self.assertAlmostEqual(adjusted[candidate], baseline[candidate] - subgroup[candidate] + moved)
+        self.assertAlmostEqual(sum(adjusted.values()), 300)
+
+    def test_share_sets_subgroup_support(self):
+        response = self.evaluate([{'dimension': 'age', 'category': '65+', 'candidate': 'Candidate B', 'share': 100}])
+        baseline = response.json()['baseline']['candidates']
+        adjusted = response.json()['scenarios'][0]['candidates']
+        for candidate in ('Candidate A', 'Candidate C'):
+            self.assertAlmostEqual(adjusted[candidate], baseline[candidate] - self.counts.get(('65+', candidate), 0))
+
+    def test_filters_restrict_the_baseline(self):
+        response = self.evaluate(
+            [{'dimension': 'age', 'category': '18-29', 'candidate': 'Candidate A', 'shift': 0}],
+            filters={'gender': ['Male']},
+        )
+        self.assertEqual(response.status_code, 200)
+        males = SurveyResult.objects.filter(poll__name='Scenarios', gender='Male').count()
+        self.assertAlmostEqual(sum(response.json()['baseline']['candidates'].values()), males)
+
+    def test_malformed_requests_are_rejected(self):
+        scenario = {'dimension': 'age', 'category': '18-29', 'candidate': 'Candidate A', 'shift': 5}
+        for scenarios, filters in [
+            (['age'], None),
+            ([scenario], ['gender']),
+            ([scenario], {'age': '18-29'}),
+            ([scenario], {'age': [18]}),
+            ([scenario], {'shoe size': ['9']}),
+        ]:
+            with self.subTest(scenarios=scenarios, filters=filters):
+                self.assertEqual(self.evaluate(scenarios, filters).status_code, 400)
+
+class VoteModelCacheTests(TestCase):
+    def setUp(self):
+        create_responses('Models', 300)
+        train_vote_model('Models')
+        self.cache = VoteModelCache(4)
+
+    def test_retrain_is_picked_up(self):
+        first = self.cache.get('Models')
+        self.assertIs(self.cache.get('Models'), first)
+        train_vote_model('Models')
+        self.assertIsNot(self.cache.get('Models'), first)
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 2))
+
+    def test_async_miss_loads_off_the_event_loop(self):
+        threads = []
+
+        def load(vote_model):
+            threads.append(threading.current_thread().name)
+            return load_predictor(vote_model)
+
+        with mock.patch('polling.model_cache.load_predictor', load):
+            model = async_to_sync(self.cache.aget)('Models')
+            self.assertIs(async_to_sync(self.cache.aget)('Models'), model)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('polling-cpu'))
+
+class BatchPredictionTests(TestCase):
+    profile = {field: RESPONSE[field] for field in DEMOGRAPHIC_FIELDS}
+
+    def setUp(self):
+        create_responses('Batch', 300)
+        train_vote_model('Batch')
+
+    def predict(self, **data):
+        if 'file' in data:
+            return self.client.post('/api/predict-vote/batch/', {'poll': 'Batch', **data})
+        return self.client.post('/api/predict-vote/batch/', {'poll': 'Batch', **data}, content_type='application/json')
+
+    def test_profiles_are_scored_in_order(self):
+        profiles = [self.profile, {**self.profile, 'age': '65+', 'race': 'Asian'}]
+        with self.settings(PREDICTION_CHUNK_SIZE=1):
+            response = self.predict(profiles=profiles)
+        rows = read_ndjson(response)
+        self.assertEqual([row['index'] for row in rows], [0, 1])
+        for profile, row in zip(profiles, rows):
+            single = self.client.post('/api/predict-vote/', {'poll': 'Batch', **profile}, content_type='application/json')
+            self.assertEqual(row['predicted_candidate'], single.json()['predicted_candidate'])
+
+    def test_invalid_profiles_are_rejected_with_their_index(self):
+        for profiles, index in [
+            ([self.profile, 7], 1),
+            ([self.profile, {'age': '18-29'}], 1),
+            ([self.profile, self.profile, {**self.profile, 'age': '99'}], 2),
+            ([{**self.profile, 'income': ['<50k']}], 0),
+        ]:
+            with self.subTest(profiles=profiles):
+                response = self.predict(profiles=profiles)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['index'], index)
+
+    def test_csv_uploads_are_checked(self):
+        header = ','.join(DEMOGRAPHIC_FIELDS)
+        row = ','.join(self.profile[field] for field in DEMOGRAPHIC_FIELDS)
+        malformed = SimpleUploadedFile('profiles.csv', f"{header}\n{row},extra,columns\n".encode())
+        self.assertEqual(self.predict(file=malformed).status_code, 400)
+
+        unknown = SimpleUploadedFile('profiles.csv', f"{header}\n{row}\n{row.replace('18-29', '99')}\n".encode())
+        with self.settings(PREDICTION_CHUNK_SIZE=1):
+            response = self.predict(file=unknown)
+        rows = read_ndjson(response)
+        self.assertEqual(rows[0]['index'], 0)
+        self.assertEqual(rows[-1], {'error': 'Unknown age: 99', 'index': 1})
+
+class ProfileTableTests(TestCase):
+    def setUp(self):
+        create_responses('Profiles', 300)
+        train_vote_model('Profiles', precompute_profiles=True)
+        self.vote_model = VoteModel.objects.get(poll='Profiles')
+        self.predictor = load_predictor(self.vote_model)
+
+    def test_table_covers_every_profile(self):
+        self.assertEqual(
+            len(self.vote_model.profile_table),
+            np.prod([len(self.predictor.categories[field]) for field in DEMOGRAPHIC_FIELDS]),
+        )
+
+    def test_lookups_match_the_booster(self):
+        profiles = pd.DataFrame([RESPONSE, {**RESPONSE, 'age': '45-64', 'income': '>100k'}])[DEMOGRAPHIC_FIELDS]
+        predictions, predicted, distributions = predict_profiles(self.predictor, profiles)
+        explanations = explain_profiles(self.predictor, profiles, predictions)
+        for i, profile in enumerate(profiles.to_dict('records')):
+            stored = self.vote_model.profile_table[profile_key(profile)]
+            self.assertEqual(stored['predicted_candidate'], predicted[i])
+            self.assertEqual(stored['probability_distribution'].keys(), distributions[i].keys())
+            for candidate, probability in distributions[i].items():
+                self.assertAlmostEqual(stored['probability_distribution'][candidate], probability, places=6)
+            self.assertEqual(list(stored['shap_explanation']), list(explanations[i]))
+            for field, value in explanations[i].items():
+                self.assertAlmostEqual(stored['shap_explanation'][field], value, places=6)
+
+        served = self.client.post('/api/predict-vote/', {'poll': 'Profiles', **RESPONSE}, content_type='application/json')
+        self.assertEqual(served.json(), self.vote_model.profile_table[profile_key(RESPONSE)])
+
+class JobQueueTests(TestCase):
+    def test_identical_requests_coalesce(self):
+        job, coalesced = submit_job(Job.IPF, 'Jobs', {'target_weights': TARGETS})
+        again, coalesced_again = submit_job(Job.IPF, 'Jobs', {'target_weights': TARGETS})
+        self.assertFalse(coalesced)
+        self.assertTrue(coalesced_again)
+        self.assertEqual(again.pk, job.pk)
+
+    def test_different_params_get_their_own_job(self):
+        job, _ = submit_job(Job.TRAIN, 'Jobs', {'tune_params': True})
+        other, coalesced = submit_job(Job.TRAIN, 'Jobs', {'incremental': True})
+        self.assertFalse(coalesced)
+        self.assertNotEqual(other.pk, job.pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).params, {'tune_params': True})
+
+    def test_running_job_coalesces_unless_stale(self):
+        job, _ = submit_job(Job.TRAIN, 'Jobs', {})
+        self.assertEqual(claim_next_job().pk, job.pk)
+        self.assertEqual(submit_job(Job.TRAIN, 'Jobs', {})[0].pk, job.pk)
+        self.assertFalse(submit_job(Job.TRAIN, 'Jobs', {}, coalesce_running=False)[1])
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_stale_job_is_requeued(self):
+        job, _ = submit_job(Job.TRAIN, 'Jobs', {})
+        claim_next_job()
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(claim_next_job().pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_stale_worker_does_not_overwrite_a_reclaimed_job(self):
+        job, _ = submit_job(Job.TRAIN, 'Jobs', {})
+        claimed = claim_next_job()
+
+        def handler(job, progress):
+            # The worker looks dead for a while, and another one takes the job.
+            Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+            self.assertEqual(claim_next_job().pk, job.pk)
+            return {'message': 'stale'}
+
+        with mock.patch.dict(JOB_HANDLERS, {Job.TRAIN: handler}):
+            self.assertIsNone(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertIsNone(job.result)
+
+    def test_run_records_the_result(self):
+        create_responses('Jobs', 300)
+        job, _ = submit_job(Job.IPF, 'Jobs', {'target_weights': TARGETS})
+        finished = run_job(claim_next_job())
+        self.assertEqual(finished.status, Job.SUCCEEDED)
+        status = self.client.get(f'/api/jobs/{job.pk}/').json()
+        self.assertEqual(status['status'], Job.SUCCEEDED)
+        self.assertEqual(status['result']['weight_set'], {'name': 'ipf', 'version': 1})
+
+class NativeModelStorageTests(TestCase):
+    def setUp(self):
+        create_responses('Native', 300)
+        self.pipeline = train_vote_model('Native')
+        self.profiles = pd.DataFrame([
+            {field: categories[i % len(categories)] for field, categories in DEMOGRAPHIC_CATEGORIES.items()}
+            for i in range(4)
+        ])
+
+    def test_stored_booster_scores_like_the_pipeline(self):
+        vote_model = VoteModel.objects.get(poll='Native')
+        self.assertEqual(bytes(vote_model.serialized_model), b'')
+        self.assertEqual(vote_model.metadata['format'], MODEL_FORMAT)
+        predictor = load_predictor(vote_model)
+        np.testing.assert_allclose(
+            predictor.predict_proba(self.profiles), self.pipeline.predict_proba(self.profiles), rtol=1e-6
+        )
+        self.assertEqual(predictor.mapping, self.pipeline.mapping)
+
+    def test_pickled_pipelines_still_load(self):
+        VoteModel.objects.filter(poll='Native').update(serialized_model=pickle.dumps(self.pipeline), booster=b'')
+        predictor = load_predictor(VoteModel.objects.get(poll='Native'))
+        np.testing.assert_allclose(
+            predictor.predict_proba(self.profiles), self.pipeline.predict_proba(self.profiles), rtol=1e-6
+        )
+        again = VotePredictor.load(*predictor.dump())
+        np.testing.assert_allclose(again.shap_values(self.profiles), predictor.shap_values(self.profiles), rtol=1e-6)
+
+class BulkIngestTests(TestCase):
+    def test_ndjson_rows_are_validated_and_loaded(self):
+        lines = [
+            json.dumps({'poll': 'Bulk', **RESPONSE}),
+            json.dumps({'poll': 'Bulk', **RESPONSE, 'age': '12-17'}),
+            'not json',
+            json.dumps({'poll': 'Bulk', **RESPONSE, 'weight': '2.5'}),
+            json.dumps(['a list']),
+        ]
+        response = self.client.post(
+            '/api/survey-results/bulk/', '\n'.join(lines), content_type='application/x-ndjson'
+        )
+        summary = response.json()
+        self.assertEqual((summary['accepted'], summary['rejected']), (2, 3))
+        self.assertEqual([error['line'] for error in summary['errors']], [2, 3, 5])
+        self.assertEqual(summary['errors'][0]['error'], 'Unknown age category: 12-17')
+        self.assertEqual(cube_totals('Bulk'), {'count': 2, 'weight': 3.5})
+        self.assertEqual(Poll.objects.get(name='Bulk').data_version, 1)
+
+    def test_csv_uploads_are_loaded(self):
+        fields = ['poll', 'candidate'] + DEMOGRAPHIC_FIELDS
+        rows = [','.join(fields)] + [','.join(['Bulk CSV'] + [RESPONSE[field] for field in fields[1:]])] * 3
+        upload = SimpleUploadedFile('responses.csv', '\n'.join(rows).encode())
+        summary = self.client.post('/api/survey-results/bulk/', {'file': upload}).json()
+        self.assertEqual((summary['accepted'], summary['rejected']), (3, 0))
+        self.assertEqual(SurveyResult.objects.filter(poll__name='Bulk CSV', age='18-29').count(), 3)
+
+    def test_columns_are_inserted(self):
+        poll = Poll.objects.create(name='Columns')
+        insert_columns({
+            'poll_id': [poll.pk] * 2,
+            'candidate': ['Candidate A', 'Candidate B'],
+            **{field: [RESPONSE[field]] * 2 for field in DEMOGRAPHIC_FIELDS},
+        }, chunk_size=1)
+        self.assertEqual(
+            sorted(SurveyResult.objects.filter(poll=poll).values_list('candidate', 'race')),
+            [('Candidate A', 'White'), ('Candidate B', 'White')],
+        )
+        poll.refresh_from_db()
+        self.assertEqual(poll.data_version, 1)
+
+class PopulateDataTests(TestCase):
+    def test_generated_polls_follow_their_template(self):
+        columns = generate_poll('Ohio Senate Primary', 20000, np.random.default_rng(0))
+        ages = pd.Series(columns['age']).value_counts(normalize=True)
+        for category, share in zip(DEMOGRAPHIC_CATEGORIES['age'], DEMOGRAPHICS['Ohio Senate Primary']['age']):
+            self.assertAlmostEqual(ages[category], share, delta=0.02)
+        young = columns['age'] == '18-29'
+        self.assertAlmostEqual(np.mean(columns['candidate'][young] == 'Candidate A'), 0.7, delta=0.03)
+
+    def test_seeded_runs_are_reproducible(self):
+        def populate():
+            call_command('populatedata', responses=400, polls=4, seed=3, stdout=io.StringIO())
+            return list(
+                SurveyResult.objects.order_by('poll__name', 'id')
+                .values_list('poll__name', 'candidate', *DEMOGRAPHIC_FIELDS)
+            )
+
+        first = populate()
+        self.assertEqual(first, populate())
+        self.assertEqual(Poll.objects.count(), 4)
+        self.assertEqual(cube_totals('Synthetic Poll 4')['count'], 400)
+
+class CategoryStorageTests(TestCase):
+    def test_labels_are_stored_as_codes(self):
+        create_responses('Codes', 1)
+        response = SurveyResult.objects.get(poll__name='Codes')
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT age, race FROM {SurveyResult._meta.db_table} WHERE id = %s", [response.pk])
+            stored = cursor.fetchone()
+        self.assertEqual(stored, (
+            DEMOGRAPHIC_CATEGORIES['age'].index(response.age), DEMOGRAPHIC_CATEGORIES['race'].index(response.race)
+        ))
+        self.assertEqual(SurveyResult.objects.filter(poll__name='Codes', age=response.age).count(), 1)
+
+    def test_invalid_write_creates_no_poll(self):
+        response = self.client.post(
+            '/api/survey-results/', {**RESPONSE, 'poll': 'Orphan', 'age': 'unknown'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Poll.objects.filter(name='Orphan').exists())
+
+class PollNormalizationMigrationTests(TransactionTestCase):
+    """Migrations 0009-0011 move poll names and category labels into a Poll table and codes."""
+    before = [('polling', '0008_votemodel_native_booster')]
+    after = [('polling', '0011_surveyresult_normalized')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.latest = self.executor.loader.graph.leaf_nodes('polling')
+        self.migrate(self.before)
+
+    def tearDown(self):
+        self.migrate(self.latest)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_forwards_and_backwards(self):
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        OldResult = apps.get_model('polling', 'SurveyResult')
+        OldResult.objects.create(poll='Ohio', **RESPONSE)
+        OldResult.objects.create(poll='Ohio', **{**RESPONSE, 'age': '65+', 'education': 'no college degree'})
+        OldResult.objects.create(poll='Texas', **{**RESPONSE, 'race': 'Asian'})
+
+        apps = self.migrate(self.after)
+        Result = apps.get_model('polling', 'SurveyResult')
+        self.assertEqual(sorted(apps.get_model('polling', 'Poll').objects.values_list('name', flat=True)), ['Ohio', 'Texas'])
+        self.assertEqual(
+            sorted(Result.objects.filter(poll__name='Ohio').values_list('age', 'education')),
+            [('18-29', 'college degree'), ('65+', 'no college degree')],
+        )
+        self.assertEqual(Result.objects.get(poll__name='Texas').race, 'Asian')
+
+        apps = self.migrate(self.before)
+        OldResult = apps.get_model('polling', 'SurveyResult')
+        self.assertEqual(
+            sorted(OldResult.objects.values_list('poll', 'age', 'race')),
+            [('Ohio', '18-29', 'White'), ('Ohio', '65+', 'White'), ('Texas', '18-29', 'Asian')],
+        )
+
+    def test_unknown_labels_stop_the_migration(self):
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        apps.get_model('polling', 'SurveyResult').objects.create(poll='Ohio', **{**RESPONSE, 'age': '12-17'})
+        with self.assertRaises(RuntimeError):
+            self.migrate(self.after)
+        apps.get_model('polling', 'SurveyResult').objects.all().delete()
+
+class SurveyResultApiTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        create_responses('Api', 100)
+
+    def test_results_carry_active_weights(self):
+        _, _, _, weight_set, _ = run_ipf(TARGETS, 'Api')
+        ids, weights = unpack(weight_set)
+        page = self.client.get('/api/survey-results/?poll=Api&page_size=1000').json()['results']
+        served = {row['id']: row['weight'] for row in page}
+        np.testing.assert_allclose([served[pk] for pk in ids.tolist()], weights)
+        retrieved = self.client.get(f'/api/survey-results/{ids[0]}/').json()
+        self.assertAlmostEqual(retrieved['weight'], weights[0])
+
+    def test_export_carries_active_weights(self):
+        _, _, _, weight_set, _ = run_ipf(TARGETS, 'Api')
+        ids, weights = unpack(weight_set)
+        with self.settings(EXPORT_CHUNK_SIZE=7):
+            response = self.client.get('/api/survey-results/export/?poll=Api&type=ndjson&fields=id,weight')
+        exported = {row['id']: row['weight'] for row in read_ndjson(response)}
+        np.testing.assert_allclose([exported[pk] for pk in ids.tolist()], weights)
+
+        response = self.client.get('/api/survey-results/export/?poll=Api&fields=weight,candidate')
+        rows = list(csv.reader(io.StringIO(read_streamed(response))))
+        self.assertEqual(rows[0], ['weight', 'candidate'])
+        np.testing.assert_allclose([float(row[0]) for row in rows[1:]], weights)
+
+class WeightLookupTests(TestCase):
+    @mock.patch('polling.weight_sets.SEARCH_WINDOW', 8)
+    def test_slices_match_full_lookup(self):
+        rng = np.random.default_rng(1)
+        create_responses('Lookup', 1)
+        # Sparse ids followed by a dense run, which interpolation alone places badly.
+        ids = np.unique(np.concatenate([rng.integers(1, 10**6, 300), np.arange(5 * 10**6, 5 * 10**6 + 300)]))
+        full = save_weight_set('Lookup', 'ipf', ids, rng.random(len(ids)), activate=False)
+        sliced = WeightSet.objects.only('pk', 'size').get(pk=full.pk)
+        for _ in range(50):
+            wanted = np.concatenate([rng.choice(ids, 5), rng.integers(0, 6 * 10**6, 3)])
+            own = rng.random(len(wanted))
+            np.testing.assert_array_equal(
+                lookup_weights(wanted, own, sliced), apply_weight_set(wanted, own, full)
+            )
+
+class BatchRakingTests(TestCase):
+    def setUp(self):
+        create_responses('Batch A', 400, seed=1)
+        create_responses('Batch B', 300, seed=2)
+        self.young = {**TARGETS, 'age': {'18-29': 0.4, '30-44': 0.3, '45-64': 0.2, '65+': 0.1}}
+
+    def test_spawned_workers_match_a_single_process(self):
+        jobs = [
+            {'poll': 'Batch A', 'target_weights': TARGETS, 'weight_set': 'base'},
+            {'poll': 'Batch B', 'target_weights': TARGETS, 'weight_set': 'base'},
+            {'poll': 'Batch A', 'target_weights': self.young, 'weight_set': 'young'},
+        ]
+        serial = run_ipf_batch(jobs, workers=1)
+        parallel = run_ipf_batch(jobs, workers=2)
+        for job, one, two in zip(jobs, serial, parallel):
+            self.assertEqual((two['poll'], two['weight_set'].name), (job['poll'], job['weight_set']))
+            self.assertEqual(one['iterations'], two['iterations'])
+            self.assertEqual(one['candidates'], two['candidates'])
+            np.testing.assert_array_equal(unpack(one['weight_set'])[1], unpack(two['weight_set'])[1])
+            self.assertEqual(two['weight_set'].version, 2)
+
+        _, _, _, single, _ = run_ipf(TARGETS, 'Batch B', weight_set='single', activate=False)
+        np.testing.assert_allclose(unpack(single)[1], unpack(serial[1]['weight_set'])[1], rtol=1e-9)
+
+    def test_malformed_jobs_are_rejected(self):
+        for jobs in [[], [{'poll': 'Batch A'}], [{'poll': 'Batch A', 'target_weights': {'age': [0.5, 0.5]}}]]:
+            with self.subTest(jobs=jobs):
+                response = self.client.post('/api/run-ipf/batch/', {'jobs': jobs}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+class RakingSolverTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.codes = {'a': rng.integers(0, 3, 2000), 'b': rng.integers(0, 4, 2000)}
+        self.weights = rng.uniform(0.5, 2, 2000)
+        total = self.weights.sum()
+        self.targets = {'a': np.array([0.5, 0.3, 0.2]) * total, 'b': np.array([0.1, 0.2, 0.3, 0.4]) * total}
+
+    def test_newton_reaches_the_ipf_solution(self):
+        ipf = rake(self.weights, self.codes, self.targets, tolerance=1e-8, max_iterations=500)
+        newton = rake(self.weights, self.codes, self.targets, tolerance=1e-8, max_iterations=500, solver='newton')
+        self.assertTrue(newton[4]['converged'])
+        self.assertTrue(newton[4]['targets_met'])
+        np.testing.assert_allclose(newton[0], ipf[0], rtol=1e-6)
+
+    def test_bounds_trim_adjustment_ratios(self):
+        for solver in SOLVERS:
+            with self.subTest(solver=solver):
+                weights, _, _, _, diagnostics = rake(
+                    self.weights, self.codes, self.targets, solver=solver, bounds=(0.8, 1.25), max_iterations=200
+                )
+                ratios = weights / self.weights
+                self.assertGreaterEqual(ratios.min(), 0.8 - 1e-9)
+                self.assertLessEqual(ratios.max(), 1.25 + 1e-9)
+                self.assertGreater(diagnostics['trimmed'], 0)
+
+    def test_unreachable_targets_are_reported_up_front(self):
+        codes = {'a': np.array([0, 0, 1, 1]), 'b': np.array([0, 0, 1, 1])}
+        with self.assertRaisesRegex(RakingError, 'same respondents'):
+            rake(np.ones(4), codes, {'a': np.array([2.0, 2.0]), 'b': np.array([1.0, 3.0])})
+        with self.assertRaisesRegex(RakingError, 'no weighted respondents'):
+            rake(np.ones(4), {'a': np.array([0, 0, 0, 0])}, {'a': np.array([2.0, 2.0])})
+
+    def test_invalid_requests_are_rejected(self):
+        create_responses('Solvers', 50)
+        for data in [
+            {'target_weights': {'age': [0.5, 0.5]}},
+            {'target_weights': {'age': {'18-29': 'half'}}},
+            {'target_weights': TARGETS, 'bounds': [2, 3]},
+            {'target_weights': TARGETS, 'solver': 'simplex'},
+            {'target_weights': {'age': {'18-29': 0.5, '30-44': 0.5, 'toddlers': 0.1}}},
+        ]:
+            with self.subTest(data=data):
+                response = self.client.post('/api/run-ipf/', {'poll': 'Solvers', **data}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+class WarmStartTests(TestCase):
+    def setUp(self):
+        create_responses('Warm', 600)
+
+    def test_warm_start_after_a_small_change(self):
+        _, _, _, _, cold = run_ipf(TARGETS, 'Warm', tolerance=1e-6, max_iterations=500)
+        self.client.post('/api/survey-results/', {'poll': 'Warm', **RESPONSE}, content_type='application/json')
+        iterations, _, _, warm_set, warm = run_ipf(
+            TARGETS, 'Warm', tolerance=1e-6, max_iterations=500, warm_start=True
+        )
+        self.assertTrue(warm['warm_start'])
+        again, _, _, cold_set, _ = run_ipf(TARGETS, 'Warm', tolerance=1e-6, max_iterations=500)
+        self.assertLess(iterations, again)
+        np.testing.assert_allclose(unpack(warm_set)[1], unpack(cold_set)[1], rtol=1e-4)
+
+    def test_other_targets_start_cold(self):
+        run_ipf(TARGETS, 'Warm')
+        young = {**TARGETS, 'age': {'18-29': 0.4, '30-44': 0.3, '45-64': 0.2, '65+': 0.1}}
+        _, _, _, _, diagnostics = run_ipf(young, 'Warm', warm_start=True)
+        self.assertFalse(diagnostics['warm_start'])
+
+    def test_auto_rerake_keeps_run_settings(self):
+        run_ipf(TARGETS, 'Warm', method='cells', bounds=(0.2, 5), max_iterations=80, auto_rerake=True)
+        params = schedule_auto_rerake('Warm').params
+        self.assertEqual(params['method'], 'cells')
+        self.assertEqual(params['bounds'], [0.2, 5])
+        self.assertEqual(params['max_iterations'], 80)
+        # Trimmed weights leave no multipliers to start from.
+        _, _, _, _, diagnostics = run_ipf(TARGETS, 'Warm', bounds=(0.2, 5), warm_start=True)
+        self.assertFalse(diagnostics['warm_start'])
+
+class ReplicateTests(TestCase):
+    def setUp(self):
+        create_responses('Replicates', 1000)
+        rebuild_cube('Replicates')
+
+    def test_workers_do_not_change_the_draws(self):
+        _, _, _, weight_set, _ = run_ipf(TARGETS, 'Replicates')
+        serial = build_replicate_set('Replicates', weight_set, replicates=20, seed=7, workers=1)
+        parallel = build_replicate_set('Replicates', weight_set, replicates=20, seed=7, workers=2)
+        np.testing.assert_array_equal(unpack_replicates(serial)[1], unpack_replicates(parallel)[1])
+        # Every replicate is raked to the weight set's targets.
+        cells, totals = unpack_replicates(serial)
+        young = cells[:, 1 + DEMOGRAPHIC_FIELDS.index('age')] == '18-29'
+        np.testing.assert_allclose(totals[:, young].sum(axis=1) / totals.sum(axis=1), 0.2, atol=1e-3)
+
+    def test_margins_match_the_sampling_error(self):
+        build_replicate_set('Replicates', replicates=400, seed=1, workers=1)
+        topline = self.client.get('/api/topline/?poll=Replicates').json()
+        share = topline['candidates']['Candidate A']['count'] / topline['total_count']
+        expected = Z_95 * np.sqrt(share * (1 - share) / topline['total_count'])
+        self.assertAlmostEqual(topline['margins_of_error']['candidates']['Candidate A'], expected, delta=0.2 * expected)
+        self.assertIn('18-29', topline['margins_of_error']['subgroups']['age'])
+
+class TuningTests(TestCase):
+    grid = {'max_depth': [2, 3], 'learning_rate': [0.3]}
+
+    def test_multiclass_polls_are_tuned(self):
+        create_responses('Tuned', 300)
+        model = train_vote_model('Tuned', tune_params=True, param_grid=self.grid, cv=2, n_jobs=1)
+        self.assertEqual(len(model.tuning['candidates']), 2)
+        self.assertIn(model.tuning['params'], expand_grid(self.grid))
+        self.assertEqual(VoteModel.objects.get(poll='Tuned').metadata['tuning']['n_estimators'], model.tuning['n_estimators'])
+
+    def test_spawned_search_matches_a_single_process(self):
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 2, (300, 8)).astype(float)
+        y = (X[:, 0] + X[:, 1] + (rng.random(300) < 0.2)).astype(int) % 3
+        serial = tune(X, y, np.ones(300), param_grid=self.grid, cv=3, n_jobs=1)
+        parallel = tune(X, y, np.ones(300), param_grid=self.grid, cv=3, n_jobs=2)
+        self.assertEqual(serial[0], parallel[0])
+        self.assertAlmostEqual(serial[1]['log_loss'], parallel[1]['log_loss'])
+
+    def test_early_stopping_never_sees_the_scored_fold(self):
+        y = np.array([0] * 40 + [1] * 30 + [2] * 5)
+        train, test = np.arange(0, 75, 2), np.arange(1, 75, 2)
+        fit, validation = _validation_split(train, y, 0)
+        self.assertEqual(sorted(np.concatenate([fit, validation]).tolist()), train.tolist())
+        self.assertFalse(set(validation.tolist()) & set(test.tolist()))
+        self.assertEqual(set(y[fit].tolist()), {0, 1, 2})
+
+class IncrementalTrainingTests(TestCase):
+    def setUp(self):
+        create_responses('Incremental', 400)
+
+    def post(self, poll='Incremental', **data):
+        return self.client.post(
+            '/api/survey-results/', {'poll': poll, **RESPONSE, **data}, content_type='application/json'
+        ).json()
+
+    def test_modes_follow_the_writes(self):
+        self.assertEqual(update_vote_model('Incremental')['mode'], 'full')
+        self.assertEqual(update_vote_model('Incremental')['mode'], 'skipped')
+
+        before = VoteModel.objects.get(poll='Incremental').version
+        self.post()
+        self.post(candidate='Candidate C')
+        self.assertEqual(update_vote_model('Incremental'), {'mode': 'incremental', 'new_rows': 2})
+        vote_model = VoteModel.objects.get(poll='Incremental')
+        self.assertEqual((vote_model.version, vote_model.trained_rows), (before + 1, 402))
+
+        # A write to another poll leaves this one's model alone.
+        self.post(poll='Elsewhere')
+        self.assertEqual(update_vote_model('Incremental')['mode'], 'skipped')
+
+        pk = self.post()['id']
+        self.client.patch(f'/api/survey-results/{pk}/', {'candidate': 'Candidate B'}, content_type='application/json')
+        self.assertEqual(update_vote_model('Incremental')['mode'], 'full')
+
+    def test_fallback_keeps_tuned_params(self):
+        grid = {'max_depth': [2, 3]}
+        model = train_vote_model('Incremental', tune_params=True, param_grid=grid, cv=2, n_jobs=1)
+        self.client.delete(f"/api/survey-results/{SurveyResult.objects.filter(poll__name='Incremental').first().pk}/")
+        self.assertEqual(update_vote_model('Incremental')['mode'], 'full')
+        self.assertEqual(VoteModel.objects.get(poll='Incremental').metadata['tuning']['params'], model.tuning['params'])
+
+class SurveyResultExportTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        create_responses('Export', 25)
+        create_responses('Other', 5)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        ids = []
+        url = '/api/survey-results/?poll=Export&page_size=10&fields=id,age'
+        while url:
+            page = self.client.get(url).json()
+            self.assertTrue(all(set(row) == {'id', 'age'} for row in page['results']))
+            ids += [row['id'] for row in page['results']]
+            if len(ids) == 10:
+                # A row written mid-way shows up on a later page.
+                self.client.post('/api/survey-results/', {'poll': 'Export', **RESPONSE}, content_type='application/json')
+            url = page['next']
+        self.assertEqual(ids, list(SurveyResult.objects.filter(poll__name='Export').order_by('id').values_list('id', flat=True)))
+        self.assertEqual(len(ids), 26)
+
+    def test_export_formats_and_fields(self):
+        with self.settings(EXPORT_CHUNK_SIZE=4):
+            response = self.client.get('/api/survey-results/export/?poll=Export&fields=id,poll,age')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="export.csv"')
+        rows = list(csv.reader(io.StringIO(read_streamed(response))))
+        expected = list(SurveyResult.objects.filter(poll__name='Export').order_by('id').values_list('id', 'age'))
+        self.assertEqual(rows[0], ['id', 'poll', 'age'])
+        self.assertEqual([(int(pk), poll, age) for pk, poll, age in rows[1:]], [(pk, 'Export', age) for pk, age in expected])
+
+        rows = read_ndjson(self.client.get('/api/survey-results/export/?type=ndjson'))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(set(rows[0]), set(EXPORT_COLUMNS))
+
+    def test_unknown_fields_and_formats_are_rejected(self):
+        self.assertEqual(self.client.get('/api/survey-results/?fields=id,shoe_size').status_code, 400)
+        self.assertEqual(self.client.get('/api/survey-results/export/?type=xml').status_code, 400)
+
+class SnapshotTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(self.settings(SNAPSHOT_DIR=directory.name))
+        self.directory = directory.name
+        create_responses('Snapshot', 50)
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_snapshot_is_read_from_disk_until_a_write(self):
+        table = load_snapshot('Snapshot')
+        self.assertEqual(table.num_rows, 50)
+        self.assertEqual(len(self.files()), 1)
+        with self.assertNumQueries(1):
+            self.assertTrue(load_snapshot('Snapshot').equals(table))
+
+        self.client.post('/api/survey-results/', {'poll': 'Snapshot', **RESPONSE}, content_type='application/json')
+        self.assertEqual(load_snapshot('Snapshot').num_rows, 51)
+        self.assertEqual(len(self.files()), 1)
+
+    def test_deleted_polls_leave_no_files(self):
+        load_snapshot('Snapshot')
+        pk = Poll.objects.get(name='Snapshot').pk
+        Poll.objects.filter(name='Snapshot').delete()
+        self.assertEqual(self.files(), [])
+
+        # A new poll with the old poll's id does not read its snapshot.
+        Poll.objects.create(pk=pk, name='Snapshot')
+        self.assertIsNone(load_snapshot('Snapshot'))
+
+class AsyncEndpointTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        create_responses('Async', 300)
+        train_vote_model('Async')
+        self.async_client = AsyncClient()
+
+    async def test_endpoints_are_served_asynchronously(self):
+        response = await self.async_client.post(
+            '/api/survey-results/', {'poll': 'Async', **RESPONSE}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.get(f"/api/survey-results/{response.json()['id']}/")
+        self.assertEqual(response.json()['candidate'], 'Candidate A')
+
+        response = await self.async_client.get('/api/topline/?poll=Async')
+        self.assertEqual(response.json()['total_count'], 301)
+        response = await self.async_client.post(
+            '/api/predict-vote/', {'poll': 'Async', **RESPONSE}, content_type='application/json'
+        )
+        self.assertIn(response.json()['predicted_candidate'], ['Candidate A', 'Candidate B', 'Candidate C'])
+
+    def test_requests_over_the_limit_are_turned_away(self):
+        limit = InFlightLimit(1)
+        self.assertTrue(limit.acquire())
+        with mock.patch.object(ToplineView, 'in_flight_limit', return_value=limit):
+            response = self.client.get('/api/topline/?poll=Async')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual((limit.in_flight, limit.rejected), (1, 1))
+
+        limit.release()
+        with mock.patch.object(ToplineView, 'in_flight_limit', return_value=limit):
+            self.assertEqual(self.client.get('/api/topline/?poll=Async').status_code, 200)
+        self.assertEqual(limit.in_flight, 0)
+
+    def test_streamed_responses_hold_their_slot_until_sent(self):
+        limit = InFlightLimit(1)
+        profile = {field: RESPONSE[field] for field in DEMOGRAPHIC_FIELDS}
+        with mock.patch.object(BatchVotePredictionView, 'in_flight_limit', return_value=limit):
+            response = self.client.post(
+                '/api/predict-vote/batch/', {'poll': 'Async', 'profiles': [profile]}, content_type='application/json'
+            )
+            self.assertEqual(limit.in_flight, 1)
+            self.assertEqual(len(read_ndjson(response)), 1)
+        self.assertEqual(limit.in_flight, 0)
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        create_responses('Cached', 200)
+        rebuild_cube('Cached')
+
+    def test_topline_is_cached_until_a_write(self):
+        first = self.client.get('/api/topline/?poll=Cached')
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/topline/?poll=Cached')
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(self.client.get('/api/topline/?poll=Cached', HTTP_IF_NONE_MATCH=cached['ETag']).status_code, 304)
+
+        self.client.post('/api/survey-results/', {'poll': 'Cached', **RESPONSE}, content_type='application/json')
+        after = self.client.get('/api/topline/?poll=Cached')
+        self.assertNotEqual(after['ETag'], cached['ETag'])
+        self.assertEqual(after.json()['total_count'], 201)
+
+    def test_inactive_weight_set_invalidates(self):
+        url = '/api/topline/?poll=Cached&weight_set=alt'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        ids = list(SurveyResult.objects.filter(poll__name='Cached').values_list('pk', flat=True))
+        save_weight_set('Cached', 'alt', ids, np.full(len(ids), 2.0), activate=False)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['total_weight'], 400.0)
+
+        save_weight_set('Cached', 'alt', ids, np.full(len(ids), 3.0), activate=False)
+        self.assertAlmostEqual(self.client.get(url).json()['total_weight'], 600.0)
+
+    def test_predictions_are_cached_until_the_model_changes(self):
+        train_vote_model('Cached')
+        data = {'poll': 'Cached', **RESPONSE}
+        first = self.client.post('/api/predict-vote/', data, content_type='application/json')
+        with self.assertNumQueries(1):
+            cached = self.client.post('/api/predict-vote/', data, content_type='application/json')
+        self.assertEqual(cached.json(), first.json())
+
+        train_vote_model('Cached')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/predict-vote/', data, content_type='application/json')
+        self.assertGreater(len(queries), 1)
+
+class DatabaseConnectionTests(TestCase):
+    postgresql = {
+        'ENGINE': 'django.db.backends.postgresql', 'NAME': 'polls', 'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'server_side_binding': True, 'prepare_threshold': 5, 'pool': {'max_size': 20}},
+    }
+
+    def test_stats_report_the_connection_settings(self):
+        stats = self.client.get('/api/db-stats/').json()
+        self.assertEqual(stats['vendor'], connection.vendor)
+        self.assertFalse(stats['pooled'])
+        self.assertEqual(stats['connects'], connects())
+        self.assertNotIn('pool', stats)
+
+    def test_benchmark_modes(self):
+        per_request = _mode_settings(self.postgresql, 'per-request', 8)
+        self.assertEqual(per_request['CONN_MAX_AGE'], 0)
+        self.assertEqual(per_request['OPTIONS'], {'server_side_binding': False, 'prepare_threshold': None})
+        persistent = _mode_settings(self.postgresql, 'persistent', 8)
+        self.assertIsNone(persistent['CONN_MAX_AGE'])
+        self.assertEqual(persistent['OPTIONS'], {'server_side_binding': True, 'prepare_threshold': 5})
+
+        sqlite = {**self.postgresql, 'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}}
+        self.assertIsNone(_mode_settings(sqlite, 'persistent-unprepared', 8))
+        self.assertIsNone(_mode_settings(sqlite, 'pool', 8))
+        self.assertIsNone(_mode_settings(sqlite, 'persistent', 8)['CONN_MAX_AGE'])
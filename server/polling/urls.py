@@ -1,6 +1,6 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from .views import SurveyResultViewSet, RunIPFView, TrainVoteModelView, VotePredictionView
+from .views import SurveyResultViewSet, ActivateWeightSetView, BatchRunIPFView, BatchVotePredictionView, DatabaseStatsView, JobStatusView, ModelCacheStatsView, ReplicateSetView, RunIPFView, ScenarioView, ToplineView, TrainVoteModelView, VotePredictionView, WeightSetListView
 
 router = DefaultRouter()
 router.register(r'survey-results', SurveyResultViewSet, basename='surveyresult')
@@ -8,6 +8,16 @@ router.register(r'survey-results', SurveyResultViewSet, basename='surveyresult')
 urlpatterns = [
     path('train-vote-model/', TrainVoteModelView.as_view(), name='train-vote-model'),
     path('run-ipf/', RunIPFView.as_view(), name='run-ipf'),
+    path('run-ipf/batch/', BatchRunIPFView.as_view(), name='run-ipf-batch'),
     path('predict-vote/', VotePredictionView.as_view(), name='predict-vote'),
+    path('predict-vote/batch/', BatchVotePredictionView.as_view(), name='predict-vote-batch'),
+    path('jobs/<int:pk>/', JobStatusView.as_view(), name='job-status'),
+    path('model-cache/', ModelCacheStatsView.as_view(), name='model-cache'),
+    path('db-stats/', DatabaseStatsView.as_view(), name='db-stats'),
+    path('topline/', ToplineView.as_view(), name='topline'),
+    path('scenarios/', ScenarioView.as_view(), name='scenarios'),
+    path('weight-sets/', WeightSetListView.as_view(), name='weight-sets'),
+    path('weight-sets/activate/', ActivateWeightSetView.as_view(), name='weight-set-activate'),
+    path('replicates/', ReplicateSetView.as_view(), name='replicates'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,17 +1,262 @@
-from polling.models import SurveyResult
+import os
+import time
+import numpy as np
+from polling.cube import rebuild_cube
+from polling.models import DEMOGRAPHIC_CATEGORIES, DEMOGRAPHIC_FIELDS, SurveyResult
+from polling.raking import design_effect, rake
+from polling.raking_pool import rake_batch_job, raking_pool, set_batch_columns
+from polling.raking_state import load_multipliers, save_raking_state
+from polling.snapshots import snapshot_columns
+from polling.weight_sets import save_weight_set
 
-def run_ipf(target_weights, poll, tolerance=0.001, max_iterations=100):
+IPF_METHODS = ('numpy', 'cells', 'python')
+
+def run_ipf(target_weights, poll, tolerance=0.001, max_iterations=100, method='numpy', progress=None,
+            weight_set='ipf', activate=True, solver='ipf', bounds=None, warm_start=False, auto_rerake=None):
     """
     Runs IPF on responses for a given survey (poll) and returns the number
-    of iterations, the final maximum change, and a list of L1 norm errors per iteration.
-    
+    of iterations, the final maximum change, a list of L1 norm errors per
+    iteration, the WeightSet holding the raked weights (None if the poll
+    has no responses), and a diagnostics dict with the seconds spent per
+    iteration and the design effect of the raked weights.
+
+    Raking starts from each response's own weight and the result is appended
+    as a new version of a named weight set; the responses are not modified.
+
     target_weights: dict of proportions for each demographic (they should sum to 1 per dimension).
     poll: the poll name for which to run IPF.
+    method: 'numpy' rakes integer-coded columns with NumPy; 'cells' rakes the
+        demographic cross-classification instead of individual rows; 'python'
+        is the original row-by-row loop, kept as a reference for parity checks.
+    progress: optional callback, called after each iteration with the
+        fraction of max_iterations used so far.
+    weight_set: name of the weight set to add a version to.
+    activate: whether the new version becomes the poll's active weight set.
+    solver, bounds: see polling.raking.rake; the 'python' method only
+        supports plain IPF without bounds.
+    warm_start: start from the multipliers of the last converged run with the
+        same targets (see polling.raking_state), so re-raking after a few
+        writes only takes a pass or two.
+    auto_rerake: True/False turns queuing a warm-started re-rake on every
+        write to the poll on/off for these targets; None leaves it unchanged.
+
+    Raises polling.raking.RakingError (a ValueError) when the targets cannot
+    be reached because a category is empty or two categories are aliased.
+    """
+    if method not in IPF_METHODS:
+        raise ValueError(f"Unknown IPF method: {method}")
+    unknown = set(target_weights) - set(DEMOGRAPHIC_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown demographic: {', '.join(sorted(unknown))}")
+    if method == 'python':
+        if solver != 'ipf' or bounds is not None or warm_start:
+            raise ValueError("The 'python' method only supports the 'ipf' solver without bounds or warm starts.")
+        result = _run_ipf_python(target_weights, poll, tolerance, max_iterations)
+    else:
+        initial_multipliers = load_multipliers(poll, target_weights) if warm_start else None
+        run = _run_ipf_cells if method == 'cells' else _run_ipf_numpy
+        result = run(
+            target_weights, poll, tolerance, max_iterations, progress,
+            solver=solver, bounds=bounds, initial_multipliers=initial_multipliers,
+        )
+        if result is not None:
+            result[-1]['warm_start'] = initial_multipliers is not None
+    if result is None:
+        return 0, 0, [], None, {}  # Nothing to do if no responses
+
+    ids, weights, iteration, max_diff, l1_errors, diagnostics = result
+    diagnostics['design_effect'] = design_effect(weights)
+    params = {
+        'target_weights': target_weights,
+        'method': method,
+        'solver': solver,
+        'bounds': bounds and list(bounds),
+        'tolerance': tolerance,
+        'max_iterations': max_iterations,
+        'iterations': iteration,
+        'final_change': max_diff,
+        'design_effect': diagnostics['design_effect'],
+    }
+    saved = save_weight_set(poll, weight_set, ids, weights, params=params, activate=activate)
+    if activate:
+        # The active weights changed wholesale, so the poll's cube is rebuilt.
+        rebuild_cube(poll)
+    if method != 'python' and diagnostics['converged']:
+        save_raking_state(
+            poll, target_weights, diagnostics.get('multipliers') or {}, solver, weight_set, auto_rerake=auto_rerake,
+            method=method, bounds=bounds, tolerance=tolerance, max_iterations=max_iterations,
+        )
+    return iteration, max_diff, l1_errors, saved, diagnostics
+
+def run_ipf_batch(jobs, tolerance=0.001, max_iterations=100, workers=None, solver='ipf', bounds=None):
+    """
+    Rakes several polls, each against one or more target sets, and returns
+    one result dict per job in order. Each poll's responses are loaded once
+    and shared by all of its jobs; the jobs are raked concurrently in a
+    process pool and every result is stored as a new weight set version.
+
+    jobs: list of dicts with 'poll', 'target_weights' and optionally
+        'weight_set' (name, default 'ipf') and 'activate' (default False).
+    workers: number of processes; defaults to one per CPU core.
+    solver, bounds: see polling.raking.rake.
+    """
+    for job in jobs:
+        unknown = set(job['target_weights']) - set(DEMOGRAPHIC_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown demographic: {', '.join(sorted(unknown))}")
+
+    columns = {poll: snapshot_columns(poll) for poll in {job['poll'] for job in jobs}}
+    tasks = [
+        (
+            job['poll'], target_mappings(job['target_weights']), _targets(job['target_weights'], 1.0),
+            _labels(job['target_weights']), tolerance, max_iterations, solver, bounds,
+        )
+        for job in jobs
+        if columns[job['poll']] is not None
+    ]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        # Workers only run NumPy on the columns they are started with; they
+        # never touch the database.
+        shared = {
+            poll: {key: polled[key] for key in ('weights', 'codes', 'candidates', 'candidate_codes')}
+            for poll, polled in columns.items()
+            if polled is not None
+        }
+        with raking_pool(workers, set_batch_columns, (shared,)) as executor:
+            raked = list(executor.map(rake_batch_job, *zip(*tasks)))
+    else:
+        set_batch_columns(columns)
+        raked = [rake_batch_job(*task) for task in tasks]
+        set_batch_columns(None)
+
+    results = []
+    activated = set()
+    raked = iter(raked)
+    for job in jobs:
+        poll = job['poll']
+        if columns[poll] is None:
+            results.append({
+                'poll': poll, 'iterations': 0, 'final_change': 0, 'l1_errors': [], 'diagnostics': {}, 'weight_set': None,
+            })
+            continue
+
+        weights, iteration, max_diff, l1_errors, diagnostics, candidates = next(raked)
+        diagnostics['design_effect'] = design_effect(weights)
+        params = {
+            'target_weights': job['target_weights'],
+            'method': 'numpy',
+            'solver': solver,
+            'bounds': bounds and list(bounds),
+            'tolerance': tolerance,
+            'max_iterations': max_iterations,
+            'iterations': iteration,
+            'final_change': max_diff,
+            'design_effect': diagnostics['design_effect'],
+        }
+        activate = job.get('activate', False)
+        weight_set = save_weight_set(
+            poll, job.get('weight_set', 'ipf'), columns[poll]['ids'], weights, params=params, activate=activate
+        )
+        if activate:
+            activated.add(poll)
+        results.append({
+            'poll': poll,
+            'iterations': iteration,
+            'final_change': max_diff,
+            'l1_errors': l1_errors,
+            'diagnostics': diagnostics,
+            'candidates': candidates,
+            'weight_set': weight_set,
+        })
+
+    for poll in activated:
+        rebuild_cube(poll)
+    return results
+
+def _run_ipf_numpy(target_weights, poll, tolerance=0.001, max_iterations=100, progress=None, **options):
+    columns = snapshot_columns(poll)
+    if columns is None:
+        return None
+
+    codes = target_codes(columns['codes'], target_weights)
+    targets = _targets(target_weights, columns['weights'].sum())
+    weights, iteration, max_diff, l1_errors, diagnostics = rake(
+        columns['weights'], codes, targets, tolerance=tolerance, max_iterations=max_iterations, progress=progress,
+        labels=_labels(target_weights), **options,
+    )
+
+    return columns['ids'], weights, iteration, max_diff, l1_errors, diagnostics
+
+def _run_ipf_cells(target_weights, poll, tolerance=0.001, max_iterations=100, progress=None, **options):
+    # Every response in the same cross-classification cell gets the same
+    # multiplier, so rake the cell totals and expand the multipliers to rows.
+    columns = snapshot_columns(poll)
+    if columns is None:
+        return None
+
+    row_codes = target_codes(columns['codes'], target_weights)
+    index = np.zeros(len(columns['ids']), dtype=np.intp)
+    for dim in target_weights:
+        index = index * (len(target_weights[dim]) + 1) + row_codes[dim]
+    cells, first, inverse = np.unique(index, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    totals = np.bincount(inverse, weights=columns['weights'], minlength=len(cells))
+    peaks = np.zeros(len(cells))
+    np.maximum.at(peaks, inverse, columns['weights'])
+
+    codes = {dim: row_codes[dim][first] for dim in target_weights}
+    targets = _targets(target_weights, totals.sum())
+    weights, iteration, max_diff, l1_errors, diagnostics = rake(
+        totals, codes, targets, tolerance=tolerance, max_iterations=max_iterations,
+        peaks=peaks, progress=progress, labels=_labels(target_weights), **options,
+    )
+
+    multipliers = np.ones_like(totals)
+    np.divide(weights, totals, out=multipliers, where=totals > 0)
+    return columns['ids'], columns['weights'] * multipliers[inverse], iteration, max_diff, l1_errors, diagnostics
+
+def target_mappings(target_weights):
+    """
+    Maps each target dimension's vocabulary codes (positions in
+    DEMOGRAPHIC_CATEGORIES, plus one past the end for a missing category) to
+    positions in its categories in target_weights, with len(categories) for
+    categories that have no target.
     """
+    mappings = {}
+    for dim, proportions in target_weights.items():
+        categories = list(proportions)
+        lookup = {category: i for i, category in enumerate(categories)}
+        mappings[dim] = np.array(
+            [lookup.get(category, len(categories)) for category in DEMOGRAPHIC_CATEGORIES[dim]] + [len(categories)],
+            dtype=np.intp,
+        )
+    return mappings
+
+def target_codes(codes, target_weights):
+    """
+    Maps vocabulary codes (dimension -> codes into DEMOGRAPHIC_CATEGORIES, as
+    in a snapshot) to positions in each target dimension's categories, with
+    len(categories) for categories that have no target.
+    """
+    return {dim: mapping[codes[dim]] for dim, mapping in target_mappings(target_weights).items()}
+
+def _labels(target_weights):
+    return {dim: list(proportions) for dim, proportions in target_weights.items()}
+
+def _targets(target_weights, total_weight):
+    # Target totals per category, in the order of target_weights.
+    return {
+        dim: np.array([proportions[cat] for cat in proportions], dtype=float) * total_weight
+        for dim, proportions in target_weights.items()
+    }
+
+def _run_ipf_python(target_weights, poll, tolerance=0.001, max_iterations=100):
     # Filter responses for the given poll
-    responses = list(SurveyResult.objects.filter(poll=poll))
+    responses = list(SurveyResult.objects.filter(poll__name=poll))
     if not responses:
-        return 0, 0, []  # Nothing to do if no responses
+        return None
 
     total_weight = sum(response.weight for response in responses)
 
@@ -24,8 +269,10 @@ def run_ipf(target_weights, poll, tolerance=0.001, max_iterations=100):
 
     iteration = 0
     l1_errors = []
+    iteration_times = []
 
     while iteration < max_iterations:
+        started = time.perf_counter()
         max_diff = 0
         # For each dimension, adjust weights.
         for dim, targets in target_totals.items():
@@ -54,12 +301,18 @@ def run_ipf(target_weights, poll, tolerance=0.001, max_iterations=100):
             for cat, target in targets.items():
                 l1_error += abs(current_totals[cat] - target)
         l1_errors.append(l1_error)
+        iteration_times.append(time.perf_counter() - started)
 
         if max_diff < tolerance:
             break
         iteration += 1
 
-    # Bulk update weights
-    SurveyResult.objects.bulk_update(responses, ['weight'])
-
-    return iteration, max_diff, l1_errors
+    ids = [response.id for response in responses]
+    weights = [response.weight for response in responses]
+    diagnostics = {
+        'solver': 'ipf',
+        'converged': max_diff < tolerance,
+        'iteration_times': iteration_times,
+        'trimmed': 0,
+    }
+    return ids, weights, iteration, max_diff, l1_errors, diagnostics
@@ -1,29 +1,225 @@
-from rest_framework import viewsets
-from .models import SurveyResult, VoteModel
-from .serializers import SurveyResultSerializer
-from polling.model_training import train_vote_model
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from .models import DEMOGRAPHIC_FIELDS, Job, Poll, ReplicateSet, SurveyResult, VoteModel, WeightSet
+from .serializers import JobSerializer, ReplicateSetSerializer, SurveyResultSerializer, WeightSetSerializer
+from polling.model_training import train_vote_model, update_vote_model
+from polling.model_tuning import DEFAULT_PARAM_GRID, expand_grid
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from polling.utils import run_ipf
-import numpy as np
-import shap
+from polling.utils import run_ipf, run_ipf_batch, IPF_METHODS
+from polling.raking import SOLVERS
+from polling.aggregation import weighted_topline
+from polling.scenarios import evaluate_scenarios
+from polling.cube import add_to_cube, rebuild_cube
+from polling.ingest import ingest_records, read_records
+from django.db import transaction
+import itertools
+import json
 import pandas as pd
 from django.conf import settings
-import pickle
+from django.http import Http404, StreamingHttpResponse
+from django.utils.text import slugify
+from polling.export import EXPORT_COLUMNS, EXPORT_FORMATS, aexport_rows
+from polling.pagination import SurveyResultCursorPagination
+from polling.snapshots import bump_data_version
+from polling.prediction import InvalidProfile, check_profiles, explain_profiles, predict_profiles
+from polling.model_cache import vote_model_cache
+from polling.jobs import schedule_auto_rerake, should_run_async, submit_job
+from polling.weight_sets import activate_weight_set, active_weights, deactivate_weight_sets, get_weight_set
+from polling.replicates import DEFAULT_REPLICATES, build_replicate_set
+from polling.concurrency import AsyncAPIView, AsyncModelViewSet, run_cpu, run_sync
+from polling.response_cache import cached_response
+from polling.database import connection_stats
 
-class SurveyResultViewSet(viewsets.ModelViewSet):
+class SurveyResultViewSet(AsyncModelViewSet):
+    """
+    Survey results, listed a page at a time in id order (follow "next").
+    GET requests accept ?fields=id,candidate,... to return only those fields.
+
+    Single-row reads and the export use the async ORM; list, writes and bulk
+    ingestion, whose serializers and transactions are synchronous, run
+    through run_sync. Pages of one poll's results are cached until its next
+    write and carry an ETag.
+    """
     serializer_class = SurveyResultSerializer
+    pagination_class = SurveyResultCursorPagination
+    max_in_flight = settings.SURVEY_RESULTS_MAX_IN_FLIGHT
 
     def get_queryset(self):
         queryset = SurveyResult.objects.all()
+        fields = self.requested_fields()
+        if fields is None or 'poll' in fields:
+            queryset = queryset.select_related('poll')
+        if fields is not None:
+            # Only read the projected columns (plus the key used to paginate).
+            columns = [column for field in fields for column in (('poll', 'poll__name') if field == 'poll' else (field,))]
+            queryset = queryset.only('id', *columns)
         poll = self.request.query_params.get('poll', None)
         if poll is not None:
-            queryset = queryset.filter(poll=poll)
+            queryset = queryset.filter(poll__name=poll)
         return queryset
 
-class RunIPFView(APIView):
-    def post(self, request, format=None):
+    def requested_fields(self):
+        """The ?fields= projection of a GET request as a list, or None for every field."""
+        raw = self.request.query_params.get('fields') if self.request.method == 'GET' else None
+        if not raw:
+            return None
+        fields = [field.strip() for field in raw.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in EXPORT_COLUMNS]
+        if unknown or not fields:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields given."})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    # Responses are shown with their active weight set's weights, looked up
+    # once per page (or instance) from the slice of the set that covers it.
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'weights': getattr(self, 'weights', None)}
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.weights = active_weights(page)
+        return page
+
+    async def list(self, request, *args, **kwargs):
+        list_page = run_sync(super().list)
+        poll = request.query_params.get('poll')
+        if poll is None:
+            return await list_page(request, *args, **kwargs)
+        # The page's links are absolute, so the whole URI identifies the response.
+        return await cached_response(
+            request, 'survey-results', poll, request.build_absolute_uri(),
+            lambda: list_page(request, *args, **kwargs),
+        )
+
+    async def retrieve(self, request, *args, **kwargs):
+        try:
+            instance = await self.get_queryset().aget(pk=kwargs['pk'])
+        except (SurveyResult.DoesNotExist, TypeError, ValueError):
+            raise Http404
+        self.check_object_permissions(request, instance)
+        self.weights = await run_sync(active_weights)([instance])
+        return Response(self.get_serializer(instance).data)
+
+    async def create(self, request, *args, **kwargs):
+        return await run_sync(super().create)(request, *args, **kwargs)
+
+    async def update(self, request, *args, **kwargs):
+        return await run_sync(super().update)(request, *args, **kwargs)
+
+    async def partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return await self.update(request, *args, **kwargs)
+
+    async def destroy(self, request, *args, **kwargs):
+        return await run_sync(super().destroy)(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    async def export(self, request):
+        """
+        Streams every matching row as CSV or NDJSON (?type=csv|ndjson, default
+        csv), limited to ?fields= if given. Rows are read straight from a
+        database cursor, so the response can be of any size.
+        """
+        fmt = request.query_params.get("type", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"'type' must be one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fields = self.requested_fields() or list(EXPORT_COLUMNS)
+        queryset = SurveyResult.objects.order_by('id')
+        poll = request.query_params.get("poll")
+        if poll is not None:
+            queryset = queryset.filter(poll__name=poll)
+
+        response = StreamingHttpResponse(
+            aexport_rows(queryset, fields, fmt, chunk_size=settings.EXPORT_CHUNK_SIZE),
+            content_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        )
+        filename = f"{slugify(poll) if poll else 'survey-results'}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    async def bulk(self, request):
+        """
+        Streams a CSV or NDJSON body (or a multipart "file" upload) into the table.
+        The format comes from ?type=csv|ndjson, the content type or the file name.
+        """
+        return await run_sync(self._bulk)(request)
+
+    def _bulk(self, request):
+        content_type = request.content_type or ""
+        if content_type.startswith("multipart/"):
+            source = request.FILES.get("file")
+            if source is None:
+                return Response({"error": "Missing file upload: file"}, status=status.HTTP_400_BAD_REQUEST)
+            name = source.name or ""
+        else:
+            # Read the raw body line by line instead of letting DRF parse it.
+            source = request._request
+            name = ""
+
+        fmt = request.query_params.get("type")
+        if fmt is None:
+            is_ndjson = "ndjson" in content_type or "jsonl" in content_type or name.endswith((".ndjson", ".jsonl"))
+            fmt = "ndjson" if is_ndjson else "csv"
+        try:
+            summary = ingest_records(read_records(source, fmt), chunk_size=settings.INGEST_CHUNK_SIZE)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    # Keep each poll's data cube in step with single-row writes, invalidate its
+    # snapshot, and queue a warm-started re-rake for polls that ask for one.
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save(**_poll_by_name(serializer))
+            bump_data_version([instance.poll_id])
+            add_to_cube(instance, created=True)
+            _rerake_on_commit(instance.poll.name)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous = SurveyResult.objects.select_related('poll').get(pk=serializer.instance.pk)
+            add_to_cube(previous, sign=-1)
+            instance = serializer.save(**_poll_by_name(serializer))
+            bump_data_version([previous.poll_id, instance.poll_id], rewrite=True)
+            add_to_cube(instance)
+            serializer.context['weights'] = active_weights([instance])
+            _rerake_on_commit(previous.poll.name)
+            if instance.poll_id != previous.poll_id:
+                _rerake_on_commit(instance.poll.name)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            add_to_cube(instance, sign=-1)
+            instance.delete()
+            bump_data_version([instance.poll_id], rewrite=True)
+            _rerake_on_commit(instance.poll.name)
+
+def _poll_by_name(serializer):
+    # The validated poll name becomes a Poll (created on first use) only once
+    # the write's transaction has begun.
+    name = serializer.validated_data.get('poll')
+    return {} if name is None else {'poll': Poll.objects.get_or_create(name=name)[0]}
+
+def _rerake_on_commit(poll):
+    transaction.on_commit(lambda: schedule_auto_rerake(poll))
+
+class RunIPFView(AsyncAPIView):
+    max_in_flight = settings.RAKING_MAX_IN_FLIGHT
+
+    async def post(self, request, format=None):
+        return await run_sync(self.rake)(request)
+
+    def rake(self, request):
         target_weights = request.data.get("target_weights")
         poll = request.data.get("poll")
         if not target_weights or not poll:
@@ -31,15 +227,311 @@ class RunIPFView(APIView):
                 {"error": "Both 'target_weights' and 'poll' must be provided."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        iterations, final_change, l1_errors = run_ipf(target_weights, poll)
+        if not _is_target_weights(target_weights):
+            return Response(
+                {"error": "'target_weights' must be a dict of proportions per demographic."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        method = request.data.get("method", "numpy")
+        if method not in IPF_METHODS:
+            return Response(
+                {"error": f"'method' must be one of: {', '.join(IPF_METHODS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            options = _raking_options(request.data)
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Warm-start from the last converged run with these targets, and
+        # optionally keep re-raking automatically as responses are written.
+        options["warm_start"] = str(request.data.get("warm_start", "false")).lower() in ('1', 'true', 'yes')
+        if "auto_rerake" in request.data:
+            options["auto_rerake"] = str(request.data["auto_rerake"]).lower() in ('1', 'true', 'yes')
+
+        # Raked weights are stored as a new version of this weight set.
+        weight_set_name = request.data.get("weight_set", "ipf")
+        activate = str(request.data.get("activate", "true")).lower() in ('1', 'true', 'yes')
+        if not isinstance(weight_set_name, str) or not weight_set_name.strip():
+            return Response(
+                {"error": "'weight_set' must be a non-empty name."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if should_run_async(request.data, poll, settings.ASYNC_JOB_MIN_ROWS):
+            job, coalesced = submit_job(Job.IPF, poll, {
+                "target_weights": target_weights,
+                "method": method,
+                "weight_set": weight_set_name,
+                "activate": activate,
+                **options,
+            })
+            return _job_accepted(job, coalesced, f"IPF queued for {poll}")
+
+        try:
+            iterations, final_change, l1_errors, weight_set, diagnostics = run_ipf(
+                target_weights, poll, method=method, weight_set=weight_set_name, activate=activate, **options
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({
             "message": f"IPF algorithm completed for {poll}",
             "iterations": iterations,
             "final_change": final_change,
             "l1_errors": l1_errors,
+            "diagnostics": diagnostics,
+            "weight_set": weight_set and WeightSetSerializer(weight_set).data,
         }, status=status.HTTP_200_OK)
 
+def _is_target_weights(target_weights):
+    # Whether target weights have the {demographic: {category: proportion}} shape run_ipf expects.
+    return isinstance(target_weights, dict) and all(
+        isinstance(proportions, dict)
+        and all(isinstance(share, (int, float)) and not isinstance(share, bool) for share in proportions.values())
+        for proportions in target_weights.values()
+    )
+
+def _raking_options(data):
+    """
+    Reads the optional solver settings shared by the raking endpoints:
+    "solver", "bounds" ([lower, upper] on the adjustment ratio),
+    "tolerance" and "max_iterations".
+    """
+    solver = data.get("solver", "ipf")
+    if solver not in SOLVERS:
+        raise ValueError(f"'solver' must be one of: {', '.join(SOLVERS)}.")
+    bounds = data.get("bounds")
+    if bounds is not None:
+        if not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+            raise ValueError("'bounds' must be a [lower, upper] pair.")
+        bounds = [float(bounds[0]), float(bounds[1])]
+        if not 0 <= bounds[0] <= 1 <= bounds[1]:
+            raise ValueError("'bounds' must satisfy 0 <= lower <= 1 <= upper.")
+    max_iterations = int(data.get("max_iterations", 100))
+    if max_iterations < 1:
+        raise ValueError("'max_iterations' must be positive.")
+    return {
+        "solver": solver,
+        "bounds": bounds,
+        "tolerance": float(data.get("tolerance", 0.001)),
+        "max_iterations": max_iterations,
+    }
+
+class BatchRunIPFView(AsyncAPIView):
+    max_in_flight = settings.RAKING_MAX_IN_FLIGHT
+
+    async def post(self, request, format=None):
+        """
+        Rakes a list of {"poll", "target_weights", "weight_set", "activate"} jobs
+        concurrently, e.g. every poll against several turnout models, and
+        returns all results together.
+        """
+        return await run_sync(self.rake)(request)
+
+    def rake(self, request):
+        jobs = request.data.get("jobs")
+        if not isinstance(jobs, list) or not jobs:
+            return Response(
+                {"error": "A non-empty list of 'jobs' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for index, job in enumerate(jobs):
+            if not isinstance(job, dict) or not isinstance(job.get("poll"), str) or not _is_target_weights(job.get("target_weights")):
+                return Response(
+                    {"error": f"Job {index} must have a 'poll' and a 'target_weights' dict of proportions."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            results = run_ipf_batch(jobs, workers=settings.RAKING_WORKERS, **_raking_options(request.data))
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for result in results:
+            result["weight_set"] = result["weight_set"] and WeightSetSerializer(result["weight_set"]).data
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+class ToplineView(AsyncAPIView):
+    max_in_flight = settings.AGGREGATION_MAX_IN_FLIGHT
+
+    async def get(self, request, format=None):
+        poll = request.query_params.get("poll")
+        if not poll:
+            return Response(
+                {"error": "'poll' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Each demographic may be repeated to select several categories, e.g. ?age=18-29&age=30-44
+        filters = {
+            dim: request.query_params.getlist(dim)
+            for dim in DEMOGRAPHIC_FIELDS
+            if dim in request.query_params
+        }
+
+        # ?weight_set=name[&version=n] weights by that set instead of the active one.
+        name = request.query_params.get("weight_set")
+        version = request.query_params.get("version")
+        if name and version is not None and not version.isdigit():
+            return Response({"error": "'version' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        async def compute():
+            weight_set = None
+            if name:
+                weight_set = await run_sync(get_weight_set)(poll, name, version and int(version))
+                if weight_set is None:
+                    return Response(
+                        {"error": f"No weight set {name} (version {version or 'latest'}) for poll: {poll}"},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+            topline = await run_sync(weighted_topline)(poll, filters, weight_set=weight_set)
+            return Response(topline, status=status.HTTP_200_OK)
+
+        params = {"filters": filters, "weight_set": name or None, "version": name and version}
+        return await cached_response(request, 'topline', poll, params, compute)
+
+class WeightSetListView(AsyncAPIView):
+    async def get(self, request, format=None):
+        poll = request.query_params.get("poll")
+        if not poll:
+            return Response(
+                {"error": "'poll' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        weight_sets = (
+            WeightSet.objects.filter(poll__name=poll)
+            .select_related('poll')
+            .defer('response_ids', 'weights')
+            .order_by('name', '-version')
+        )
+        weight_sets = [weight_set async for weight_set in weight_sets]
+        return Response(WeightSetSerializer(weight_sets, many=True).data, status=status.HTTP_200_OK)
+
+class ActivateWeightSetView(APIView):
+    def post(self, request, format=None):
+        """
+        Makes a weight set (its latest version unless 'version' is given) the
+        poll's active one. A null 'weight_set' goes back to the responses' own weights.
+        """
+        poll = request.data.get("poll")
+        if not poll or "weight_set" not in request.data:
+            return Response(
+                {"error": "Both 'poll' and 'weight_set' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        name = request.data["weight_set"]
+        with transaction.atomic():
+            if name is None:
+                deactivate_weight_sets(poll)
+                rebuild_cube(poll)
+                return Response({"message": f"Using response weights for {poll}"}, status=status.HTTP_200_OK)
+
+            weight_set = get_weight_set(poll, name, request.data.get("version"))
+            if weight_set is None:
+                return Response(
+                    {"error": f"No weight set {name} (version {request.data.get('version') or 'latest'}) for poll: {poll}"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            activate_weight_set(weight_set)
+            rebuild_cube(poll)
+        return Response(WeightSetSerializer(weight_set).data, status=status.HTTP_200_OK)
+
+class ReplicateSetView(AsyncAPIView):
+    # Upper bound on replicates per request; a few hundred are plenty for a margin of error.
+    MAX_REPLICATES = 2000
+    max_in_flight = settings.RAKING_MAX_IN_FLIGHT
+
+    async def get(self, request, format=None):
+        poll = request.query_params.get("poll")
+        if not poll:
+            return Response(
+                {"error": "'poll' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        replicate_sets = (
+            ReplicateSet.objects.filter(poll__name=poll)
+            .select_related('poll', 'weight_set')
+            .defer('cells', 'totals', 'weight_set__response_ids', 'weight_set__weights')
+            .order_by('-created_at', '-pk')
+        )
+        replicate_sets = [replicate_set async for replicate_set in replicate_sets]
+        return Response(ReplicateSetSerializer(replicate_sets, many=True).data, status=status.HTTP_200_OK)
+
+    async def post(self, request, format=None):
+        """
+        Builds bootstrap replicates of a poll's weighting, from which toplines
+        report margins of error. They replicate the active weight set unless
+        'weight_set' (and optionally 'version') names another; a null
+        'weight_set' replicates the responses' own weights.
+        """
+        return await run_sync(self.build)(request)
+
+    def build(self, request):
+        poll = request.data.get("poll")
+        if not poll:
+            return Response(
+                {"error": "'poll' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            replicates = int(request.data.get("replicates", DEFAULT_REPLICATES))
+            seed = request.data.get("seed")
+            seed = seed if seed is None else int(seed)
+        except (TypeError, ValueError):
+            return Response({"error": "'replicates' and 'seed' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 2 <= replicates <= self.MAX_REPLICATES:
+            return Response(
+                {"error": f"'replicates' must be between 2 and {self.MAX_REPLICATES}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if seed is not None and not 0 <= seed < 2 ** 63:
+            return Response({"error": "'seed' must be a non-negative 64-bit integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if "weight_set" not in request.data:
+            weight_set = get_weight_set(poll)
+        elif request.data["weight_set"] is None:
+            weight_set = None
+        else:
+            name = request.data["weight_set"]
+            weight_set = get_weight_set(poll, name, request.data.get("version"))
+            if weight_set is None:
+                return Response(
+                    {"error": f"No weight set {name} (version {request.data.get('version') or 'latest'}) for poll: {poll}"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        try:
+            replicate_set = build_replicate_set(
+                poll, weight_set, replicates=replicates, seed=seed, workers=settings.RAKING_WORKERS
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if replicate_set is None:
+            return Response(
+                {"error": f"No survey data available for poll: {poll}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ReplicateSetSerializer(replicate_set).data, status=status.HTTP_201_CREATED)
+
+class ScenarioView(AsyncAPIView):
+    max_in_flight = settings.AGGREGATION_MAX_IN_FLIGHT
+
+    async def post(self, request, format=None):
+        poll = request.data.get("poll")
+        scenarios = request.data.get("scenarios")
+        if not poll or not isinstance(scenarios, list):
+            return Response(
+                {"error": "'poll' and a list of 'scenarios' must be provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = await run_sync(evaluate_scenarios)(poll, scenarios, request.data.get("filters"))
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(results, status=status.HTTP_200_OK)
+
 class TrainVoteModelView(APIView):
     def post(self, request, format=None):
         required_fields = ['poll']
@@ -53,14 +545,67 @@ class TrainVoteModelView(APIView):
                 )
         
         poll = data['poll']
+        precompute_profiles = str(data.get('precompute_profiles', 'false')).lower() in ('1', 'true', 'yes')
+        # "tune": true cross-validates a parameter grid ("param_grid", "cv", "n_jobs") before the final fit.
+        options = {'precompute_profiles': precompute_profiles}
+        if str(data.get('tune', 'false')).lower() in ('1', 'true', 'yes'):
+            try:
+                options.update(
+                    tune_params=True,
+                    param_grid=data.get('param_grid'),
+                    cv=int(data.get('cv', 3)),
+                    n_jobs=int(data.get('n_jobs', settings.TUNING_WORKERS)) or None,
+                )
+                expand_grid(DEFAULT_PARAM_GRID if options['param_grid'] is None else options['param_grid'])
+            except (TypeError, ValueError) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elif str(data.get('incremental', 'false')).lower() in ('1', 'true', 'yes'):
+            # Only train on what changed since the last training, if anything.
+            options['incremental'] = True
+
+        if should_run_async(data, poll, settings.ASYNC_JOB_MIN_ROWS):
+            job, coalesced = submit_job(Job.TRAIN, poll, options)
+            return _job_accepted(job, coalesced, f"Training queued for {poll}")
+
         try:
-            model = train_vote_model(poll)
-            return Response({"message": "Model trained successfully."}, status=status.HTTP_200_OK)
+            if options.pop('incremental', False):
+                update = update_vote_model(poll, **options)
+                return Response({"message": "Model is up to date.", **update}, status=status.HTTP_200_OK)
+            model = train_vote_model(poll, **options)
+            return Response(
+                {"message": "Model trained successfully.", "tuning": model.tuning},
+                status=status.HTTP_200_OK
+            )
         except Exception as e:
             return Response({"error": "Training failed.", "details": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class VotePredictionView(APIView):
-    def post(self, request, format=None):
+class JobStatusView(AsyncAPIView):
+    async def get(self, request, pk, format=None):
+        try:
+            job = await Job.objects.aget(pk=pk)
+        except Job.DoesNotExist:
+            return Response({"error": f"No job found with id: {pk}"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(JobSerializer(job).data, status=status.HTTP_200_OK)
+
+def _job_accepted(job, coalesced, message):
+    return Response(
+        {"message": message, "job_id": job.pk, "status": job.status, "coalesced": coalesced},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+class ModelCacheStatsView(AsyncAPIView):
+    async def get(self, request, format=None):
+        return Response(vote_model_cache.stats(), status=status.HTTP_200_OK)
+
+class DatabaseStatsView(AsyncAPIView):
+    async def get(self, request, format=None):
+        """This process's database connection reuse: persistence, pool and prepared statement stats."""
+        return Response(await run_sync(connection_stats)(), status=status.HTTP_200_OK)
+
+class VotePredictionView(AsyncAPIView):
+    max_in_flight = settings.PREDICTION_MAX_IN_FLIGHT
+
+    async def post(self, request, format=None):
         required_fields = ['poll', 'age', 'gender', 'race', 'income', 'urbanity', 'education']
         data = request.data
 
@@ -80,101 +625,192 @@ class VotePredictionView(APIView):
             'urbanity': data['urbanity'],
             'education': data['education']
         }
+        # Identical profiles are answered from the response cache until the poll's next write.
+        return await cached_response(request, 'predict-vote', poll, input_data, lambda: self.predict(poll, input_data))
+
+    async def predict(self, poll, input_data):
         input_df = pd.DataFrame([input_data])
-        
-        # Get model from db
+
+        # Get the deserialized model from this worker's cache (or the db)
         try:
-            vote_model = VoteModel.objects.get(poll=poll)
+            model = await vote_model_cache.aget(poll)
         except VoteModel.DoesNotExist:
             return Response(
                 {"error": f"No model found for poll: {poll}. Please train the model first."},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Deserialize model
-        try:
-            clf = pickle.loads(vote_model.serialized_model)
         except Exception as e:
             return Response(
                 {"error": "Model could not be loaded", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+        # Known profiles were precomputed at training time
+        precomputed = model.lookup(input_data)
+        if precomputed is not None:
+            return Response(precomputed, status=status.HTTP_200_OK)
         
         # Run prediction and probability distribution
         try:
-            probabilities = clf.predict_proba(input_df)
-            prediction = clf.predict(input_df)
-            
-            # Convert numeric prediction back to the candidate name using the mapping.
-            if hasattr(clf, 'mapping'):
-                predicted_candidate = clf.mapping.get(prediction[0], prediction[0])
-            else:
-                predicted_candidate = prediction[0]
-            
-            prob_dist = {}
-            for i, prob in enumerate(probabilities[0]):
-                candidate = clf.mapping.get(i, i) if hasattr(clf, 'mapping') else i
-                prob_dist[candidate] = prob
+            predictions, predicted, distributions = await run_cpu(predict_profiles, model.predictor, input_df)
         except Exception as e:
             return Response(
                 {"error": "Error during prediction", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        
+
         # Compute SHAP values
         try:
-            transformed_input = clf.named_steps['preprocessor'].transform(input_df)
-            explainer = shap.TreeExplainer(clf.named_steps['classifier'])
-            shap_values = explainer.shap_values(transformed_input)
-            
-            # For multi-class, shap_values is a list (one array per class). We select the one for the predicted class.
-            if isinstance(shap_values, list):
-                predicted_class = prediction[0]
-                shap_vals = shap_values[predicted_class][0].tolist()
-            else:
-                shap_vals = shap_values[0].tolist()
-            
-            # Get feature names
-            try:
-                feature_names = clf.named_steps['preprocessor'].get_feature_names_out()
-                shap_explanation = dict(zip(feature_names, shap_vals))
-            except Exception:
-                shap_explanation = shap_vals
+            shap_explanation = (await run_cpu(explain_profiles, model.predictor, input_df, predictions))[0]
         except Exception as e:
             shap_explanation = f"Error computing SHAP values: {str(e)}"
 
         # Return
         return Response(
             {
-                "predicted_candidate": predicted_candidate,
-                "probability_distribution": prob_dist,
-                "shap_explanation": combine_onehot_shap(shap_explanation)
+                "predicted_candidate": predicted[0],
+                "probability_distribution": distributions[0],
+                "shap_explanation": shap_explanation
             },
             status=status.HTTP_200_OK
         )
-    
-def combine_onehot_shap(shap_explanation):
+
+class BatchVotePredictionView(AsyncAPIView):
     """
-    Combines one-hot-encoded features for SHAP for ease of explainibility
+    Scores many profiles in one call, either as JSON ({"poll", "profiles": [...]})
+    or as a CSV upload in the "file" field. Profiles are run through the model
+    in chunks and the results are streamed back as NDJSON, one line per profile.
     """
-    # List your original categorical features.
-    features = ["age", "gender", "race", "income", "urbanity", "education"]
-    combined = {}
-
-    for feat in features:
-        # Identify keys
-        feat_keys = [k for k in shap_explanation if k.startswith(f"cat__{feat}_")]
-        if feat_keys:
-            total = 0
-            for k in feat_keys:
-                val = shap_explanation[k]
-                if isinstance(val, list):
-                    total += sum(val)
-                else:
-                    total += val
-            combined[feat] = total
-
-    # Sort in decreasing order of magnitude
-    sorted_combined = dict(sorted(combined.items(), key=lambda item: abs(item[1]), reverse=True))
-    
-    return sorted_combined
+    max_in_flight = settings.BATCH_PREDICTION_MAX_IN_FLIGHT
+
+    async def post(self, request, format=None):
+        poll = request.data.get("poll")
+        if not poll:
+            return Response({"error": "Missing field: poll"}, status=status.HTTP_400_BAD_REQUEST)
+        include_shap = str(request.data.get("shap", "false")).lower() in ("1", "true", "yes")
+        chunk_size = settings.PREDICTION_CHUNK_SIZE
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            # Later chunks are checked as they are streamed; a bad one ends the stream with an error line.
+            try:
+                chunks = pd.read_csv(upload, chunksize=chunk_size, dtype=str)
+                first = await run_cpu(next, chunks, None)
+            except ValueError as e:
+                return Response(
+                    {"error": "The uploaded file is not a readable CSV.", "details": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if first is None:
+                return Response({"error": "The uploaded file has no rows."}, status=status.HTTP_400_BAD_REQUEST)
+            missing = [field for field in DEMOGRAPHIC_FIELDS if field not in first.columns]
+            if missing:
+                return Response(
+                    {"error": f"Missing field: {', '.join(missing)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                check_profiles(first)
+            except InvalidProfile as e:
+                return Response({"error": str(e), "index": e.index}, status=status.HTTP_400_BAD_REQUEST)
+            chunks = itertools.chain([first], chunks)
+        else:
+            profiles = request.data.get("profiles")
+            if not isinstance(profiles, list):
+                return Response(
+                    {"error": "Provide a list of 'profiles' or a CSV 'file'."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            for index, profile in enumerate(profiles):
+                if not isinstance(profile, dict):
+                    return Response(
+                        {"error": "Each profile must be an object.", "index": index},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                missing = [field for field in DEMOGRAPHIC_FIELDS if field not in profile]
+                if missing:
+                    return Response(
+                        {"error": f"Missing field: {', '.join(missing)}", "index": index},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                not_text = [field for field in DEMOGRAPHIC_FIELDS if not isinstance(profile[field], str)]
+                if not_text:
+                    return Response(
+                        {"error": f"{not_text[0]} must be a string.", "index": index},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            try:
+                check_profiles(pd.DataFrame(profiles, columns=DEMOGRAPHIC_FIELDS))
+            except InvalidProfile as e:
+                return Response({"error": str(e), "index": e.index}, status=status.HTTP_400_BAD_REQUEST)
+            chunks = (
+                pd.DataFrame(profiles[start:start + chunk_size], columns=DEMOGRAPHIC_FIELDS)
+                for start in range(0, len(profiles), chunk_size)
+            )
+
+        try:
+            model = await vote_model_cache.aget(poll)
+        except VoteModel.DoesNotExist:
+            return Response(
+                {"error": f"No model found for poll: {poll}. Please train the model first."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {"error": "Model could not be loaded", "details": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return StreamingHttpResponse(
+            _stream_predictions(model, chunks, include_shap),
+            content_type="application/x-ndjson",
+        )
+
+async def _stream_predictions(model, chunks, include_shap):
+    # Each chunk is read and scored on the CPU executor, so the event loop
+    # keeps serving other requests while a large batch is streamed.
+    offset = 0
+    try:
+        while (scored := await run_cpu(_score_next_chunk, model, chunks, include_shap, offset)) is not None:
+            text, rows = scored
+            offset += rows
+            yield text
+    except InvalidProfile as e:
+        yield json.dumps({"error": str(e), "index": e.index}) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": "Error during prediction", "details": str(e), "index": offset}) + "\n"
+
+def _score_next_chunk(model, chunks, include_shap, offset):
+    # Returns the NDJSON lines for the next chunk and its row count, or None when done.
+    chunk = next(chunks, None)
+    if chunk is None:
+        return None
+    check_profiles(chunk, offset)
+    predictions, predicted, distributions = predict_profiles(model.predictor, chunk)
+    explanations = _explain_chunk(model, chunk, predictions) if include_shap else None
+    lines = []
+    for i in range(len(chunk)):
+        row = {
+            "index": offset + i,
+            "predicted_candidate": predicted[i],
+            "probability_distribution": distributions[i],
+        }
+        if include_shap:
+            row["shap_explanation"] = explanations[i]
+        lines.append(json.dumps(row))
+    return "\n".join(lines) + "\n", len(chunk)
+
+def _explain_chunk(model, chunk, predictions):
+    # Use precomputed SHAP values where possible; only unknown profiles hit the booster.
+    explanations = []
+    unknown = []
+    for i, profile in enumerate(chunk[DEMOGRAPHIC_FIELDS].to_dict('records')):
+        precomputed = model.lookup(profile)
+        explanations.append(precomputed["shap_explanation"] if precomputed else None)
+        if precomputed is None:
+            unknown.append(i)
+    if unknown:
+        computed = explain_profiles(model.predictor, chunk.iloc[unknown], predictions[unknown])
+        for i, explanation in zip(unknown, computed):
+            explanations[i] = explanation
+    return explanations
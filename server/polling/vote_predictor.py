@@ -0,0 +1,87 @@
+import numpy as np
+import xgboost as xgb
+from polling.models import DEMOGRAPHIC_FIELDS
+from polling.raking import encode_column
+
+MODEL_FORMAT = 'xgboost-ubj'
+
+class VotePredictor:
+    """
+    A trained vote model stored without pickle: the XGBoost booster in its
+    native UBJSON format plus the one-hot category vocabularies and the class
+    to candidate mapping. Inputs are one-hot encoded with NumPy and scored
+    directly by the booster, so no sklearn objects are rebuilt on load.
+    """
+
+    def __init__(self, booster, categories, mapping):
+        self.booster = booster
+        self.categories = {feature: list(categories[feature]) for feature in DEMOGRAPHIC_FIELDS}
+        self.mapping = mapping
+        # Same names the OneHotEncoder inside the training pipeline produces.
+        self.feature_names = [
+            f"cat__{feature}_{category}"
+            for feature in DEMOGRAPHIC_FIELDS
+            for category in self.categories[feature]
+        ]
+
+    @classmethod
+    def from_pipeline(cls, clf):
+        """Builds a predictor from a fitted preprocessor + XGBClassifier pipeline."""
+        encoder = clf.named_steps['preprocessor'].named_transformers_['cat']
+        categories = {
+            feature: [str(category) for category in feature_categories]
+            for feature, feature_categories in zip(DEMOGRAPHIC_FIELDS, encoder.categories_)
+        }
+        mapping = {int(code): candidate for code, candidate in getattr(clf, 'mapping', {}).items()}
+        return cls(clf.named_steps['classifier'].get_booster(), categories, mapping)
+
+    @classmethod
+    def load(cls, raw_booster, metadata):
+        """Rebuilds a predictor from the output of dump()."""
+        if metadata.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported model format: {metadata.get('format')}")
+        booster = xgb.Booster()
+        booster.load_model(bytearray(raw_booster))
+        mapping = {int(code): candidate for code, candidate in metadata['mapping'].items()}
+        return cls(booster, metadata['categories'], mapping)
+
+    def dump(self):
+        """Returns the booster as UBJSON bytes and the metadata needed to load it."""
+        metadata = {
+            'format': MODEL_FORMAT,
+            'categories': self.categories,
+            'mapping': {str(code): candidate for code, candidate in self.mapping.items()},
+            'xgboost_version': xgb.__version__,
+        }
+        return bytes(self.booster.save_raw(raw_format='ubj')), metadata
+
+    def transform(self, input_df):
+        """One-hot encodes profiles; unknown categories encode as all zeros."""
+        matrix = np.zeros((len(input_df), len(self.feature_names)), dtype=np.float32)
+        rows = np.arange(len(input_df))
+        offset = 0
+        for feature in DEMOGRAPHIC_FIELDS:
+            categories = self.categories[feature]
+            codes = encode_column(input_df[feature].astype(str).tolist(), categories)
+            known = codes < len(categories)
+            matrix[rows[known], offset + codes[known]] = 1
+            offset += len(categories)
+        return matrix
+
+    def predict_proba(self, input_df):
+        probabilities = self.booster.predict(xgb.DMatrix(self.transform(input_df)))
+        if probabilities.ndim == 1:
+            # Binary objective: the booster returns P(class 1) only.
+            probabilities = np.column_stack([1 - probabilities, probabilities])
+        return probabilities
+
+    def shap_values(self, input_df):
+        """
+        Exact TreeSHAP contributions from the booster itself, without the bias
+        term: shape (rows, features) for two classes, (rows, features, classes)
+        otherwise.
+        """
+        contributions = self.booster.predict(xgb.DMatrix(self.transform(input_df)), pred_contribs=True)
+        if contributions.ndim == 3:
+            return contributions[:, :, :-1].transpose(0, 2, 1)
+        return contributions[:, :-1]
@@ -0,0 +1,221 @@
+from collections import defaultdict
+import numpy as np
+from django.db import transaction
+from django.db.models import BinaryField, IntegerField, Max, Value
+from django.db.models.functions import Cast, Substr
+from polling.models import Poll, WeightSet
+from polling.response_cache import bump_cache_version
+
+# Ids read per round trip when searching a weight set's id blob.
+SEARCH_WINDOW = 512
+
+def pack(ids, weights):
+    """Packs response ids and their weights into the blobs stored on a WeightSet, sorted by id."""
+    ids = np.asarray(ids, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(ids, kind='stable')
+    return ids[order].tobytes(), weights[order].tobytes()
+
+def unpack(weight_set):
+    """Returns the (ids, weights) arrays of a WeightSet."""
+    ids = np.frombuffer(bytes(weight_set.response_ids), dtype=np.int64)
+    weights = np.frombuffer(bytes(weight_set.weights), dtype=np.float64)
+    return ids, weights
+
+def save_weight_set(poll, name, ids, weights, params=None, activate=True):
+    """
+    Appends a new version of the named weight set for a poll and optionally
+    makes it the active one. Returns the WeightSet. Callers rebuild the
+    poll's cube when the active set changes.
+    """
+    response_ids, packed = pack(ids, weights)
+    with transaction.atomic():
+        # Lock the poll so concurrent runs cannot claim the same version.
+        poll_obj = Poll.objects.select_for_update().get(name=poll)
+        latest = WeightSet.objects.filter(poll=poll_obj, name=name).aggregate(version=Max('version'))['version']
+        weight_set = WeightSet.objects.create(
+            poll=poll_obj,
+            name=name,
+            version=(latest or 0) + 1,
+            response_ids=response_ids,
+            weights=packed,
+            size=len(response_ids) // 8,
+            params=params or {},
+        )
+        if activate:
+            activate_weight_set(weight_set)
+        else:
+            # The new version is readable by name even while inactive.
+            bump_cache_version(pk=poll_obj.pk)
+    return weight_set
+
+def get_weight_set(poll, name=None, version=None):
+    """
+    Returns a poll's weight set: the given version of `name`, its latest
+    version when version is None, or the active set when name is None too.
+    Returns None if there is no such weight set.
+    """
+    weight_sets = WeightSet.objects.filter(poll__name=poll)
+    if name is None:
+        return weight_sets.filter(is_active=True).first()
+    weight_sets = weight_sets.filter(name=name)
+    if version is not None:
+        return weight_sets.filter(version=version).first()
+    return weight_sets.order_by('-version').first()
+
+def activate_weight_set(weight_set):
+    """Makes a weight set the active one for its poll."""
+    with transaction.atomic():
+        WeightSet.objects.filter(poll_id=weight_set.poll_id, is_active=True).exclude(pk=weight_set.pk).update(
+            is_active=False
+        )
+        WeightSet.objects.filter(pk=weight_set.pk).update(is_active=True)
+        bump_cache_version(pk=weight_set.poll_id)
+    weight_set.is_active = True
+
+def deactivate_weight_sets(poll):
+    """Goes back to the weights stored on the responses themselves."""
+    with transaction.atomic():
+        WeightSet.objects.filter(poll__name=poll, is_active=True).update(is_active=False)
+        bump_cache_version(name=poll)
+
+def apply_weight_set(ids, weights, weight_set):
+    """
+    Replaces entries of `weights` (aligned with `ids`) by their value in the
+    weight set. Responses added after the set was computed keep their own weight.
+    """
+    weights = np.array(weights, dtype=float)
+    if weight_set is None or len(ids) == 0:
+        return weights
+    set_ids, set_weights = unpack(weight_set)
+    if len(set_ids) == 0:
+        return weights
+    ids = np.asarray(ids, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(set_ids, ids), len(set_ids) - 1)
+    found = set_ids[positions] == ids
+    weights[found] = set_weights[positions[found]]
+    return weights
+
+def lookup_weights(ids, weights, weight_set):
+    """
+    Like apply_weight_set, but reads only the part of the weight set's blobs
+    that covers ids, so it can be given a WeightSet loaded with
+    .only('pk', 'size') and never fetches the whole set. For single rows and
+    pages of responses.
+    """
+    weights = np.array(weights, dtype=float)
+    if weight_set is None or len(ids) == 0 or weight_set.size == 0:
+        return weights
+    ids = np.asarray(ids, dtype=np.int64)
+    if weight_set.size <= SEARCH_WINDOW:
+        start, stop = 0, weight_set.size
+    else:
+        ends = _read_ids(weight_set, [0, weight_set.size - 1])
+        windows = {}
+        start = _search(weight_set, ends, ids.min(), windows)
+        stop = _search(weight_set, ends, ids.max() + 1, windows)
+    set_ids, set_weights = _read_slice(weight_set, start, stop, 'response_ids', 'weights')
+    if len(set_ids) == 0:
+        return weights
+    positions = np.minimum(np.searchsorted(set_ids, ids), len(set_ids) - 1)
+    found = set_ids[positions] == ids
+    weights[found] = set_weights[positions[found]]
+    return weights
+
+def active_weights(responses):
+    """
+    Maps the ids of SurveyResults to their weight under their poll's active
+    weight set, for the responses the set covers.
+    """
+    by_poll = defaultdict(list)
+    for response in responses:
+        by_poll[response.poll_id].append(response.pk)
+    weights = {}
+    for weight_set in active_weight_sets(by_poll).values():
+        ids = np.array(by_poll[weight_set.poll_id], dtype=np.int64)
+        looked_up = lookup_weights(ids, np.full(len(ids), np.nan), weight_set)
+        found = ~np.isnan(looked_up)
+        weights.update(zip(ids[found].tolist(), looked_up[found].tolist()))
+    return weights
+
+def active_weight_sets(poll_ids):
+    """
+    Maps the ids of polls that have an active weight set to that set, loaded
+    with .only('pk', 'poll_id', 'size') for lookup_weights.
+    """
+    return {
+        weight_set.poll_id: weight_set
+        for weight_set in WeightSet.objects.filter(poll_id__in=poll_ids, is_active=True).only('pk', 'poll_id', 'size')
+    }
+
+def effective_weight(response, created=False):
+    """
+    A single response's weight under its poll's active weight set. A response
+    just created is never in a weight set, so its own weight is returned
+    without a query.
+    """
+    if created:
+        return float(response.weight)
+    weight_set = WeightSet.objects.filter(poll_id=response.poll_id, is_active=True).only('pk', 'size').first()
+    return float(lookup_weights([response.pk], [response.weight], weight_set)[0])
+
+def _read_slice(weight_set, start, stop, *fields):
+    # The entries [start, stop) of some of a weight set's packed arrays.
+    dtypes = {'response_ids': np.int64, 'weights': np.float64}
+    if stop <= start:
+        return [np.empty(0, dtype=dtypes[field]) for field in fields]
+    offset = Cast(Value(start * 8 + 1), IntegerField())
+    length = Cast(Value((stop - start) * 8), IntegerField())
+    chunks = WeightSet.objects.filter(pk=weight_set.pk).values_list(
+        *(Substr(field, offset, length, output_field=BinaryField()) for field in fields)
+    ).get()
+    return [np.frombuffer(bytes(chunk), dtype=dtypes[field]) for chunk, field in zip(chunks, fields)]
+
+def _read_ids(weight_set, positions):
+    # The ids at a few positions of a weight set, in one query.
+    chunks = WeightSet.objects.filter(pk=weight_set.pk).values_list(*(
+        Substr('response_ids', Cast(Value(position * 8 + 1), IntegerField()), Cast(Value(8), IntegerField()),
+               output_field=BinaryField())
+        for position in positions
+    )).get()
+    return [int(np.frombuffer(bytes(chunk), dtype=np.int64)[0]) for chunk in chunks]
+
+def _search(weight_set, ends, value, windows):
+    # Position of the first id >= value in a weight set's sorted ids, read
+    # SEARCH_WINDOW ids per round trip. Windows are placed by interpolating
+    # between the ids known on either side, alternating with halving so a
+    # skewed id distribution still takes a logarithmic number of reads.
+    # windows maps start positions to the windows already read, which
+    # narrow later searches of the same set.
+    first, last = ends
+    if value <= first:
+        return 0
+    if value > last:
+        return weight_set.size
+    # Invariant: ids[lo] < value <= ids[hi].
+    lo, low, hi, high = 0, first, weight_set.size - 1, last
+    for start, window in windows.items():
+        if value <= window[0] and start < hi:
+            hi, high = start, int(window[0])
+        elif value > window[-1] and start + len(window) - 1 > lo:
+            lo, low = start + len(window) - 1, int(window[-1])
+        elif window[0] < value <= window[-1]:
+            return start + int(np.searchsorted(window, value))
+    interpolate = True
+    while hi - lo > SEARCH_WINDOW:
+        if interpolate:
+            guess = lo + int((value - low) / (high - low) * (hi - lo))
+        else:
+            guess = (lo + hi) // 2
+        interpolate = not interpolate
+        start = min(max(guess - SEARCH_WINDOW // 2, lo + 1), hi - SEARCH_WINDOW)
+        window, = _read_slice(weight_set, start, start + SEARCH_WINDOW, 'response_ids')
+        windows[start] = window
+        if value <= window[0]:
+            hi, high = start, int(window[0])
+        elif value > window[-1]:
+            lo, low = start + SEARCH_WINDOW - 1, int(window[-1])
+        else:
+            return start + int(np.searchsorted(window, value))
+    window, = _read_slice(weight_set, lo + 1, hi, 'response_ids')
+    return lo + 1 + int(np.searchsorted(window, value))